@@ -0,0 +1,131 @@
+import bisect
+import logging
+
+
+def numeric(value):
+    """Stat values as numbers, or None for values Yahoo has none for yet ("-")"""
+    if isinstance(value, (int, float)):
+        return value
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+class StatAggregate:
+    """Sum, count, min/max and percentiles of one stat, kept as a sorted list so a value can be added or removed without a rescan.
+
+    Missing values are left out of the mean and percentiles but count as 0 in the min and max, which is how
+    averaging and normalization have always treated them.
+    """
+
+    def __init__(self):
+        self.values = []
+        self.total = 0.0
+        self.missing = 0
+
+    def add(self, value):
+        if value is None:
+            self.missing += 1
+            return
+        bisect.insort(self.values, value)
+        self.total += value
+
+    def remove(self, value):
+        if value is None:
+            self.missing -= 1
+            return
+        index = bisect.bisect_left(self.values, value)
+        if index < len(self.values) and self.values[index] == value:
+            del self.values[index]
+            self.total -= value
+
+    @property
+    def count(self):
+        return len(self.values)
+
+    def mean(self):
+        return self.total / len(self.values) if self.values else None
+
+    def min(self):
+        if not self.values:
+            return 0 if self.missing else None
+        return min(self.values[0], 0) if self.missing else self.values[0]
+
+    def max(self):
+        if not self.values:
+            return 0 if self.missing else None
+        return max(self.values[-1], 0) if self.missing else self.values[-1]
+
+    def percentile(self, level):
+        """Same linear interpolation as numpy.percentile"""
+        if not self.values:
+            return None
+        position = (len(self.values) - 1) * level / 100
+        lower = int(position)
+        upper = min(lower + 1, len(self.values) - 1)
+        return self.values[lower] + (self.values[upper] - self.values[lower]) * (position - lower)
+
+
+class StatAggregateStore:
+    """League-wide aggregates per (role, period, stat), updated as stat lines are inserted, replaced or removed.
+
+    Lines are keyed by whatever identifies the player to the caller, usually the Yahoo player id. Replacing
+    a line only touches the stats whose value changed.
+    """
+
+    def __init__(self):
+        self.logger = logging.getLogger(__name__)
+        self.aggregates = {}
+        self.lines = {}
+
+    def aggregate(self, role, period, stat):
+        return self.aggregates.get((role, period, stat))
+
+    def upsert(self, key, role, period, stats):
+        """Insert or replace the player's line for a period"""
+        old = self.lines.get(key, {}).get((role, period), {})
+        new = {stat: numeric(value) for stat, value in stats.items()}
+        for stat, value in old.items():
+            if stat not in new or new[stat] != value:
+                self.aggregates[(role, period, stat)].remove(value)
+        for stat, value in new.items():
+            if stat not in old or old[stat] != value:
+                self.aggregates.setdefault((role, period, stat), StatAggregate()).add(value)
+        self.lines.setdefault(key, {})[(role, period)] = new
+
+    def remove(self, key):
+        """Remove every line held for the player"""
+        for (role, period), stats in self.lines.pop(key, {}).items():
+            for stat, value in stats.items():
+                self.aggregates[(role, period, stat)].remove(value)
+
+    def sync(self, lines):
+        """Make the store hold exactly {key: [(role, period, stats), ...]}, touching only what changed"""
+        for key in set(self.lines) - set(lines):
+            self.remove(key)
+        for key, player_lines in lines.items():
+            held = set(self.lines.get(key, {}))
+            for role, period, stats in player_lines:
+                self.upsert(key, role, period, stats)
+                held.discard((role, period))
+            for role, period in held:
+                for stat, value in self.lines[key].pop((role, period)).items():
+                    self.aggregates[(role, period, stat)].remove(value)
+
+    def averages(self, role, period, stats=None):
+        return {
+            stat: aggregate.mean()
+            for (aggregate_role, aggregate_period, stat), aggregate in self.aggregates.items()
+            if aggregate_role == role and aggregate_period == period and aggregate.count and (stats is None or stat in stats)
+        }
+
+    def thresholds(self, period, roles):
+        """Min and max of every stat in a period across the given roles, as {"max": {...}, "min": {...}}"""
+        thresholds = {"max": {}, "min": {}}
+        for (role, aggregate_period, stat), aggregate in self.aggregates.items():
+            if aggregate_period != period or role not in roles or aggregate.min() is None:
+                continue
+            thresholds["max"][stat] = max(thresholds["max"].get(stat, aggregate.max()), aggregate.max())
+            thresholds["min"][stat] = min(thresholds["min"].get(stat, aggregate.min()), aggregate.min())
+        return thresholds
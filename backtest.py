@@ -0,0 +1,319 @@
+#!/usr/bin/env python
+"""Replays the player history through the rankings, lineup and add/drop decisions for a grid of weights.
+
+    ./backtest.py [--grid GRID.json] [--seasons SEASON ...] [--workers N] [--max-moves N]
+
+GRID.json maps weight names to the values to try, e.g. {"season_weight": [0.3, 0.45, 0.6]}; every
+combination is replayed, with weights left out of the grid at the values the bot runs with.
+"""
+
+import os
+import json
+import time
+import logging
+import warnings
+import argparse
+import itertools
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from history import PlayerHistory
+from scoring import PERCENTILE_LABELS, PERCENTILE_LEVELS, unified_score_components
+from windows import RATE_STATS
+from util import constants
+from util.lazy import lazy_import
+
+np = lazy_import("numpy")
+
+# The weights League and LeagueStatistics run with
+DEFAULT_WEIGHTS = {
+    "last_week_weight": 0.55,
+    "last_month_weight": 0.5,
+    "season_weight": 0.45,
+    "projected_rank_weight": 0.35,
+    "percent_owned_weight": 0.2,
+    "score_weight": 0.7,
+    "projection_weight": 0.3,
+}
+DEFAULT_GRID = {
+    "last_week_weight": [0.35, 0.55, 0.75],
+    "season_weight": [0.25, 0.45, 0.65],
+    "score_weight": [0.5, 0.7, 0.9],
+}
+# Active slots filled each day, best unified score first; Util takes any skater
+DEFAULT_SLOTS = {"C": 2, "LW": 2, "RW": 2, "D": 4, "Util": 1, "G": 2}
+SKATER_POSITIONS = ["C", "LW", "RW", "D"]
+INVERSE_STATS = ["L", "GA", "GAA"]
+INACTIVE_POSITIONS = ["IR+", "IL", "NA", "IR", "IR-LT"]
+NOT_PLAYING_STATUSES = ["DTD", "O", "IR-LT"]
+# Weekly adds when the league setting is not given
+MAX_MOVES = 4
+# A free agent has to beat the roster player it replaces by this much unified score
+ADD_MARGIN = 1.0
+# Same ownership floor as Roster.find_free_agents_by_positions
+MIN_PERCENT_OWNED = 15
+
+logging.basicConfig(level=logging.INFO, format="%(levelname)s: %(message)s")
+logger = logging.getLogger(__name__)
+
+# Days replayed by a worker process, loaded once by load_worker
+DAYS = []
+CATEGORY_SCALES = {}
+
+
+class HistoryDay:
+    """One day of the history as arrays, with everything that does not depend on the weights worked out once"""
+
+    def __init__(self, day, snapshot, rows):
+        columns = snapshot.columns
+        order = rows[np.argsort(columns["player_id"][rows], kind="stable")]
+        self.day = day
+        self.player_ids = np.asarray(columns["player_id"][order])
+        self.stat_names = list(snapshot.stat_names)
+        locations = np.array(snapshot.strings["location"].values, dtype=object)[columns["location"][order]]
+        self.roster = locations == constants.LOCATION_ROSTER
+        self.taken = self.roster | (locations == constants.LOCATION_TAKEN)
+        self.free_agent = locations == constants.LOCATION_FREE_AGENT
+        self.is_goalie = np.asarray(columns["is_goalie"][order])
+        self.game_today = np.asarray(columns["game_today"][order])
+        self.percent_owned = np.asarray(columns["percent_owned"][order], dtype=float)
+        statuses = np.array(snapshot.strings["status"].values, dtype=object)[columns["status"][order]]
+        positions = np.array(snapshot.strings["position"].values, dtype=object)[columns["position"][order]]
+        self.inactive = np.isin(statuses, NOT_PLAYING_STATUSES)
+        self.injured = np.isin(positions, INACTIVE_POSITIONS)
+        self.projected_rank = np.asarray(columns["projected_rank"][order], dtype=float)
+        masks = np.asarray(columns["eligible"][order], dtype=np.uint64)
+        eligible = snapshot.strings["eligible"].values
+        self.eligible = {
+            position: (masks >> np.uint64(eligible.index(position))) & np.uint64(1) == 1 if position in eligible else np.zeros(len(order), dtype=bool)
+            for position in SKATER_POSITIONS + ["G"]
+        }
+
+        periods = [snapshot.time_periods.index(period) for period in constants.TIME_PERIODS]
+        present = np.asarray(columns["stats_present"][order][:, periods])
+        # Stats Yahoo has no value for yet ("-") count as 0, as in LeagueStatistics.normalize_stats
+        self.stats = np.where(present, np.nan_to_num(np.asarray(columns["stats"][order][:, periods]), nan=0.0), np.nan)
+        self.category_scores = self.normalized_category_scores(present)
+        self.normalized_rank = self.normalized_ranks()
+        self.season_stats = self.stats[:, constants.TIME_PERIODS.index("season")]
+        # Set by load_worker once the next day is known
+        self.realized = None
+
+    def normalized_category_scores(self, present):
+        """Sum of min/max normalized category stats per player and period, with the bounds taken over the taken players"""
+        taken_stats = np.where(self.taken[:, None, None], self.stats, np.nan)
+        # Stats no taken player has a line for come out as NaN bounds and normalize to 0
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", RuntimeWarning)
+            low = np.nanmin(taken_stats, axis=0)
+            high = np.nanmax(taken_stats, axis=0)
+        spread = high - low
+        with np.errstate(invalid="ignore", divide="ignore"):
+            normalized = np.where(spread > 0, np.round((self.stats - low) / spread, 2), 0.0)
+        inverse = np.array([stat in INVERSE_STATS for stat in self.stat_names], dtype=bool)
+        normalized = np.where(inverse & self.is_goalie[:, None, None] & (spread > 0), 1 - normalized, normalized)
+        # A role's categories are the stats any player of that role has a line for
+        categories = np.where(self.is_goalie[:, None], present[self.is_goalie].any(axis=(0, 1)), present[~self.is_goalie].any(axis=(0, 1)))
+        return np.where(present & categories[:, None, :], normalized, 0.0).sum(axis=2)
+
+    def normalized_ranks(self):
+        """1 - projected rank / the role's last projected rank, 0 for players without a projection"""
+        normalized = np.zeros(len(self.player_ids))
+        finite = np.isfinite(self.projected_rank)
+        for role in [self.is_goalie, ~self.is_goalie]:
+            ranked = role & finite
+            if ranked.any():
+                normalized[ranked] = 1 - self.projected_rank[ranked] / self.projected_rank[ranked].max()
+        return normalized
+
+    def rows(self, player_ids):
+        """Row of each player id, -1 for players not held on this day"""
+        player_ids = np.asarray(player_ids, dtype=self.player_ids.dtype)
+        if not len(self.player_ids):
+            return np.full(len(player_ids), -1)
+        index = np.minimum(np.searchsorted(self.player_ids, player_ids), len(self.player_ids) - 1)
+        return np.where(self.player_ids[index] == player_ids, index, -1)
+
+    def aligned_season_stats(self, stat_names):
+        """Season stats with the stat axis in the order of another day's stat names"""
+        columns = [self.stat_names.index(stat) if stat in self.stat_names else -1 for stat in stat_names]
+        return np.where(np.array(columns) >= 0, self.season_stats[:, columns], np.nan)
+
+
+def load_days(path=None, seasons=None):
+    """Every day in the history, oldest first; a day held twice keeps its last run"""
+    history = PlayerHistory(path) if path else PlayerHistory()
+    days = {}
+    for snapshot in history.snapshots(seasons):
+        dates = np.asarray(snapshot.columns["date"])
+        for day in np.unique(dates):
+            days[int(day)] = HistoryDay(int(day), snapshot, np.flatnonzero(dates == day))
+    return [days[day] for day in sorted(days)]
+
+
+def realized_stats(day, next_day):
+    """Stats each of the day's players produced that day: the next day's season line less today's"""
+    if next_day is None or next_day.day != day.day + 1:
+        return None
+    rows = next_day.rows(day.player_ids)
+    after = np.where((rows >= 0)[:, None], next_day.aligned_season_stats(day.stat_names)[np.maximum(rows, 0)], np.nan)
+    return np.nan_to_num(after - day.season_stats, nan=0.0).clip(min=0)
+
+
+def category_scales(days):
+    """Mean daily production of a taken player in each counting category, so categories can be added up"""
+    totals = {}
+    for day in days:
+        if day.realized is None:
+            continue
+        for stat_index, stat in enumerate(day.stat_names):
+            if stat in RATE_STATS:
+                continue
+            total, count = totals.get(stat, (0.0, 0))
+            totals[stat] = (total + day.realized[day.taken, stat_index].sum(), count + int(day.taken.sum()))
+    return {stat: total / count for stat, (total, count) in totals.items() if total > 0 and count}
+
+
+def load_worker(path, seasons):
+    """Process pool initializer: memory-map the history and prepare every day once per worker"""
+    global DAYS, CATEGORY_SCALES
+    DAYS = load_days(path, seasons)
+    for day, next_day in zip(DAYS, DAYS[1:] + [None]):
+        day.realized = realized_stats(day, next_day)
+    CATEGORY_SCALES = category_scales(DAYS)
+
+
+def unified_scores(day, weights):
+    """Unified score of every player on the day, ranked and evaluated the way LeagueStatistics and BatchPlayerEvaluator do"""
+    weighted = day.category_scores * weights["score_weight"] + day.normalized_rank[:, None] * weights["projection_weight"]
+    percentiles = [
+        dict(zip(PERCENTILE_LABELS, np.percentile(weighted[:, column], PERCENTILE_LEVELS))) for column in range(len(constants.TIME_PERIODS))
+    ]
+    components = unified_score_components(weighted, day.projected_rank, day.percent_owned, day.inactive, percentiles, weights)
+    return sum(components.values())
+
+
+def set_lineup(day, rows, scores, slots):
+    """Rows started on the day: healthy players with a game, best score first, each in the first open slot they fit"""
+    open_slots = dict(slots)
+    started = []
+    for row in sorted(rows, key=lambda row: scores[row], reverse=True):
+        if not day.game_today[row] or day.inactive[row] or day.injured[row]:
+            continue
+        positions = [position for position in SKATER_POSITIONS + ["G"] if day.eligible[position][row]]
+        if not day.is_goalie[row]:
+            positions.append("Util")
+        position = next((position for position in positions if open_slots.get(position, 0) > 0), None)
+        if position:
+            open_slots[position] -= 1
+            started.append(row)
+    return started
+
+
+def replace_players(day, roster, scores, moves_left):
+    """Swap the weakest roster players for better free agents at their positions while moves are left"""
+    free_agents = day.free_agent & (day.percent_owned > MIN_PERCENT_OWNED)
+    free_agents[day.rows(list(roster))] = False
+    made = 0
+    while made < moves_left:
+        rows = day.rows(list(roster))
+        held = rows[rows >= 0]
+        if not len(held):
+            break
+        worst = held[np.argmin(scores[held])]
+        positions = [position for position in SKATER_POSITIONS + ["G"] if day.eligible[position][worst]]
+        if not positions:
+            break
+        candidates = free_agents & np.any([day.eligible[position] for position in positions], axis=0)
+        if not candidates.any():
+            break
+        best = np.flatnonzero(candidates)[np.argmax(scores[candidates])]
+        if scores[best] - scores[worst] < ADD_MARGIN:
+            break
+        roster.discard(int(day.player_ids[worst]))
+        roster.add(int(day.player_ids[best]))
+        free_agents[best] = False
+        made += 1
+    return made
+
+
+def run_config(weights, slots=None, max_moves=MAX_MOVES):
+    """Replay every day with one set of weights and return the fantasy outcome"""
+    slots = slots or DEFAULT_SLOTS
+    if not DAYS:
+        return {"weights": weights, "days": 0, "score": 0.0, "categories": {}, "moves": 0}
+    roster = {int(player_id) for player_id in DAYS[0].player_ids[DAYS[0].roster]}
+    totals = {}
+    moves = 0
+    week = None
+    for day in DAYS:
+        scores = unified_scores(day, weights)
+        # Yahoo's weekly adds reset on Monday
+        day_week = (day.day - 1) // 7
+        if day_week != week:
+            week, moves_left = day_week, max_moves
+        made = replace_players(day, roster, scores, moves_left)
+        moves_left -= made
+        moves += made
+        if day.realized is None:
+            continue
+        rows = day.rows(list(roster))
+        started = set_lineup(day, rows[rows >= 0], scores, slots)
+        for stat, value in zip(day.stat_names, day.realized[started].sum(axis=0)):
+            if stat not in RATE_STATS:
+                totals[stat] = totals.get(stat, 0.0) + float(value)
+    score = sum(
+        (-1 if stat in INVERSE_STATS else 1) * total / CATEGORY_SCALES[stat] for stat, total in totals.items() if stat in CATEGORY_SCALES
+    )
+    return {"weights": weights, "days": len(DAYS), "score": score, "categories": totals, "moves": moves}
+
+
+def weight_grid(grid):
+    """Every combination of the grid's values, on top of the default weights"""
+    names = list(grid)
+    return [{**DEFAULT_WEIGHTS, **dict(zip(names, values))} for values in itertools.product(*(grid[name] for name in names))]
+
+
+def run_backtest(grid=None, path=None, seasons=None, workers=None, slots=None, max_moves=MAX_MOVES):
+    """Replay the history for the default weights and every grid configuration over a process pool"""
+    configs = [dict(DEFAULT_WEIGHTS)] + [weights for weights in weight_grid(grid or DEFAULT_GRID) if weights != DEFAULT_WEIGHTS]
+    workers = min(workers or os.cpu_count() or 1, len(configs))
+    results = []
+    with ProcessPoolExecutor(max_workers=workers, initializer=load_worker, initargs=(path, seasons)) as executor:
+        futures = {executor.submit(run_config, weights, slots, max_moves): index for index, weights in enumerate(configs)}
+        for future in as_completed(futures):
+            try:
+                results.append({"config": futures[future], **future.result()})
+            except Exception as e:
+                logger.error(f"Error replaying config {futures[future]}: {e}")
+    return sorted(results, key=lambda result: result["config"])
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--grid", help="JSON file mapping weight names to the values to try")
+    parser.add_argument("--history", help="History directory (defaults to the cache's)")
+    parser.add_argument("--seasons", nargs="*", help="Seasons to replay (defaults to all)")
+    parser.add_argument("--workers", type=int, help="Number of worker processes (defaults to the number of cores)")
+    parser.add_argument("--max-moves", dest="max_moves", type=int, default=MAX_MOVES, help="Adds allowed per week")
+    parser.add_argument("--output", help="Write the results to this JSON file")
+    args = parser.parse_args()
+
+    grid = None
+    if args.grid:
+        with open(args.grid, "r") as f:
+            grid = json.load(f)
+        unknown = [name for name in grid if name not in DEFAULT_WEIGHTS]
+        if unknown:
+            parser.error(f"Unknown weights {unknown}, expected some of {list(DEFAULT_WEIGHTS)}")
+
+    started = time.perf_counter()
+    results = run_backtest(grid, args.history, args.seasons, args.workers, max_moves=args.max_moves)
+    baseline = next((result for result in results if result["config"] == 0), None)
+    for result in sorted(results, key=lambda result: result["score"], reverse=True):
+        changed = {name: value for name, value in result["weights"].items() if value != DEFAULT_WEIGHTS[name]}
+        label = ", ".join(f"{name}={value}" for name, value in changed.items()) or "defaults"
+        delta = result["score"] - baseline["score"] if baseline else 0.0
+        logger.info(f"{result['score']:8.2f} ({delta:+.2f})  {result['moves']:3d} moves  {label}")
+    logger.info(f"Replayed {len(results)} configurations over {results[0]['days'] if results else 0} days in {time.perf_counter() - started:.2f}s")
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
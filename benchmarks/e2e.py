@@ -0,0 +1,143 @@
+#!/usr/bin/env python
+"""End-to-end run against recorded HTTP traffic, reporting wall time and requests per stage.
+
+    python benchmarks/e2e.py record cassettes/league.json.gz
+    python benchmarks/e2e.py replay cassettes/league.json.gz --latency recorded --repeats 3
+
+Each run starts from an empty working directory so the local caches are cold, unless --warm is given.
+Roster changes are never submitted: the run loads state and calculates the lineup.
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+import statistics
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+sys.path.insert(0, REPO_DIR)
+
+import telemetry  # noqa: E402
+from cassette import Cassette, MODE_RECORD, MODE_REPLAY  # noqa: E402
+
+
+def replay_credentials(directory, meta):
+    """Stand-in token files so YahooApi starts offline with the league recorded in the cassette"""
+    os.makedirs(os.path.join(directory, "tokens"), exist_ok=True)
+    credentials = {"consumer_key": "replay", "consumer_secret": "replay", **meta}
+    with open(os.path.join(directory, "tokens", "credentials.json"), "w") as f:
+        json.dump(credentials, f)
+    with open(os.path.join(directory, "tokens", "secrets.json"), "w") as f:
+        json.dump({**credentials, "access_token": "replay", "refresh_token": "replay", "token_type": "bearer", "token_time": time.time()}, f)
+
+
+def run_manager(directory, lineup_only):
+    import manager
+    import yahoo.api as api
+    from lineup import RosterLineup
+
+    with telemetry.span("stage:yahoo_api"):
+        yahoo_api = api.YahooApi(directory)
+    bot = manager.Manager(yahoo_api, run_actions=False, lineup_only=lineup_only)
+    with telemetry.span("stage:lineup_decision"):
+        RosterLineup(bot.league, bot.roster.players).calculate_best_lineup()
+    return yahoo_api
+
+
+def run_team_manager(directory):
+    import hockey
+    import yahoo.api as api
+    from stat_lines import StatLineStore
+
+    with telemetry.span("stage:yahoo_api"):
+        yahoo_api = api.YahooApi(directory)
+    team_manager = hockey.TeamManager(yahoo_api, dry_run=True, cache=False)
+    team_manager.stat_lines = StatLineStore(os.path.join(os.getcwd(), "stat_lines.json"))
+    with telemetry.span("stage:get_team"):
+        team_manager.get_team()
+    with telemetry.span("stage:fetch_players_stats"):
+        team_manager.fetch_players_stats()
+    with telemetry.span("stage:set_league_rankings"):
+        team_manager.set_league_rankings()
+    return yahoo_api
+
+
+def run_once(args, cassette, workdir):
+    """Run the target once inside workdir and return its telemetry report"""
+    directory = REPO_DIR
+    if args.mode == MODE_REPLAY:
+        cassette.rewind()
+        directory = os.path.join(workdir, "replay")
+        replay_credentials(directory, cassette.meta)
+    previous_dir = os.getcwd()
+    os.chdir(workdir)
+    telemetry.telemetry.reset()
+    try:
+        if args.target == "teammanager":
+            yahoo_api = run_team_manager(directory)
+        else:
+            yahoo_api = run_manager(directory, args.lineup_only)
+    finally:
+        os.chdir(previous_dir)
+    if args.mode == MODE_RECORD:
+        cassette.meta = {key: yahoo_api.credentials[key] for key in ["game_key", "league_id", "team_id"]}
+    return telemetry.telemetry.report()
+
+
+def summarize(reports):
+    stages = {}
+    for report in reports:
+        for name, entry in report["spans"].items():
+            if name.startswith("stage:"):
+                stages.setdefault(name[len("stage:") :], {"seconds": []})["seconds"].append(entry["total_seconds"])
+        for name, sources in report["stage_counters"].items():
+            stage = stages.setdefault(name[len("stage:") :], {"seconds": []})
+            stage["requests"] = {source: counters.get("requests", 0) for source, counters in sources.items() if counters.get("requests")}
+    return {
+        "runs": len(reports),
+        "wall_seconds": statistics.median(report["wall_seconds"] for report in reports),
+        "requests": {source: counters.get("requests", 0) for source, counters in reports[-1]["counters"].items() if counters.get("requests")},
+        "stages": {
+            name: {"seconds": statistics.median(stage["seconds"]) if stage["seconds"] else 0.0, "requests": stage.get("requests", {})}
+            for name, stage in sorted(stages.items())
+        },
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("mode", choices=[MODE_RECORD, MODE_REPLAY])
+    parser.add_argument("cassette", help="Path of the gzipped cassette to write or read")
+    parser.add_argument("--target", choices=["manager", "teammanager"], default="manager")
+    parser.add_argument("--lineup-only", dest="lineup_only", action="store_true", help="Benchmark the lineup-only fast path")
+    parser.add_argument("--latency", default="0", help='Seconds added to each replayed response, or "recorded"')
+    parser.add_argument("--repeats", type=int, default=1, help="Number of replayed runs to take the median of")
+    parser.add_argument("--warm", action="store_true", help="Reuse one working directory so later runs hit the local caches")
+    parser.add_argument("--output", help="Also write the summary JSON to this path")
+    args = parser.parse_args()
+
+    latency = args.latency if args.latency == "recorded" else float(args.latency)
+    cassette = Cassette(args.cassette, mode=args.mode, latency=latency).install()
+    telemetry.install_http_hooks()
+    repeats = 1 if args.mode == MODE_RECORD else args.repeats
+
+    reports = []
+    workdir = tempfile.mkdtemp(prefix="e2e-")
+    try:
+        for _ in range(repeats):
+            if not args.warm:
+                shutil.rmtree(workdir, ignore_errors=True)
+                os.makedirs(workdir)
+            reports.append(run_once(args, cassette, workdir))
+    finally:
+        cassette.uninstall()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    summary = summarize(reports)
+    print(json.dumps(summary, indent=2))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(summary, f, indent=2)
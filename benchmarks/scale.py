@@ -0,0 +1,66 @@
+#!/usr/bin/env python
+"""Runs state loading, ranking and the lineup calculation against synthetic leagues of increasing size.
+
+    python benchmarks/scale.py --teams 8 12 16 20 --free-agents 1500
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import logging
+import argparse
+import tempfile
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+sys.path.insert(0, REPO_DIR)
+
+import stats  # noqa: E402
+from manager import Manager  # noqa: E402
+from lineup import RosterLineup  # noqa: E402
+from synthetic import SyntheticLeague, SyntheticYahooApi  # noqa: E402
+
+
+def run_size(num_teams, free_agents, seed):
+    workdir = tempfile.mkdtemp(prefix="scale-")
+    previous_dir = os.getcwd()
+    os.chdir(workdir)
+    try:
+        started = time.perf_counter()
+        league = SyntheticLeague(num_teams=num_teams, free_agents=free_agents, seed=seed)
+        league.write_projections(os.path.join(workdir, "projections"))
+        stats.PROJECTIONS_DIR = os.path.join(workdir, "projections")
+        generated = time.perf_counter()
+
+        bot = Manager(SyntheticYahooApi(league), run_actions=False, nhl=league.nhl())
+        loaded = time.perf_counter()
+        lineup = RosterLineup(bot.league, bot.roster.players).calculate_best_lineup()
+        decided = time.perf_counter()
+        if not lineup:
+            raise RuntimeError(f"No lineup found for the {num_teams} team league, the timing would not measure a search that succeeds")
+        return {
+            "teams": num_teams,
+            "players": len(league.players),
+            "generate_seconds": generated - started,
+            "load_seconds": loaded - generated,
+            "lineup_seconds": decided - loaded,
+            "stages": {name: round(seconds, 4) for name, seconds in sorted(bot.pipeline.durations.items())},
+        }
+    finally:
+        os.chdir(previous_dir)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--teams", type=int, nargs="+", default=[8, 12, 16, 20])
+    parser.add_argument("--free-agents", dest="free_agents", type=int, default=1500)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--verbose", action="store_true", help="Keep the bot's INFO logging")
+    args = parser.parse_args()
+    if not args.verbose:
+        logging.disable(logging.INFO)
+
+    results = [run_size(num_teams, args.free_agents, args.seed) for num_teams in args.teams]
+    print(json.dumps(results, indent=2))
@@ -0,0 +1,72 @@
+#!/usr/bin/env python
+"""Measures how long manager.py takes to import and, with --live, how long a --lineup-only run takes to reach a lineup decision"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import statistics
+import subprocess
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+HEAVY_MODULES = ["numpy", "pandas", "lxml.html", "tqdm", "yahoo_fantasy_api"]
+
+IMPORT_PROBE = """
+import sys, time, json
+started = time.perf_counter()
+import manager
+elapsed = time.perf_counter() - started
+print(json.dumps({"seconds": elapsed, "loaded": [m for m in %r if m in sys.modules]}))
+"""
+
+
+def measure_import(repeats):
+    """Import manager in fresh interpreters so every sample pays the full cold import cost"""
+    samples = []
+    loaded = []
+    for _ in range(repeats):
+        output = subprocess.run(
+            [sys.executable, "-c", IMPORT_PROBE % HEAVY_MODULES], cwd=REPO_DIR, capture_output=True, text=True, check=True
+        ).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+        samples.append(result["seconds"])
+        loaded = result["loaded"]
+    return {"median_seconds": statistics.median(samples), "min_seconds": min(samples), "heavy_modules_loaded": loaded}
+
+
+def measure_live():
+    """Load lineup-only state against the real league and time the lineup calculation, without submitting changes"""
+    sys.path.insert(0, REPO_DIR)
+    os.chdir(REPO_DIR)
+    started = time.perf_counter()
+    import manager
+    import yahoo.api as api
+    from lineup import RosterLineup
+
+    imported = time.perf_counter()
+    yahoo_api = api.YahooApi(REPO_DIR)
+    bot = manager.Manager(yahoo_api, run_actions=False, lineup_only=True)
+    loaded = time.perf_counter()
+    lineup = RosterLineup(bot.league, bot.roster.players)
+    lineup.calculate_best_lineup()
+    decided = time.perf_counter()
+    return {
+        "lineup_only": bot.lineup_only,
+        "import_seconds": imported - started,
+        "load_seconds": loaded - imported,
+        "decision_seconds": decided - loaded,
+        "time_to_first_decision_seconds": decided - started,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeats", type=int, default=5, help="Number of cold imports to sample")
+    parser.add_argument("--live", action="store_true", help="Also time a lineup-only load against Yahoo (needs credentials)")
+    args = parser.parse_args()
+
+    report = {"import": measure_import(args.repeats)}
+    if args.live:
+        report["live"] = measure_live()
+    print(json.dumps(report, indent=2))
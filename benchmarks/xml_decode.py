@@ -0,0 +1,100 @@
+#!/usr/bin/env python
+"""Compares xmltodict.parse with the streaming player decoder on a Yahoo players collection with stats.
+
+    python benchmarks/xml_decode.py --players 25 --repeats 2000
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import statistics
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+sys.path.insert(0, REPO_DIR)
+
+import xmltodict  # noqa: E402
+from yahoo.xml_stream import iter_players  # noqa: E402
+
+NAMESPACE = "http://fantasysports.yahooapis.com/fantasy/v2/base.rng"
+SKATER_STAT_IDS = ["1", "2", "3", "4", "5", "8", "14", "31", "32", "34"]
+GOALIE_STAT_IDS = ["19", "22", "23", "25", "26", "27"]
+
+
+def player_xml(index):
+    goalie = index % 8 == 0
+    stat_ids = GOALIE_STAT_IDS if goalie else SKATER_STAT_IDS
+    positions = ["G"] if goalie else [["C", "LW", "RW", "D"][index % 4], "Util"]
+    stats = "".join(
+        f"<stat><stat_id>{stat_id}</stat_id><value>{'-' if index % 11 == 0 else round((index * 7 + int(stat_id)) % 23 / 3, 2)}</value></stat>" for stat_id in stat_ids
+    )
+    return (
+        f"<player><player_key>453.p.{6000 + index}</player_key><player_id>{6000 + index}</player_id>"
+        f"<name><full>Player {index}</full><first>Player</first><last>{index}</last></name>"
+        f"<status>{'DTD' if index % 9 == 0 else ''}</status><player_notes_last_timestamp>{1730000000 + index}</player_notes_last_timestamp>"
+        f"<editorial_team_full_name>Team {index % 32}</editorial_team_full_name>"
+        f"<display_position>{','.join(positions)}</display_position>"
+        f"<eligible_positions>{''.join(f'<position>{position}</position>' for position in positions)}</eligible_positions>"
+        f"<player_stats><coverage_type>biweekly</coverage_type><stats>{stats}</stats></player_stats></player>"
+    )
+
+
+def collection_xml(count):
+    players = "".join(player_xml(index) for index in range(count))
+    return (
+        f'<?xml version="1.0" encoding="UTF-8"?><fantasy_content xmlns="{NAMESPACE}"><league><league_key>453.l.1</league_key>'
+        f'<players count="{count}">{players}</players></league></fantasy_content>'
+    ).encode()
+
+
+def decode_xmltodict(content):
+    """What getPlayerData did before: parse the whole document, then walk the dicts"""
+    players = xmltodict.parse(content)["fantasy_content"]["league"]["players"]["player"]
+    decoded = []
+    for player in players if isinstance(players, list) else [players]:
+        points = 0
+        for stat in player["player_stats"]["stats"]["stat"]:
+            if stat["value"] == "-":
+                continue
+            if stat["stat_id"] in ("22", "23"):
+                points -= float(stat["value"])
+            else:
+                points += float(stat["value"])
+        decoded.append((player["player_key"], player["name"]["full"], player["eligible_positions"]["position"], points))
+    return decoded
+
+
+def decode_stream(content):
+    decoded = []
+    for record in iter_players(content):
+        points = sum(-value if stat_id in ("22", "23") else value for stat_id, value in record.stats.items() if value is not None)
+        decoded.append((record.player_key, record.name, record.positions, points))
+    return decoded
+
+
+def measure(decode, content, repeats):
+    samples = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        decode(content)
+        samples.append(time.perf_counter() - started)
+    return {"median_ms": statistics.median(samples) * 1000, "min_ms": min(samples) * 1000}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--players", type=int, default=25)
+    parser.add_argument("--repeats", type=int, default=2000)
+    args = parser.parse_args()
+
+    content = collection_xml(args.players)
+    assert len(decode_stream(content)) == len(decode_xmltodict(content)) == args.players
+    results = {
+        "players": args.players,
+        "bytes": len(content),
+        "xmltodict": measure(decode_xmltodict, content, args.repeats),
+        "iterparse": measure(decode_stream, content, args.repeats),
+    }
+    results["speedup"] = results["xmltodict"]["median_ms"] / results["iterparse"]["median_ms"]
+    print(json.dumps(results, indent=2))
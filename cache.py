@@ -1,43 +1,238 @@
 import os
+import re
+import time
+import fcntl
 import pickle
-from datetime import datetime
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from datetime import datetime, timedelta
 import logging
 
 CACHE_DIR = "cache"
+OBJECTS_DIR = os.path.join(CACHE_DIR, "objects")
+# Entries held in memory per process, least recently used dropped first
+MEMORY_ITEMS = 64
+# Disk tier bound; the least recently read entries are deleted past it
+DISK_MAX_BYTES = 512 * 1024 * 1024
 
 logger = logging.getLogger(__name__)
 
 
-def save_object(obj, object_name):
-    """Save an object to a pickle file with a timestamped filename."""
-    if not os.path.exists(CACHE_DIR):
-        os.makedirs(CACHE_DIR)
+@contextmanager
+def file_lock(path):
+    """Hold an exclusive lock on path + ".lock" so processes sharing a cache file take turns"""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(f"{path}.lock", "w") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
 
-    date_str = datetime.now().strftime("%Y-%m-%d")
-    filename = f"{CACHE_DIR}/{date_str}_{object_name}.pkl"
 
-    try:
-        with open(filename, "wb") as f:
-            pickle.dump(obj, f)
-        logger.debug(f"Object saved successfully to {filename}")
-    except Exception as e:
-        logger.error(f"Error saving object: {e}")
+def count(**amounts):
+    # telemetry imports this module for CACHE_DIR, so it is imported when first needed
+    import telemetry
 
+    telemetry.count("object_cache", **amounts)
 
-def load_object(object_name):
-    """Load the most recent object with the given name from the cache directory."""
-    try:
-        date_str = datetime.now().strftime("%Y-%m-%d")
-        os.makedirs(CACHE_DIR, exist_ok=True)
 
-        filepath = os.path.join(CACHE_DIR, f"{date_str}_{object_name}.pkl")
-        if os.path.exists(filepath):
+class ObjectCache:
+    """Pickled objects in an in-memory LRU over a size-bounded disk tier.
+
+    Entries are fresh for the day they were stored (or for ttl seconds) and may be served for up to
+    `stale` seconds after that while a background thread fetches the new value. An entry stored with
+    dependencies is only valid while each of them is still the version it was built from, so replacing
+    or invalidating a key invalidates everything built on it. Disk writes are atomic and taken under a
+    file lock, so concurrent runs never read a half-written pickle.
+    """
+
+    def __init__(self, path=OBJECTS_DIR, max_bytes=DISK_MAX_BYTES, memory_items=MEMORY_ITEMS):
+        self.logger = logging.getLogger(__name__)
+        self.path = path
+        self.max_bytes = max_bytes
+        self.memory_items = memory_items
+        self.memory = OrderedDict()
+        self.lock = threading.Lock()
+        self.refreshing = {}
+
+    def filepath(self, key):
+        return os.path.join(self.path, re.sub(r"[^A-Za-z0-9_.-]", "_", key) + ".pkl")
+
+    def entry(self, key):
+        """The stored entry for a key, from memory unless another process has replaced the file since"""
+        filepath = self.filepath(key)
+        try:
+            modified = os.stat(filepath).st_mtime_ns
+        except FileNotFoundError:
+            with self.lock:
+                self.memory.pop(key, None)
+            return None
+        with self.lock:
+            entry = self.memory.get(key)
+            if entry is not None and entry["modified"] == modified:
+                self.memory.move_to_end(key)
+                count(memory_hits=1)
+                return entry
+        try:
             with open(filepath, "rb") as f:
-                return pickle.load(f)
-        else:
-            logger.debug(f"No cached files found for {object_name}.")
+                entry = pickle.load(f)
+            # Reads count as use for the disk tier's eviction order
+            os.utime(filepath, ns=(time.time_ns(), modified))
+        except FileNotFoundError:
             return None
+        except Exception as e:
+            self.logger.error(f"Error loading cached {key}: {e}")
+            return None
+        count(disk_hits=1)
+        entry["modified"] = modified
+        self.remember(key, entry)
+        return entry
+
+    def remember(self, key, entry):
+        with self.lock:
+            self.memory[key] = entry
+            self.memory.move_to_end(key)
+            while len(self.memory) > self.memory_items:
+                self.memory.popitem(last=False)
+
+    def version(self, key, checking=()):
+        """When the key's current value was stored, or None when it is missing or built on an outdated dependency"""
+        entry = self.entry(key)
+        if entry is None or key in checking:
+            return None
+        if any(self.version(dependency, checking + (key,)) != stored for dependency, stored in entry["depends"].items()):
+            return None
+        return entry["stored_at"]
+
+    def expires(self, entry, ttl):
+        """When an entry stops being fresh: ttl seconds after it was stored, or the midnight after without a ttl"""
+        if ttl is not None:
+            return entry["stored_at"] + ttl
+        stored = datetime.fromtimestamp(entry["stored_at"])
+        return datetime.combine(stored.date() + timedelta(days=1), datetime.min.time()).timestamp()
+
+    def is_fresh(self, entry, ttl):
+        return time.time() < self.expires(entry, ttl)
+
+    def get(self, key, ttl=None):
+        """The key's value while it is fresh and its dependencies are current, otherwise None"""
+        entry = self.entry(key)
+        if entry is None or self.version(key) is None or not self.is_fresh(entry, ttl):
+            return None
+        return entry["value"]
+
+    def put(self, key, value, depends=()):
+        """Store a value, recording the versions of the keys it was built from"""
+        entry = {"value": value, "stored_at": time.time(), "depends": {dependency: self.version(dependency) for dependency in depends}}
+        filepath = self.filepath(key)
+        try:
+            with file_lock(filepath):
+                tmp_path = f"{filepath}.tmp-{os.getpid()}-{threading.get_ident()}"
+                with open(tmp_path, "wb") as f:
+                    pickle.dump(entry, f)
+                os.replace(tmp_path, filepath)
+                entry["modified"] = os.stat(filepath).st_mtime_ns
+            self.remember(key, entry)
+            self.evict(keep=filepath)
+        except Exception as e:
+            self.logger.error(f"Error saving cached {key}: {e}")
+        return value
 
-    except Exception as e:
-        logger.error(f"Error loading object: {e}")
-        return None
+    def invalidate(self, key):
+        """Drop a key; entries that depend on it stop being valid"""
+        filepath = self.filepath(key)
+        with self.lock:
+            self.memory.pop(key, None)
+        with file_lock(filepath):
+            if os.path.exists(filepath):
+                os.remove(filepath)
+
+    def get_or_fetch(self, key, fetch, ttl=None, stale=0, depends=(), **kwargs):
+        """Fresh value, else a value at most `stale` seconds past fresh while it is refetched in the background, else fetch now.
+
+        fetch must only return the value, leaving the cache to store it: with stale set it can run on a background
+        thread while the caller carries on with the stale value, so anything else it changed would change under it.
+        """
+        entry = self.entry(key)
+        if entry is not None and self.version(key) is not None:
+            if self.is_fresh(entry, ttl):
+                return entry["value"]
+            if time.time() < self.expires(entry, ttl) + stale:
+                count(stale_hits=1)
+                self.refresh_in_background(key, fetch, depends, kwargs)
+                return entry["value"]
+        count(misses=1)
+        self.logger.info(f"Fetching fresh data for {key}")
+        return self.put(key, fetch(**kwargs), depends)
+
+    def refresh_in_background(self, key, fetch, depends, kwargs):
+        def refresh():
+            try:
+                self.put(key, fetch(**kwargs), depends)
+                self.logger.info(f"Refreshed {key} in the background")
+            except Exception as e:
+                self.logger.error(f"Error refreshing {key} in the background: {e}")
+            finally:
+                with self.lock:
+                    self.refreshing.pop(key, None)
+
+        with self.lock:
+            if key in self.refreshing:
+                return
+            # Not a daemon, so the interpreter waits for the refresh to be written before exiting
+            thread = self.refreshing[key] = threading.Thread(target=refresh, name=f"refresh-{key}")
+        self.logger.info(f"Serving stale {key} while it is refreshed")
+        thread.start()
+
+    def wait(self):
+        """Block until every background refresh has been written"""
+        with self.lock:
+            threads = list(self.refreshing.values())
+        for thread in threads:
+            thread.join()
+
+    def evict(self, keep=None):
+        """Delete the least recently read entries until the disk tier fits in max_bytes"""
+        with file_lock(os.path.join(self.path, "eviction")):
+            entries = []
+            for name in os.listdir(self.path):
+                if name.endswith(".pkl"):
+                    filepath = os.path.join(self.path, name)
+                    try:
+                        stat = os.stat(filepath)
+                    except FileNotFoundError:
+                        continue
+                    entries.append((stat.st_atime, stat.st_size, filepath))
+            total = sum(size for _, size, _ in entries)
+            for _, size, filepath in sorted(entries):
+                if total <= self.max_bytes:
+                    break
+                if filepath == keep:
+                    continue
+                with file_lock(filepath):
+                    if os.path.exists(filepath):
+                        os.remove(filepath)
+                total -= size
+                count(evictions=1)
+
+
+_default_cache = None
+
+
+def default_cache():
+    global _default_cache
+    if _default_cache is None:
+        _default_cache = ObjectCache()
+    return _default_cache
+
+
+def save_object(obj, object_name):
+    """Save an object to the object cache; it is loadable for the rest of the day"""
+    default_cache().put(object_name, obj)
+
+
+def load_object(object_name):
+    """Load an object saved today, or None"""
+    return default_cache().get(object_name)
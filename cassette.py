@@ -0,0 +1,171 @@
+import os
+import json
+import gzip
+import time
+import base64
+import hashlib
+import logging
+import threading
+from datetime import timedelta
+from urllib.parse import urlparse, parse_qsl, urlencode
+import requests
+from requests.structures import CaseInsensitiveDict
+
+CASSETTE_VERSION = 1
+MODE_RECORD = "record"
+MODE_REPLAY = "replay"
+# Token exchanges carry secrets in the body and the response, so they are matched on the URL alone and scrubbed
+TOKEN_HOSTS = ["api.login.yahoo.com"]
+REDACTED_FIELDS = ["access_token", "refresh_token", "id_token", "xoauth_yahoo_guid"]
+# Bodies are stored already decoded, so Content-Encoding is deliberately not kept
+KEPT_HEADERS = ["Content-Type"]
+
+
+class CassetteMissError(requests.ConnectionError):
+    """Raised in replay mode for a request that was never recorded"""
+
+
+def request_key(method, url, body=None):
+    """Match requests on method, URL with sorted query parameters and a hash of the body"""
+    parsed = urlparse(url)
+    query = urlencode(sorted(parse_qsl(parsed.query, keep_blank_values=True)))
+    key = f"{method} {parsed.scheme}://{parsed.netloc}{parsed.path}?{query}"
+    if body and parsed.netloc not in TOKEN_HOSTS:
+        body = body.encode() if isinstance(body, str) else body
+        key += f" #{hashlib.sha1(body).hexdigest()[:12]}"
+    return key
+
+
+def redact(url, content):
+    if urlparse(url).netloc not in TOKEN_HOSTS:
+        return content
+    try:
+        payload = json.loads(content)
+    except ValueError:
+        return content
+    for field in REDACTED_FIELDS:
+        if field in payload:
+            payload[field] = "replay"
+    return json.dumps(payload).encode()
+
+
+class Cassette:
+    """Records every response sent through requests.Session, or serves them back in recorded order.
+
+    latency is the delay added to each replayed response: a number of seconds, or "recorded" to
+    replay the time each response originally took.
+    """
+
+    def __init__(self, path, mode=MODE_REPLAY, latency=0.0):
+        self.logger = logging.getLogger(__name__)
+        self.path = path
+        self.mode = mode
+        self.latency = latency
+        self.lock = threading.Lock()
+        self.interactions = []
+        self.bodies = []
+        self.body_index = {}
+        self.meta = {}
+        self.queues = {}
+        self.original_send = None
+        if mode == MODE_REPLAY:
+            self.load()
+
+    def load(self):
+        with gzip.open(self.path, "rt") as f:
+            data = json.load(f)
+        if data.get("version") != CASSETTE_VERSION:
+            raise ValueError(f"Cassette {self.path} has version {data.get('version')}, expected {CASSETTE_VERSION}")
+        self.meta = data.get("meta", {})
+        self.bodies = [base64.b64decode(body["base64"]) if isinstance(body, dict) else body.encode("utf-8") for body in data["bodies"]]
+        self.interactions = data["interactions"]
+        self.rewind()
+        self.logger.info(f"Loaded {len(self.interactions)} interactions from {self.path}")
+
+    def rewind(self):
+        """Serve responses from the start of the recording again"""
+        self.queues = {}
+        for interaction in self.interactions:
+            self.queues.setdefault(interaction["key"], []).append(interaction)
+
+    def save(self):
+        bodies = []
+        for body in self.bodies:
+            try:
+                bodies.append(body.decode("utf-8"))
+            except UnicodeDecodeError:
+                bodies.append({"base64": base64.b64encode(body).decode()})
+        data = {"version": CASSETTE_VERSION, "meta": self.meta, "bodies": bodies, "interactions": self.interactions}
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp_path = f"{self.path}.tmp-{os.getpid()}"
+        with gzip.open(tmp_path, "wt") as f:
+            json.dump(data, f, separators=(",", ":"))
+        os.replace(tmp_path, self.path)
+        self.logger.info(f"Saved {len(self.interactions)} interactions ({len(self.bodies)} distinct bodies) to {self.path}")
+
+    def store_body(self, content):
+        """Identical bodies, like repeated schedule pages, are stored once"""
+        digest = hashlib.sha1(content).hexdigest()
+        if digest not in self.body_index:
+            self.body_index[digest] = len(self.bodies)
+            self.bodies.append(content)
+        return self.body_index[digest]
+
+    def record(self, request, response, elapsed):
+        content = redact(request.url, response.content or b"")
+        with self.lock:
+            self.interactions.append(
+                {
+                    "key": request_key(request.method, request.url, request.body),
+                    "status": response.status_code,
+                    "headers": {name: response.headers[name] for name in KEPT_HEADERS if name in response.headers},
+                    "body": self.store_body(content),
+                    "elapsed": round(elapsed, 4),
+                }
+            )
+
+    def replay(self, request):
+        key = request_key(request.method, request.url, request.body)
+        with self.lock:
+            queue = self.queues.get(key)
+            if not queue:
+                raise CassetteMissError(f"No recorded response for {key}")
+            # Recorded order is kept, and the last response is served again once the queue is used up
+            interaction = queue.pop(0) if len(queue) > 1 else queue[0]
+
+        delay = interaction["elapsed"] if self.latency == "recorded" else float(self.latency or 0)
+        if delay:
+            time.sleep(delay)
+
+        response = requests.Response()
+        response.status_code = interaction["status"]
+        response.headers = CaseInsensitiveDict(interaction["headers"])
+        response._content = self.bodies[interaction["body"]]
+        response.url = request.url
+        response.request = request
+        response.encoding = requests.utils.get_encoding_from_headers(response.headers)
+        response.elapsed = timedelta(seconds=delay)
+        return response
+
+    def install(self):
+        """Patch requests.Session.send. Install before telemetry hooks so replayed requests are still counted"""
+        self.original_send = requests.Session.send
+        cassette = self
+
+        def send(session, request, **kwargs):
+            if cassette.mode == MODE_REPLAY:
+                return cassette.replay(request)
+            started = time.perf_counter()
+            response = cassette.original_send(session, request, **kwargs)
+            cassette.record(request, response, time.perf_counter() - started)
+            return response
+
+        requests.Session.send = send
+        return self
+
+    def uninstall(self):
+        if self.original_send is not None:
+            requests.Session.send = self.original_send
+            self.original_send = None
+        if self.mode == MODE_RECORD:
+            self.save()
@@ -0,0 +1,92 @@
+import time
+import signal
+import logging
+from datetime import datetime, timedelta
+
+# How often each data source is refreshed and each action is run while the daemon is up
+DAEMON_INTERVALS = {
+    "schedule": timedelta(minutes=30),
+    "starting_goalies": timedelta(minutes=20),
+    "projections": timedelta(hours=12),
+    "pools": timedelta(hours=1),
+    "stats": timedelta(hours=1),
+    "roster": timedelta(minutes=20),
+    "lineup": timedelta(minutes=20),
+    "free_agents": timedelta(hours=1),
+}
+# Local hours (America/New_York on the runner) during which roster actions are taken
+ACTIVE_HOURS = range(9, 20)
+ACTION_JOBS = ["lineup", "free_agents"]
+
+
+class Job:
+    def __init__(self, name, interval, func, next_run):
+        self.name = name
+        self.interval = interval
+        self.func = func
+        self.next_run = next_run
+        self.last_duration = None
+
+
+class BotDaemon:
+    """Keeps a Manager's state warm and refreshes each data source and action on its own interval"""
+
+    def __init__(self, manager, intervals=None, active_hours=ACTIVE_HOURS):
+        self.logger = logging.getLogger(__name__)
+        self.manager = manager
+        self.intervals = {**DAEMON_INTERVALS, **(intervals or {})}
+        self.active_hours = active_hours
+        self.stopped = False
+
+        funcs = {
+            "schedule": manager.refresh_schedule,
+            "starting_goalies": manager.refresh_starting_goalies,
+            "projections": manager.refresh_projections,
+            "pools": manager.refresh_pools,
+            "stats": manager.refresh_stats,
+            "roster": manager.refresh_roster,
+            "lineup": lambda: manager.run_actions(free_agents=False, lineup=True),
+            "free_agents": lambda: manager.run_actions(free_agents=True, lineup=False),
+        }
+        now = datetime.now()
+        # Manager just loaded everything, so data sources wait a full interval while actions run right away
+        self.jobs = [
+            Job(name, interval, funcs[name], now if name in ACTION_JOBS else now + interval)
+            for name, interval in self.intervals.items()
+            if name in funcs
+        ]
+
+    def stop(self, *args):
+        self.logger.info("Stopping daemon after the current job")
+        self.stopped = True
+
+    def run_job(self, job, now):
+        if job.name in ACTION_JOBS and now.hour not in self.active_hours:
+            self.logger.debug(f"Skipping {job.name}, outside of active hours")
+        else:
+            started = time.perf_counter()
+            try:
+                job.func()
+            except Exception as e:
+                self.logger.error(f"Daemon job {job.name} failed: {e}")
+            job.last_duration = time.perf_counter() - started
+            self.logger.info(f"Daemon job {job.name} finished in {job.last_duration:.3f}s")
+        job.next_run = now + job.interval
+
+    def run_pending(self, now=None):
+        """Run every job that is due and return the time the next one is due"""
+        now = now or datetime.now()
+        for job in sorted(self.jobs, key=lambda j: j.next_run):
+            if job.next_run <= now and not self.stopped:
+                self.run_job(job, now)
+        return min(job.next_run for job in self.jobs)
+
+    def run_forever(self):
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+        self.logger.info(f"Daemon started with jobs: {[job.name for job in self.jobs]}")
+        while not self.stopped:
+            next_run = self.run_pending()
+            # Sleep in short steps so a stop signal is honoured promptly
+            while not self.stopped and datetime.now() < next_run:
+                time.sleep(min(1.0, max(0.0, (next_run - datetime.now()).total_seconds())))
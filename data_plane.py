@@ -0,0 +1,44 @@
+import logging
+import telemetry
+
+
+class StatsDataPlane:
+    """Yahoo player stats and details for one run, each fetched at most once.
+
+    Stat rows come through the StatLineStore, so lines still fresh on disk are not fetched either. A player
+    requested once for a period is never requested again in the run, even when Yahoo returned no row for
+    them, and any later request for the same (player ids, period) is answered from memory.
+    """
+
+    def __init__(self, league, stat_lines):
+        self.logger = logging.getLogger(__name__)
+        self.league = league
+        self.stat_lines = stat_lines
+        self.rows = {}
+        self.requested = {}
+        self.details = {}
+
+    def player_stats(self, player_ids, period):
+        """Stat rows for the players and period, in the order of player_ids"""
+        rows = self.rows.setdefault(period, {})
+        requested = self.requested.setdefault(period, set())
+        missing = list(dict.fromkeys(str(player_id) for player_id in player_ids if str(player_id) not in requested))
+        telemetry.count("data_plane", stat_hits=len(player_ids) - len(missing), stat_misses=len(missing))
+        if missing:
+            for row in self.stat_lines.refresh(self.league, [int(player_id) for player_id in missing], period):
+                rows[str(row["player_id"])] = row
+            requested.update(missing)
+            self.stat_lines.save()
+        return [rows[str(player_id)] for player_id in player_ids if str(player_id) in rows]
+
+    def player_details(self, player_ids):
+        """Yahoo player details for the ids, in the order of player_ids"""
+        missing = list(dict.fromkeys(str(player_id) for player_id in player_ids if str(player_id) not in self.details))
+        telemetry.count("data_plane", detail_hits=len(player_ids) - len(missing), detail_misses=len(missing))
+        if missing:
+            for detail in self.league.player_details([int(player_id) for player_id in missing]):
+                self.details[str(detail["player_id"])] = detail
+            # Ids Yahoo has no details for are not asked for again
+            for player_id in missing:
+                self.details.setdefault(player_id, None)
+        return [self.details[str(player_id)] for player_id in player_ids if self.details.get(str(player_id)) is not None]
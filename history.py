@@ -0,0 +1,211 @@
+import os
+import shutil
+import logging
+from datetime import datetime
+from cache import CACHE_DIR, file_lock
+from snapshot import StringTable, STRING_COLUMNS, player_columns, read_snapshot, write_snapshot
+from util.lazy import lazy_import
+
+np = lazy_import("numpy")
+
+HISTORY_DIR = os.path.join(CACHE_DIR, "history")
+SEGMENTS_DIR = "segments"
+COMPACTED_DIR = "compacted"
+# The current season is compacted once it has this many daily segments waiting
+COMPACT_SEGMENTS = 14
+# NHL seasons start in October, so September and later belong to the season named by that year
+SEASON_START_MONTH = 9
+
+logger = logging.getLogger(__name__)
+
+
+def season_of(day):
+    return str(day.year if day.month >= SEASON_START_MONTH else day.year - 1)
+
+
+class PlayerHistory:
+    """Append-only daily player snapshots, one columnar segment per run, compacted into one store per season.
+
+    Segments and compacted stores use the snapshot format, so reads are memory-mapped; every row carries
+    the day it was taken as a date ordinal in the "date" column.
+    """
+
+    def __init__(self, path=HISTORY_DIR):
+        self.logger = logging.getLogger(__name__)
+        self.path = path
+
+    def season_path(self, season):
+        return os.path.join(self.path, str(season))
+
+    def seasons(self):
+        if not os.path.isdir(self.path):
+            return []
+        return sorted(name for name in os.listdir(self.path) if os.path.isdir(os.path.join(self.path, name)))
+
+    def segment_names(self, season):
+        segments_path = os.path.join(self.season_path(season), SEGMENTS_DIR)
+        if not os.path.isdir(segments_path):
+            return []
+        return sorted(name for name in os.listdir(segments_path) if ".tmp-" not in name)
+
+    def append(self, players, time_periods, when=None):
+        """Write today's players as a new segment, then compact any season that is due"""
+        when = when or datetime.now()
+        season = season_of(when)
+        try:
+            columns, header = player_columns(players, time_periods)
+            columns["date"] = np.full(len(players), when.date().toordinal(), dtype=np.int32)
+            path = os.path.join(self.season_path(season), SEGMENTS_DIR, when.strftime("%Y-%m-%dT%H%M%S"))
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            write_snapshot(path, columns, header)
+            self.logger.info(f"Appended {len(players)} players to the {season} history")
+        except Exception as e:
+            self.logger.error(f"Error appending to player history: {e}")
+            return
+        for held_season in self.seasons():
+            waiting = len(self.segment_names(held_season))
+            if waiting and (held_season != season or waiting >= COMPACT_SEGMENTS):
+                self.compact(held_season)
+
+    def compacted_versions(self, season):
+        """Directories holding written versions of a season's compacted store, the current one among them"""
+        season_path = self.season_path(season)
+        if not os.path.isdir(season_path):
+            return []
+        return sorted(name for name in os.listdir(season_path) if name.startswith(f"{COMPACTED_DIR}-") and ".tmp-" not in name)
+
+    def compact(self, season):
+        """Merge a season's compacted store and waiting segments, keeping the last run of each day"""
+        season_path = self.season_path(season)
+        compacted_path = os.path.join(season_path, COMPACTED_DIR)
+        with file_lock(compacted_path):
+            names = self.segment_names(season)
+            if not names:
+                return
+            compacted = read_snapshot(compacted_path)
+            if compacted is None and (os.path.lexists(compacted_path) or self.compacted_versions(season)):
+                # Rebuilding from the waiting segments alone would drop every day already compacted
+                self.logger.error(f"Not compacting the {season} history: its compacted store can't be read, the {len(names)} waiting segments are kept")
+                return
+            latest = {}
+            for name in names:
+                segment = read_snapshot(os.path.join(season_path, SEGMENTS_DIR, name))
+                if segment is not None and len(segment):
+                    latest[int(segment.columns["date"][0])] = segment
+            merged = []
+            if compacted is not None:
+                # Days already compacted are replaced by a newer run of the same day
+                merged.append((compacted, ~np.isin(compacted.columns["date"], list(latest))))
+            merged += [latest[day] for day in sorted(latest)]
+            if merged:
+                columns, header = merge_columns(merged)
+                self.swap_compacted(season, columns, header)
+            for name in names:
+                shutil.rmtree(os.path.join(season_path, SEGMENTS_DIR, name), ignore_errors=True)
+            self.logger.info(f"Compacted {len(names)} segments into the {season} history")
+
+    def swap_compacted(self, season, columns, header):
+        """Write a new version of the season's compacted store, then point the compacted link at it with one rename.
+
+        The link is replaced atomically, so the compacted path always holds either the old or the new store;
+        older versions are only deleted once nothing points at them.
+        """
+        season_path = self.season_path(season)
+        compacted_path = os.path.join(season_path, COMPACTED_DIR)
+        version = f"{COMPACTED_DIR}-{datetime.now().strftime('%Y%m%dT%H%M%S%f')}"
+        write_snapshot(os.path.join(season_path, version), columns, header)
+        previous = [name for name in self.compacted_versions(season) if name != version]
+        if os.path.isdir(compacted_path) and not os.path.islink(compacted_path):
+            # A store compacted before versions were linked is moved aside; while it is, compact() refuses to run
+            legacy = f"{COMPACTED_DIR}-legacy"
+            os.rename(compacted_path, os.path.join(season_path, legacy))
+            previous.append(legacy)
+        link_path = f"{compacted_path}.tmp-{os.getpid()}"
+        if os.path.lexists(link_path):
+            os.remove(link_path)
+        os.symlink(version, link_path)
+        os.replace(link_path, compacted_path)
+        for name in previous:
+            shutil.rmtree(os.path.join(season_path, name), ignore_errors=True)
+
+    def snapshots(self, seasons=None):
+        """Memory-mapped compacted stores and waiting segments, oldest first"""
+        snapshots = []
+        for season in seasons or self.seasons():
+            compacted = read_snapshot(os.path.join(self.season_path(season), COMPACTED_DIR))
+            if compacted is not None:
+                snapshots.append(compacted)
+            for name in self.segment_names(season):
+                segment = read_snapshot(os.path.join(self.season_path(season), SEGMENTS_DIR, name))
+                if segment is not None:
+                    snapshots.append(segment)
+        return snapshots
+
+    def series(self, player_id, column="unified_score", period=None, stat=None, seasons=None):
+        """(dates, values) for one player across the history; stats need a period and a stat name"""
+        dates = []
+        values = []
+        for snapshot in self.snapshots(seasons):
+            rows = np.flatnonzero(snapshot.columns["player_id"] == int(player_id))
+            if not len(rows):
+                continue
+            dates.append(snapshot.columns["date"][rows])
+            if column == "stats":
+                if period not in snapshot.time_periods or stat not in snapshot.stat_names:
+                    values.append(np.full(len(rows), np.nan))
+                    continue
+                values.append(snapshot.columns["stats"][rows, snapshot.time_periods.index(period), snapshot.stat_names.index(stat)])
+            elif column == "weighted_score":
+                values.append(snapshot.columns["weighted_score"][rows, snapshot.time_periods.index(period)])
+            else:
+                values.append(snapshot.columns[column][rows])
+        if not dates:
+            return np.array([], dtype=np.int32), np.array([])
+        return np.concatenate(dates), np.concatenate(values)
+
+
+def merge_columns(parts):
+    """Concatenate snapshots (or (snapshot, row mask) pairs) into one set of columns with shared string tables"""
+    parts = [part if isinstance(part, tuple) else (part, None) for part in parts]
+    time_periods = parts[0][0].time_periods
+    strings = {column: StringTable() for column in STRING_COLUMNS}
+    eligible = StringTable()
+    stat_names = StringTable()
+    for snapshot, _ in parts:
+        for stat in snapshot.stat_names:
+            stat_names.code(stat)
+        for position in snapshot.strings["eligible"].values:
+            eligible.code(position)
+
+    merged = {}
+    for snapshot, mask in parts:
+        rows = np.flatnonzero(mask) if mask is not None else np.arange(len(snapshot))
+        columns = {}
+        for column, values in snapshot.columns.items():
+            if column in STRING_COLUMNS:
+                codes = np.array([strings[column].code(value) for value in snapshot.strings[column].values], dtype=np.int32)
+                columns[column] = codes[values[rows]] if len(codes) else np.zeros(len(rows), dtype=np.int32)
+            elif column == "eligible":
+                bits = [eligible.codes[position] for position in snapshot.strings["eligible"].values]
+                masks = np.asarray(values[rows], dtype=np.uint64)
+                remapped = np.zeros(len(rows), dtype=np.uint64)
+                for bit, new_bit in enumerate(bits):
+                    remapped |= ((masks >> np.uint64(bit)) & np.uint64(1)) << np.uint64(new_bit)
+                columns[column] = remapped
+            elif column in ("stats", "stats_present"):
+                # Stat axes are re-indexed into the merged stat names
+                shape = (len(rows), len(time_periods), len(stat_names.values))
+                target = np.full(shape, np.nan) if column == "stats" else np.zeros(shape, dtype=bool)
+                indexes = [stat_names.codes[stat] for stat in snapshot.stat_names]
+                target[:, :, indexes] = values[rows]
+                columns[column] = target
+            else:
+                columns[column] = np.asarray(values[rows])
+        for column, values in columns.items():
+            merged.setdefault(column, []).append(values)
+
+    columns = {column: np.concatenate(values) for column, values in merged.items()}
+    tables = {column: table.values for column, table in strings.items()}
+    tables["eligible"] = eligible.values
+    header = {"count": len(columns["player_id"]), "time_periods": list(time_periods), "stat_names": stat_names.values, "strings": tables}
+    return columns, header
@@ -10,6 +10,13 @@ import sys
 import yahoo.api as api
 import argparse
 from util.parse import FantasyHockeyProjectionScraper, FantasyHockeyGoalieScraper, StartingGoalieScraper
+from stat_lines import StatLineStore
+from data_plane import StatsDataPlane
+from aggregates import StatAggregateStore
+from windows import DailyStatLedger, GOALIE_GAME_STATS, STAT_WINDOWS
+from roster_writes import RosterWriteBuffer
+from cache import ObjectCache
+from util.identity import quanthockey_name
 
 logging.basicConfig(
     level=logging.INFO,
@@ -22,6 +29,29 @@ logging.getLogger("urllib3").setLevel(logging.WARNING)
 logging.getLogger("yahoo_api").setLevel(logging.INFO)
 logging.getLogger("config").setLevel(logging.INFO)
 
+HOUR = 60 * 60
+# How long past the day it was fetched for an object may still be served while it is refetched in the background.
+# The refetch runs on its own thread, so only keys whose fetch just returns a value may be listed
+STALE_SECONDS = {
+    "player_projections": 24 * HOUR,
+    "goalie_extra_stats": 24 * HOUR,
+    "taken_players_raw": 6 * HOUR,
+    "free_agents_skaters_raw": 6 * HOUR,
+    "free_agents_goalies_raw": 6 * HOUR,
+}
+# Objects built from other cached objects stop being valid when any of these is stored again. The team is
+# stored again after every lineup or IL write, so the league aggregates only follow the player pools and
+# their roster part is rebuilt on each run instead
+CACHE_DEPENDENCIES = {
+    "lineup": ["team"],
+    "active_players": ["team"],
+    "moves_left": ["team"],
+    "league_statistics": ["taken_players_raw", "free_agents_skaters_raw", "free_agents_goalies_raw"],
+    "league_normalized_stats": ["league_statistics"],
+    "league_average_goalie_stats": ["league_statistics"],
+    "league_average_skater_stats": ["league_statistics"],
+}
+
 
 class TeamManager:
     def __init__(self, yApi, dry_run=False, cache=False):
@@ -29,10 +59,16 @@ class TeamManager:
         self.cache = cache
         self.today = str(datetime.date.today())
         self.stats_dir = os.path.join(os.path.dirname(__file__), "stored_stats")
+        self.stat_lines = StatLineStore(os.path.join(self.stats_dir, "stat_lines.json"))
+        self.data = StatsDataPlane(yApi.league, self.stat_lines)  # every stats and details read goes through here
+        self.aggregates = StatAggregateStore()  # taken players' stat lines, for the league averages
+        self.ledger = DailyStatLedger(os.path.join(self.stats_dir, "daily_lines.json"))  # per-date lines for STAT_WINDOWS
+        self.objects = ObjectCache(os.path.join(self.stats_dir, "objects"))  # team, pools and statistics from earlier runs
         self.dry_run = dry_run
         self.previous_lineup = None
         self.lineup = None  # dict of roster, grouped by position
         self.lineup_changes = []
+        self.roster_writes = RosterWriteBuffer(yApi.team)  # IL, bench and lineup moves, sent together
         self.roster = []  # list of all players, not grouped by position
         self.teams_playing = {}
         self.league_statistics = {}
@@ -98,6 +134,7 @@ class TeamManager:
                 self.update_roster_info()
             else:
                 self.update_roster_info()
+                self.roster_writes.set_current(self.current_positions())
                 return team
         else:
             logging.info("No cached team or lineup found, fetching from Yahoo API")
@@ -105,10 +142,12 @@ class TeamManager:
         lineups = {}
         team = []
         self.active_players = []
+        # One request per 25 players instead of one per player
+        players_data = self.yApi.getPlayersData([self.yApi.credentials["game_key"] + ".p." + str(player["player_id"]) for player in roster])
 
         for player in roster:
             position = player["selected_position"]
-            player_data = self._build_player_data(player)
+            player_data = self._build_player_data(player, players_data)
             player_data["percent_owned"] = self.yApi.league.percent_owned([player["player_id"]])[0]["percent_owned"]
 
             player_data["locked"] = int(player_data["percent_owned"]) >= 80
@@ -132,16 +171,33 @@ class TeamManager:
 
         self.update_roster_info()
         if self.cache:
-            with open(os.path.join(self.stats_dir, f"{self.today}_team.json"), "w") as f:
-                json.dump(self.roster, f)
-            with open(os.path.join(self.stats_dir, f"{self.today}_lineup.json"), "w") as f:
-                json.dump(self.lineup, f)
-            with open(os.path.join(self.stats_dir, f"{self.today}_active_players.json"), "w") as f:
-                json.dump(self.active_players, f)
-            with open(os.path.join(self.stats_dir, f"{self.today}_moves_left.json"), "w") as f:
-                json.dump(self.moves_left, f)
+            # The team goes first, so the objects built from it record the version they match
+            self.objects.put("team", self.roster)
+            self.objects.put("lineup", self.lineup, CACHE_DEPENDENCIES["lineup"])
+            self.objects.put("active_players", self.active_players, CACHE_DEPENDENCIES["active_players"])
+            self.objects.put("moves_left", self.moves_left, CACHE_DEPENDENCIES["moves_left"])
+        self.roster_writes.set_current(self.current_positions())
         return team
 
+    def current_positions(self):
+        return {player["key"].split(".")[2]: player["current_position"] for player in self.roster}
+
+    def stage_position_change(self, player_id, position):
+        """Stage a move and apply it to the local roster so the following steps see it"""
+        self.roster_writes.stage(player_id, position)
+        for player in self.roster:
+            if player["key"].split(".")[2] == str(player_id):
+                player["current_position"] = position
+
+    def flush_roster_writes(self):
+        """Send every staged move in one change_positions call per date and refetch the team once"""
+        if self.dry_run:
+            logging.info(f"Dry run: would have sent {self.roster_writes.pending}")
+            self.roster_writes.discard()
+            return
+        if self.roster_writes.flush():
+            self.get_team(True)
+
     def get_roster(self):
         return self.roster
 
@@ -165,8 +221,9 @@ class TeamManager:
         logging.info(f"Current active players: {active_roster_count}")
         return required_total, active_roster_count
 
-    def _build_player_data(self, player):
-        player_data = self.yApi.getPlayerData(self.yApi.credentials["game_key"] + ".p." + str(player["player_id"]))
+    def _build_player_data(self, player, players_data=None):
+        player_key = self.yApi.credentials["game_key"] + ".p." + str(player["player_id"])
+        player_data = players_data[player_key] if players_data and player_key in players_data else self.yApi.getPlayerData(player_key)
 
         player_data["current_position"] = player["selected_position"]
         player_data["key"] = self.yApi.credentials["game_key"] + ".p." + str(player["player_id"])
@@ -254,12 +311,9 @@ class TeamManager:
                 else:
                     logging.debug(f"Player {player_name} is not eligible for IL")
         logging.info(f"Players to put on IL: {players_to_put_on_il}")
-        if players_to_put_on_il:
-            if not self.dry_run:
-                logging.info(f"Attempting to put {len(players_to_put_on_il)} players onto inactives")
-                logging.info(f"Players: {players_to_put_on_il}")
-                self.yApi.team.change_positions(datetime.datetime.now(), players_to_put_on_il)
-                self.get_team(True)
+        # Sent with the lineup in set_best_lineup
+        for move in players_to_put_on_il:
+            self.stage_position_change(move["player_id"], move["selected_position"])
 
     def put_players_on_bench_from_inactive(self):
         logging.info("Starting to check for players that are no longer inactive/injured to put on bench")
@@ -324,10 +378,9 @@ class TeamManager:
                 logging.info(f"Player {player_name} is no longer inactive and is currently in an inactive position.")
 
         logging.info(f"Total players attempting to move to bench from IL: {len(players_to_bench)}")
-        if players_to_bench:
-            if not self.dry_run:
-                self.yApi.team.change_positions(datetime.datetime.now(), players_to_bench)
-                self.get_team(True)
+        # Sent with the lineup in set_best_lineup
+        for move in players_to_bench:
+            self.stage_position_change(move["player_id"], move["selected_position"])
 
     def get_least_owned_players_sorted(self):
         logging.info("Starting to sort the roster by ascending ownership percentage, excluding locked players")
@@ -358,7 +411,7 @@ class TeamManager:
 
         # Collect player IDs for the API call
         player_ids = [player[id_key] for player in player_list]
-        player_details = self.yApi.league.player_details(player_ids)
+        player_details = self.data.player_details(player_ids)
 
         positions = "available_positions" if location == "roster" else "eligible_positions"
         team_key = "id" if location == "roster" else "player_id"
@@ -385,8 +438,8 @@ class TeamManager:
                 "game_today": has_game_today,
             }
         for time_frame in self.time_periods:
-            # Fetch the stats from the league API
-            player_stats = self.yApi.league.player_stats(player_ids, req_type=time_frame)
+            # Only stat lines past their refresh schedule are fetched from the league API
+            player_stats = self.data.player_stats(player_ids, time_frame)
             # Store stats in the dictionary under their respective time frame
             # for player in self.roster:
             #     stat_roster_list[player["name"]][time_frame] = {}
@@ -397,6 +450,18 @@ class TeamManager:
                 # player = {"name": stat["name"], "id": stat["player_id"], "stats": {time_frame: cleaned_stats}}
                 stat_roster_list[stat["name"]][time_frame] = cleaned_stats
 
+        # Windows Yahoo has no req_type for are summed from the per-date stat lines refreshed by fetch_players_stats
+        categories = self.yApi.skater_categories + self.yApi.goalie_categories
+        for window, days in STAT_WINDOWS.items():
+            window_lines = self.ledger.window_lines(player_ids, categories + GOALIE_GAME_STATS, days)
+            for player in player_list:
+                player_stats = stat_roster_list[player["name"]]
+                position_type = player_stats.get("season", {}).get("position_type", "G" if "G" in player[positions] else "P")
+                # Goalies carry GP and TOI, as the scraped periods do
+                role_categories = self.yApi.goalie_categories + GOALIE_GAME_STATS if position_type == "G" else self.yApi.skater_categories
+                line = {stat: value for stat, value in window_lines[player[id_key]].items() if stat in role_categories}
+                player_stats[window] = {"position_type": position_type, **line}
+
         logging.info("Player stats for all time frames updated successfully in self.league_stats")
         logging.debug(f"League stats: {stat_roster_list}")
         return stat_roster_list
@@ -422,55 +487,22 @@ class TeamManager:
         goalies = [player for player in taken_players if "G" in player["eligible_positions"]]
         logging.info(f"Total goalies taken: {len(goalies)}")
 
-        # Initialize sums and counts for averaging
-        goalie_stats = {}
-        count = {}
-
         # Prepare list of goalie player IDs
         goalie_ids = [goalie["player_id"] for goalie in goalies]
         logging.info(f"Goalie IDs collected: {goalie_ids}")
 
-        # Fetch stats for all goalies for the specified time period using the league API
-
-        goalie_player_stats = self.yApi.league.player_stats(goalie_ids, req_type=time_period)
+        # Already fetched with the taken players' stats, so this is answered from the data plane
+        goalie_player_stats = self.data.player_stats(goalie_ids, time_period)
         logging.debug(f"Fetched goalie stats for time period {time_period}: {goalie_player_stats}")
 
-        # Sum up stats for all goalies
         for stat in goalie_player_stats:
-            for key, value in stat.items():
-                if key == "name":
-                    goalie_name = value
-                    gp = self.find_player_in_stats(goalie_name, "taken", time_period).get("GP", 0)
-                    toi = self.find_player_in_stats(goalie_name, "taken", time_period).get("TOI", 0)
-                    gp_float = float(gp) if isinstance(gp, (int, float, str)) and str(gp).replace(".", "", 1).isdigit() else 0
-                    toi_float = float(toi) if isinstance(toi, (int, float, str)) and str(toi).replace(".", "", 1).isdigit() else 0
-                    if "GP" in goalie_stats:
-                        goalie_stats["GP"] += gp_float
-                        count["GP"] += 1
-                    else:
-                        goalie_stats["GP"] = gp_float
-                        count["GP"] = 1
-
-                    if "TOI" in goalie_stats:
-                        goalie_stats["TOI"] += toi_float
-                        count["TOI"] += 1
-                    else:
-                        goalie_stats["TOI"] = toi_float
-                        count["TOI"] = 1
-
-                if key not in ["player_id", "name", "position_type"]:
-                    # Convert value to float to ensure correct data type for arithmetic operations
-                    float_value = float(value) if isinstance(value, (int, float, str)) and str(value).replace(".", "", 1).isdigit() else 0
-                    if key in goalie_stats:
-                        goalie_stats[key] += float_value
-                        count[key] += 1
-                    else:
-                        goalie_stats[key] = float_value
-                        count[key] = 1
-
-        # Calculate averages
-        average_stats = {key: goalie_stats[key] / count[key] for key in goalie_stats if count[key] > 0}
+            line = {key: value for key, value in stat.items() if key not in ["player_id", "name", "position_type"]}
+            goalie_period_stats = self.find_player_in_stats(stat["name"], "taken", time_period) or {}
+            line["GP"] = goalie_period_stats.get("GP", 0)
+            line["TOI"] = goalie_period_stats.get("TOI", 0)
+            self.aggregates.upsert(stat["player_id"], "goalies", time_period, line)
 
+        average_stats = self.aggregates.averages("goalies", time_period)
         logging.debug(f"Average stats for goalies for {time_period}: {average_stats}")
         return average_stats
 
@@ -483,34 +515,19 @@ class TeamManager:
         skaters = [player for player in taken_players if "G" not in player["eligible_positions"]]
         logging.info(f"Total skaters taken: {len(skaters)}")
 
-        # Initialize sums and counts for averaging
-        skater_stats = {}
-        count = {}
-
         # Prepare list of skater player IDs
         skater_ids = [skater["player_id"] for skater in skaters]
         logging.debug(f"Skater IDs collected: {skater_ids}")
 
-        # Fetch stats for all goalies for the specified time period using the league API
-        skater_player_stats = self.yApi.league.player_stats(skater_ids, req_type=time_period)
+        # Already fetched with the taken players' stats, so this is answered from the data plane
+        skater_player_stats = self.data.player_stats(skater_ids, time_period)
         logging.debug(f"Fetched skater stats for time period {time_period}: {skater_player_stats}")
 
-        # Sum up stats for all skaters
         for stat in skater_player_stats:
-            for key, value in stat.items():
-                if key not in ["player_id", "name", "position_type"]:
-                    # Convert value to float to ensure correct data type for arithmetic operations
-                    float_value = float(value) if isinstance(value, (int, float, str)) and str(value).replace(".", "", 1).isdigit() else 0
-                    if key in skater_stats:
-                        skater_stats[key] += float_value
-                        count[key] += 1
-                    else:
-                        skater_stats[key] = float_value
-                        count[key] = 1
-
-        # Calculate averages
-        average_stats = {key: skater_stats[key] / count[key] for key in skater_stats if count[key] > 0}
+            line = {key: value for key, value in stat.items() if key not in ["player_id", "name", "position_type"]}
+            self.aggregates.upsert(stat["player_id"], "skaters", time_period, line)
 
+        average_stats = self.aggregates.averages("skaters", time_period)
         logging.debug(f"Average stats for skaters for {time_period}: {average_stats}")
         return average_stats
 
@@ -520,7 +537,7 @@ class TeamManager:
         normalized_roster_stats = {name: {} for name in stats_dict}
 
         # Iterate over each time frame to normalize stats
-        for time_frame in self.time_periods:
+        for time_frame in self.time_periods + list(STAT_WINDOWS):
             # Extract all player stats for this time frame
             time_frame_stats = {name: player_stats.get(time_frame, {}) for name, player_stats in stats_dict.items()}
             # logging.info(f"Time frame stats: {time_frame_stats}")
@@ -536,7 +553,7 @@ class TeamManager:
 
                         is_goalie = stats["position_type"] == "G"
                         league_average_stats = self.league_average_goalie_stats if is_goalie else self.league_average_skater_stats
-                        average_stat_value = league_average_stats[time_frame].get(stat, 0)
+                        average_stat_value = league_average_stats.get(time_frame, {}).get(stat, 0)
                         # Handle goalie stats where lower is better
                         if is_goalie:
                             if average_stat_value != 0:
@@ -566,7 +583,7 @@ class TeamManager:
                             value = float(value) if value.replace(".", "", 1).isdigit() else 0
                         position_type = stats["position_type"]
                         league_average_stats = self.league_average_goalie_stats if position_type == "G" else self.league_average_skater_stats
-                        average_stat_value = league_average_stats[time_frame].get(stat, 0)
+                        average_stat_value = league_average_stats.get(time_frame, {}).get(stat, 0)
                         if average_stat_value != 0:
                             value = value / average_stat_value
 
@@ -777,21 +794,17 @@ class TeamManager:
         # Log final calculated lineup with all required positions filled, including bench
         logging.info(f"Final calculated lineup including bench: {calculated_lineup}")
         self.lineup = calculated_lineup
-        original_lineup_payload = self.get_roster_update_payload_on_lineup(self.previous_lineup)
         new_lineup_payload = self.get_roster_update_payload_on_lineup(calculated_lineup)
-        # Sort both lists in place
-        original_lineup_payload.sort(key=lambda x: (x["player_id"], x["selected_position"]))
-        new_lineup_payload.sort(key=lambda x: (x["player_id"], x["selected_position"]))
-
-        if not self.dry_run:
-            # self.yApi.roster_payload_manager.fill_roster(calculated_lineup)
-            logging.info(f"Payload: {new_lineup_payload}")
-            if len(new_lineup_payload) > 0 and new_lineup_payload != original_lineup_payload:
-                self.yApi.team.change_positions(datetime.datetime.now(), new_lineup_payload)
-                logging.info("Lineup changed")
-                self.get_team(True)
-            else:
-                logging.info("No changes to lineup")
+        logging.info(f"Payload: {new_lineup_payload}")
+        for move in new_lineup_payload:
+            self.roster_writes.stage(move["player_id"], move["selected_position"])
+        # The IL and bench moves staged earlier go out in the same call; moves matching Yahoo are dropped
+        if self.roster_writes.has_changes():
+            self.flush_roster_writes()
+            logging.info("Lineup changed")
+        else:
+            self.roster_writes.discard()
+            logging.info("No changes to lineup")
         return completed_swaps
 
     def get_roster_update_payload_on_lineup(self, lineup):
@@ -975,7 +988,7 @@ class TeamManager:
         logging.info(f"Lineup changes: {self.get_lineup_changes()}")
 
     def get_player_positions(self, player_id):
-        player_details = self.yApi.league.player_details(player_id)
+        player_details = self.data.player_details([player_id])
         return player_details[0]["eligible_positions"]
 
     def fetch_players_stats(self):
@@ -986,12 +999,7 @@ class TeamManager:
             scraper_goalies.fetch_data()
             skaters = scraper_skaters.fetch_all_players()
             goalies = scraper_goalies.fetch_all_players()
-
-            self.player_projections = {**skaters, **goalies}
-            if self.cache:
-                with open(os.path.join(self.stats_dir, f"{self.today}_player_projections.json"), "w") as f:
-                    json.dump(self.player_projections, f)
-            return self.player_projections
+            return {**skaters, **goalies}
 
         def scrape_goalies_extra_stats():
             scrape_goalies_extra_stats = FantasyHockeyGoalieScraper()
@@ -1009,26 +1017,31 @@ class TeamManager:
         # self.league_average_goalie_stats = self._load_or_fetch("league_average_goalie_stats", self.get_league_average_goalie_stats)
         # self.league_average_skater_stats = self._load_or_fetch("league_average_skater_stats", self.get_league_average_skater_stats)
 
-        try:
-            self.league_statistics = {}
-            if self.cache:
-                with open(os.path.join(self.stats_dir, f"{self.today}_league_statistics.json"), "r") as f:
-                    self.league_statistics = json.load(f)
-        except FileNotFoundError:
+        self.league_statistics = (self.objects.get("league_statistics") if self.cache else None) or {}
+        fetched_statistics = not self.league_statistics
+        # The per-date lines behind STAT_WINDOWS are refreshed once for every location being built, so a date is
+        # only fetched for the players it is missing for
+        pools = [self.taken_players_raw, self.free_agents_skaters_raw, self.free_agents_goalies_raw] if fetched_statistics else []
+        player_ids = [player["player_id"] for pool in pools for player in pool] + [player["id"] for player in self.roster]
+        self.ledger.refresh(self.yApi.league, list(dict.fromkeys(player_ids)), days=max(STAT_WINDOWS.values()))
+        if fetched_statistics:
             logging.info("No cached league statistics found, fetching fresh data")
-        if not self.league_statistics:
             self.league_statistics["taken"] = self.get_stats_for_league(location="taken")
             self.league_statistics["free_agents_skaters"] = self.get_stats_for_league(location="free_agents", position="P")
             self.league_statistics["free_agents_goalies"] = self.get_stats_for_league(location="free_agents", position="G")
-            self.league_statistics["roster"] = self.get_stats_for_league(location="roster")
+        # The roster changes with every add and drop, so its part is rebuilt on each run rather than served from the cache
+        self.league_statistics["roster"] = self.get_stats_for_league(location="roster")
 
         # ADD TOI AND GP TO GOALIE STATS
+        # quanthockey names are ASCII-stripped and escaped, so both sides are keyed by the form quanthockey produces
+        goalie_extra_stats = {
+            period: {quanthockey_name(name): stats for name, stats in self.goalie_extra_stats.get(period, {}).items()} for period in self.time_periods
+        }
         for location in ["taken", "free_agents_goalies", "roster"]:
             for player_name, player_stats in self.league_statistics[location].items():
                 if "G" in player_stats.get("available_positions", []):  # Check if player is a goalie
                     for period in self.time_periods:
-                        period_stats = self.goalie_extra_stats.get(period, {})
-                        goalie = period_stats.get(player_name, "")
+                        goalie = goalie_extra_stats[period].get(quanthockey_name(player_name), "")
 
                         if goalie:
                             # logging.info(f"adding gp for period {period}")
@@ -1040,31 +1053,22 @@ class TeamManager:
                             player_stats[period]["GP"] = int(goalie.get("GP", 0))
                             player_stats[period]["TOI"] = float(toi_float)
 
+        # Stored before the averages and normalized stats are built, so they record this version as their dependency
+        if self.cache and fetched_statistics:
+            self.objects.put("league_statistics", self.league_statistics, CACHE_DEPENDENCIES["league_statistics"])
         self.league_average_goalie_stats = self._load_or_fetch("league_average_goalie_stats", self.get_league_average_goalie_stats)
         self.league_average_skater_stats = self._load_or_fetch("league_average_skater_stats", self.get_league_average_skater_stats)
-        if self.cache:
-            with open(os.path.join(self.stats_dir, f"{self.today}_league_statistics.json"), "w") as f:
-                json.dump(self.league_statistics, f)
-        try:
-            self.league_normalized_stats = {}
-            if self.cache:
-                with open(os.path.join(self.stats_dir, f"{self.today}_league_normalized_stats.json"), "r") as f:
-                    self.league_normalized_stats = json.load(f)
-        except FileNotFoundError:
+        self.league_normalized_stats = (self.objects.get("league_normalized_stats") if self.cache else None) or {}
+        fetched_normalized = not self.league_normalized_stats
+        if fetched_normalized:
             logging.info("No cached league normalized stats found, fetching fresh data")
-        if not self.league_normalized_stats:
             self.league_normalized_stats["taken"] = self.normalize_stats(self.league_statistics["taken"])
             self.league_normalized_stats["free_agents_skaters"] = self.normalize_stats(self.league_statistics["free_agents_skaters"])
             self.league_normalized_stats["free_agents_goalies"] = self.normalize_stats(self.league_statistics["free_agents_goalies"])
-            self.league_normalized_stats["roster"] = self.normalize_stats(self.league_statistics["roster"])
+        self.league_normalized_stats["roster"] = self.normalize_stats(self.league_statistics["roster"])
 
-        if self.cache:
-            with open(os.path.join(self.stats_dir, f"{self.today}_league_normalized_stats.json"), "w") as f:
-                json.dump(self.league_normalized_stats, f)
-            with open(os.path.join(self.stats_dir, f"{self.today}_league_average_goalie_stats.json"), "w") as f:
-                json.dump(self.league_average_goalie_stats, f)
-            with open(os.path.join(self.stats_dir, f"{self.today}_league_average_skater_stats.json"), "w") as f:
-                json.dump(self.league_average_skater_stats, f)
+        if self.cache and fetched_normalized:
+            self.objects.put("league_normalized_stats", self.league_normalized_stats, CACHE_DEPENDENCIES["league_normalized_stats"])
 
     def set_league_rankings(self):
         locations = ["taken", "free_agents", "roster"]
@@ -1074,7 +1078,7 @@ class TeamManager:
         except FileNotFoundError:
             for location in locations:
                 self.league_rankings[location] = {}
-                for time_frame in self.time_periods:
+                for time_frame in self.time_periods + list(STAT_WINDOWS):
                     if location == "free_agents":
                         skater_ranks = self.rank_players_by_time_period(time_frame, self.league_normalized_stats["free_agents_skaters"])
                         goalie_ranks = self.rank_players_by_time_period(time_frame, self.league_normalized_stats["free_agents_goalies"])
@@ -1083,8 +1087,6 @@ class TeamManager:
 
                     else:
                         self.league_rankings[location][time_frame] = self.rank_players_by_time_period(time_frame, self.league_normalized_stats[location])
-                averaged_rankings = self._average_player_data(self.league_rankings[location]["lastweek"], self.league_rankings[location]["lastmonth"])
-                self.league_rankings[location]["lasttwoweeks"] = self.sort_and_rank_players(averaged_rankings)
 
         # with open(os.path.join(self.stats_dir, f"{self.today}_league_rankings.json"), "w") as f:
         #     json.dump(self.league_rankings, f)
@@ -1119,46 +1121,6 @@ class TeamManager:
             else:
                 return False
 
-    def _average_player_data(self, week_data, month_data):
-        """Helper method to average player data from two time periods with 60/40 weighting."""
-        averaged_data = []
-
-        # Define weights (60% week, 40% month)
-        WEEK_WEIGHT = 0.5
-        MONTH_WEIGHT = 0.5
-
-        # Create dictionaries for easier lookup
-        week_dict = {name: data for name, data in week_data}
-        month_dict = {name: data for name, data in month_data}
-
-        # Get all unique player names
-        all_players = set(week_dict.keys()) | set(month_dict.keys())
-
-        for player in all_players:
-            week_stats = week_dict.get(player, {})
-            month_stats = month_dict.get(player, {})
-
-            if not week_stats or not month_stats:
-                # If player only exists in one period, use that period's data
-                combined_stats = week_stats or month_stats
-            else:
-                # Weighted average of numeric values
-                combined_stats = {
-                    "score": (week_stats.get("score", 0) * WEEK_WEIGHT + month_stats.get("score", 0) * MONTH_WEIGHT),
-                    "advanced_score": (week_stats.get("advanced_score", 0) * WEEK_WEIGHT + month_stats.get("advanced_score", 0) * MONTH_WEIGHT),
-                    "weighted_score": (week_stats.get("weighted_score", 0) * WEEK_WEIGHT + month_stats.get("weighted_score", 0) * MONTH_WEIGHT),
-                    "projections_score": (week_stats.get("projections_score", 0) * WEEK_WEIGHT + month_stats.get("projections_score", 0) * MONTH_WEIGHT),
-                    "percent_owned": (week_stats.get("percent_owned", 0) * WEEK_WEIGHT + month_stats.get("percent_owned", 0) * MONTH_WEIGHT),
-                    # Preserve non-numeric values from either period
-                    "position_type": week_stats.get("position_type") or month_stats.get("position_type"),
-                    "available_positions": week_stats.get("available_positions") or month_stats.get("available_positions"),
-                    "on_current_roster": week_stats.get("on_current_roster") or month_stats.get("on_current_roster"),
-                }
-
-            averaged_data.append((player, combined_stats))
-
-        return averaged_data
-
     def compare_roster_to_free_agents(self, potential_free_agents_skaters, potential_free_agents_goalies):
         current_roster_skaters = self.get_league_ranks_by_time_period("lastweek", "taken", roster_only=True, position_type="P")
         current_roster_goalies = self.get_league_ranks_by_time_period("lastweek", "taken", roster_only=True, position_type="G")
@@ -1668,31 +1630,16 @@ class TeamManager:
         return filtered_stats
 
     def _load_or_fetch(self, filename, fetch_func, **kwargs):
+        """Today's cached object, a recently stale one while it is refetched in the background, or a fresh fetch"""
         if not self.cache:
             if fetch_func is not None:
                 data = fetch_func(**kwargs)
                 return data
             return None
-        stats_dir = "stored_stats"
-
-        # Ensure the stats directory exists
-        os.makedirs(stats_dir, exist_ok=True)
-        filepath = os.path.join(stats_dir, f"{self.today}_{filename}.json")
-
-        if os.path.exists(filepath):
-            with open(filepath, "r") as f:
-                return json.load(f)
-
-        logging.info(f"Fetching fresh data for {filename}")
-        if fetch_func is not None:
-            data = fetch_func(**kwargs)
-
-            # Cache the results
-            with open(filepath, "w") as f:
-                json.dump(data, f)
-        else:
-            data = None
-        return data
+        if fetch_func is None:
+            return self.objects.get(filename)
+        stale = STALE_SECONDS.get(filename, 0)
+        return self.objects.get_or_fetch(filename, fetch_func, stale=stale, depends=CACHE_DEPENDENCIES.get(filename, ()), **kwargs)
 
 
 if __name__ == "__main__":
@@ -1,15 +1,17 @@
 import os
-import cache
+from pools import PlayerPoolSync
 import logging
 from datetime import datetime
 from player import Player
 from util import constants
+import universe
 
-from tqdm import tqdm
+from util.lazy import tqdm
+from telemetry import span
 
 
 class League:
-    def __init__(self, yahoo_api, league_key, team_key, nhl):
+    def __init__(self, yahoo_api, league_key, team_key, nhl, load_players=True):
         self.logger = logging.getLogger(__name__)
         self.yahoo_api = yahoo_api
         self.league = self.yahoo_api.league
@@ -22,13 +24,15 @@ class League:
         self.league_categories = self.league.stat_categories()
         self.inverse_league_stats = ["L", "GA", "GAA"]
         self.nhl = nhl
+        # Details and stat lines come from the game's shared universe; ownership and pools stay with this league
+        self.universe = universe.for_game(universe.game_key_of(league_key))
         self.skater_categories = [cat["display_name"] for cat in self.league_categories if cat["position_type"] == "P"]
         self.goalie_categories = [cat["display_name"] for cat in self.league_categories if cat["position_type"] == "G"]
         self.average_weighted_scores = {}
         self.inactive_positions = ["IR+", "IL", "NA", "IR", "IR-LT"]
         self.not_playing_statuses = ["DTD", "O", "IR-LT"]
 
-        self.time_periods = ["lastweek", "lastmonth", "season"]
+        self.time_periods = list(constants.TIME_PERIODS)
         self.team_data = self.league.teams()[self.team_key]
 
         self.required_roster_spots = self.get_required_roster_spots()
@@ -42,27 +46,30 @@ class League:
 
         self.players_details = {"taken": [], "free_agents": [], "roster": []}
         self.players = {"taken": [], "free_agents": []}
-        self.initialize_players()
+        if load_players:
+            self.initialize_players()
 
-        self.logger.info(f"Loaded {len(self.players['taken'])} taken players")
-        self.logger.info(f"Loaded {len(self.players['free_agents'])} free agents")
+            self.logger.info(f"Loaded {len(self.players['taken'])} taken players")
+            self.logger.info(f"Loaded {len(self.players['free_agents'])} free agents")
 
+    @span("league.initialize_players")
     def initialize_players(self):
         if os.environ.get("CACHE_ENABLED", False) == "True":
-            self.players["taken"] = cache.load_object("taken") or self.fetch_players_raw(location="taken")
-            cache.save_object(self.players["taken"], "taken")
-            fa_skaters = cache.load_object("free_agents_skaters") or self.fetch_players_raw(location="free_agents")
-            fa_goalies = cache.load_object("free_agents_goalies") or self.fetch_players_raw(location="free_agents_goalies")
-            cache.save_object(fa_skaters, "free_agents_skaters")
-            cache.save_object(fa_goalies, "free_agents_goalies")
-
-            self.players["free_agents"].extend(fa_skaters)
-            self.players["free_agents"].extend(fa_goalies)
+            # Pools are carried over from the last run and moved along by the league's add/drop feed
+            taken, free_agents = PlayerPoolSync(self).sync()
+            self.players["taken"] = taken
+            self.players["free_agents"].extend(free_agents)
         else:
             self.players["taken"] = self.fetch_players_raw(location="taken")
             self.players["free_agents"].extend(self.fetch_players_raw(location="free_agents"))
             self.players["free_agents"].extend(self.fetch_players_raw(location="free_agents_goalies"))
 
+    def refresh_players(self):
+        self.players = {"taken": [], "free_agents": []}
+        self.initialize_players()
+        self.logger.info(f"Refreshed {len(self.players['taken'])} taken players and {len(self.players['free_agents'])} free agents")
+
+    @span("league.fetch_players_raw")
     def fetch_players_raw(self, location="taken"):
         self.logger.info(f"Fetching {location} players from Yahoo API")
         players = []
@@ -96,7 +103,7 @@ class League:
 
     def get_players_details(self, players):
         player_ids = [player.player_id for player in players]
-        roster_details = self.yahoo_api.league.player_details(player_ids)
+        roster_details = self.universe.player_details(self.league, player_ids)
         player_teams = {int(detail["player_id"]): detail["editorial_team_full_name"] for detail in roster_details}
         for player in tqdm(players, desc="Fetching additional player details.."):
             if player.player_id in player_teams:
@@ -105,8 +112,9 @@ class League:
         return roster_details
 
     def update_player_rankings(self, players, evaluate=False):
+        ranked = {p.player_id: p for p in self.player_statistics.master_player_rankings.players}
         for player in tqdm(players, desc="Updating player rankings.."):
-            p = next((p for p in self.player_statistics.master_player_rankings.players if p.name == player.name), None)
+            p = ranked.get(player.player_id)
             if p:
                 player.rankings = p.rankings
                 if evaluate:
@@ -1,7 +1,7 @@
 import logging
 from itertools import combinations
 import itertools
-from tqdm import tqdm
+from util.lazy import tqdm
 from stats import LeagueStatistics
 
 
@@ -1,15 +1,33 @@
 #!/usr/bin/env python
 
 
+import time
+
+PROCESS_START = time.perf_counter()
+
 import logging
 from league import League
 import yahoo.api as api
 import os
 from roster import Roster
 from nhl import NHL
-import cache
+from util.parse import StartingGoalieScraper
+import snapshot
 from stats import LeagueStatistics
 import datetime
+import argparse
+from daemon import BotDaemon
+from pipeline import Pipeline, Stage
+from roster_writes import LineupFingerprints
+from history import PlayerHistory
+import matchup
+from util import constants
+from yahoo import scheduler
+import telemetry
+
+# Rankings from the last full run, used by --lineup-only runs instead of rebuilding statistics
+RANKINGS_SNAPSHOT = "rankings"
+RANKINGS_SNAPSHOT_DATE = "latest"
 
 logging.basicConfig(
     level=logging.INFO,
@@ -20,44 +38,177 @@ logging.basicConfig(
 
 
 class Manager:
-    def __init__(self, yahoo_api):
+    def __init__(self, yahoo_api, run_actions=True, lineup_only=False, nhl=None, week=False, free_agents=True, use_matchup=False):
         self.cache = True
         # os.environ["CACHE_ENABLED"] = str(self.cache)
 
         self.logger = logging.getLogger(__name__)
         self.yahoo_api = yahoo_api
-        league = self.yahoo_api.league
-        league_key = self.yahoo_api.league_key
-        team_key = self.yahoo_api.team_key
-
+        self.league_key = self.yahoo_api.league_key
+        self.team_key = self.yahoo_api.team_key
+        self.time_to_first_decision = None
+
+        self.lineup_only = lineup_only
+        # Add and drop players as well as setting the lineup
+        self.free_agents = free_agents
+        # Pick free agent adds and drops by this week's matchup win probability instead of last week's scores
+        self.use_matchup = use_matchup
+        self.matchup = None
+        self.matchup_moves = []
+        # Also submit lineups for the rest of the scoring week
+        self.week = week
+        # A prebuilt NHL (shared across teams, or synthetic) replaces the schedule, projections and starters stages
+        self.prebuilt_nhl = nhl
+        self.saved_nhl = snapshot.load_nhl() if self.cache and nhl is None else None
+        # The game's shared stat line store, picked once the league's categories are known
+        self.stat_lines = None
+        self.pipeline = self.build_pipeline()
+
+        self.load_state()
+        if run_actions:
+            self.run_actions(free_agents=self.free_agents and not self.lineup_only)
         if self.cache:
-            self.logger.info("Loading or fetching NHL objects...")
-            nhl = cache.load_object("nhl") or NHL()
-            cache.save_object(nhl, "nhl")
-
-            self.league = cache.load_object("league") or League(self.yahoo_api, league_key, team_key, nhl)
-            self.roster = cache.load_object("roster") or Roster(self.yahoo_api, self.league)
-
-            league_player_statistics = LeagueStatistics(self.yahoo_api, league_key, team_key, self.league.nhl, self.roster)
-            self.league.player_statistics = league_player_statistics
-
+            self.record_history()
+
+    def build_pipeline(self):
+        """Describe a run as stages with declared inputs so independent ones can run side by side"""
+        stages = [
+            Stage("schedule", NHL.get_all_teams_next_games, load=self.cached_schedule),
+            Stage("projections", self.fetch_projections, load=self.cached_projections),
+            Stage("goalie_starters", self.fetch_goalie_starters),
+            Stage("nhl", self.build_nhl, inputs=["schedule", "projections", "goalie_starters"], load=self.load_prebuilt_nhl),
+            Stage("league", self.build_league, inputs=["nhl"]),
+            Stage("roster", self.build_roster, inputs=["league"]),
+            Stage("pools", self.load_pools, inputs=["league"]),
+        ]
+        stat_stages = [f"stats:{period}" for period in constants.TIME_PERIODS]
+        for period, name in zip(constants.TIME_PERIODS, stat_stages):
+            stages.append(
+                Stage(name, lambda pools, roster, period=period: self.refresh_stat_lines(period, pools, roster), inputs=["pools", "roster"], load=self.cached_stats)
+            )
+        stages += [
+            Stage("statistics", self.build_statistics, inputs=["league", "roster", "pools"] + stat_stages),
+            Stage("rankings", self.rank_players, inputs=["statistics"]),
+            Stage("cached_rankings", self.apply_cached_rankings, inputs=["roster"]),
+            Stage("inactive", self.move_inactive_players, inputs=["roster"], cache=False),
+            Stage("matchup", self.simulate_matchup, inputs=["league", "roster", "pools", "rankings"], cache=False),
+            Stage("free_agents", self.add_free_agents, inputs=["roster", "pools", "rankings"], after=["inactive", "matchup"], cache=False),
+            Stage("lineup", self.set_lineup, inputs=["roster"], after=["inactive", "free_agents", "rankings", "cached_rankings"], cache=False),
+            Stage("week_lineups", self.set_week_lineups, inputs=["roster"], after=["lineup"], cache=False),
+        ]
+        return Pipeline(stages)
+
+    def load_state(self):
+        """Build the NHL schedule, league pools, roster, statistics and rankings"""
+        if self.lineup_only:
+            self.lineup_only = self.pipeline.run(["cached_rankings"])["cached_rankings"]
+            if self.lineup_only:
+                return
+        self.pipeline.run(["rankings"])
+        self.log_summary()
+
+    def cached_schedule(self):
+        return self.saved_nhl.teams_playing if self.saved_nhl else None
+
+    def cached_projections(self):
+        if self.saved_nhl and self.saved_nhl.skaters:
+            return {"skaters": self.saved_nhl.skaters, "goalies": self.saved_nhl.goalies, "goalie_extra_stats": self.saved_nhl.goalie_extra_stats}
+        return None
+
+    def cached_stats(self):
+        """Stat lines are not needed when today's stats snapshots are already saved"""
+        names = ["league_taken_stats", "league_free_agents_stats", "league_rostered_stats"]
+        if self.cache and all(os.path.exists(snapshot.snapshot_path(name)) for name in names):
+            return True
+        return None
+
+    def fetch_projections(self):
+        # Lineup-only runs do not use projections, so they are not scraped for them
+        return {} if self.lineup_only else NHL.fetch_projections()
+
+    def fetch_goalie_starters(self):
+        scraper = StartingGoalieScraper()
+        scraper.fetch_data()
+        return scraper
+
+    def build_nhl(self, teams_playing, projections, goalie_starters):
+        nhl = NHL(teams_playing=teams_playing, projections=projections, starting_goalie_scraper=goalie_starters)
+        if self.cache and projections:
+            snapshot.save_nhl(nhl)
+        return self.set_lock_times(nhl)
+
+    def load_prebuilt_nhl(self):
+        return self.set_lock_times(self.prebuilt_nhl) if self.prebuilt_nhl is not None else None
+
+    def set_lock_times(self, nhl):
+        """Give lineup writes the Yahoo request budget in the run-up to each day's first puck drop"""
+        lock_times = nhl.lock_times()
+        if lock_times:
+            scheduler.scheduler.set_lock_times(lock_times)
         else:
-            nhl = NHL()
-            self.league = League(self.yahoo_api, league_key, team_key, nhl)
-            self.roster = Roster(self.yahoo_api, self.league)
-            league_player_statistics = LeagueStatistics(self.yahoo_api, league_key, team_key, self.league.nhl, self.roster)
-            self.league.player_statistics = league_player_statistics
-
-        for time_period in self.league.time_periods:
-            self.league.average_weighted_scores[time_period] = self.league.player_statistics.master_player_rankings.get_weighted_score_statistics(time_period)
-
-        self.sync_roster_and_league()
-        self.league.player_statistics.master_player_rankings.evaluate_all_players()
+            self.logger.info(f"No game start times, lineups are assumed to lock at {scheduler.DEFAULT_LOCK_HOUR}:00")
+        return nhl
+
+    def build_league(self, nhl):
+        self.league = League(self.yahoo_api, self.league_key, self.team_key, nhl, load_players=False)
+        self.stat_lines = self.league.universe.stat_lines(self.league.league_categories)
+        return self.league
+
+    def build_roster(self, league):
+        self.roster = Roster(self.yahoo_api, league)
+        return self.roster
+
+    def load_pools(self, league):
+        league.initialize_players()
+        self.logger.info(f"Loaded {len(league.players['taken'])} taken players and {len(league.players['free_agents'])} free agents")
+        return league.players
+
+    def refresh_stat_lines(self, period, pools, roster):
+        player_ids = [player.player_id for player in pools["taken"] + pools["free_agents"] + roster.players]
+        return len(self.stat_lines.refresh(self.league.league, player_ids, period))
+
+    def build_statistics(self, league, roster, *args):
+        statistics = LeagueStatistics(self.yahoo_api, self.league_key, self.team_key, league.nhl, roster, league=league, stat_lines=self.stat_lines)
+        league.player_statistics = statistics
+        return statistics
+
+    def rank_players(self, statistics):
+        self.update_rankings()
+        return True
+
+    def apply_cached_rankings(self, roster):
+        """Apply the rankings saved by the last full run to the roster, returning False when a full load is needed"""
+        rankings = snapshot.read_snapshot(snapshot.snapshot_path(RANKINGS_SNAPSHOT, RANKINGS_SNAPSHOT_DATE))
+        if rankings is None:
+            self.logger.info("No saved rankings found, running a full load")
+            return False
+
+        ranked = {rankings.string("name", index): index for index in range(len(rankings))}
+        missing = [player.name for player in roster.players if player.name not in ranked]
+        if missing:
+            self.logger.info(f"Saved rankings are missing {missing}, running a full load")
+            return False
+        for player in roster.players:
+            index = ranked[player.name]
+            player.rankings = rankings.rankings(index)
+            player.unified_score = float(rankings.columns["unified_score"][index])
+        self.logger.info(f"Loaded rankings for {len(roster.players)} rostered players from {rankings.header['created']}")
+        return True
+
+    @telemetry.span("manager.update_rankings")
+    def update_rankings(self):
+        master_player_rankings = self.league.player_statistics.master_player_rankings
+        self.league.average_weighted_scores.update(master_player_rankings.get_weighted_score_statistics_by_period(self.league.time_periods))
+        master_player_rankings.evaluate_all_players(self.league)
+        if self.cache:
+            snapshot.save_players(master_player_rankings.players, RANKINGS_SNAPSHOT, self.league.time_periods, RANKINGS_SNAPSHOT_DATE)
 
         self.logger.info(f"Taken Players: {len(self.league.players['taken'])}")
         self.league.update_player_rankings(self.roster.players, evaluate=True)
         self.league.update_player_rankings(self.league.players["taken"])
         self.league.update_player_rankings(self.league.players["free_agents"])
+
+    def log_summary(self):
         self.logger.info(f"Average Weighted Scores: {self.league.average_weighted_scores}")
         for index, player in enumerate(self.league.players["taken"]):
             self.logger.info(f"{player}")
@@ -74,21 +225,138 @@ class Manager:
             if index > 3:
                 break
 
-        # cache.save_object(self.league, "league")
-        # cache.save_object(self.roster, "roster")
+    def all_players(self):
+        statistics = self.league.player_statistics
+        return self.roster.players + self.league.players["taken"] + self.league.players["free_agents"] + statistics.master_player_rankings.players
+
+    def refresh_schedule(self):
+        nhl = self.league.nhl
+        nhl.teams_playing = nhl.get_all_teams_next_games()
+        nhl.game_starts = nhl.get_game_starts()
+        self.set_lock_times(nhl)
+        for player in self.all_players():
+            player.game_today = nhl.teams_playing.get(player.team, False)
+
+    def refresh_starting_goalies(self):
+        goalies = [player for player in self.all_players() if player.is_goalie]
+        starting = self.league.nhl.starting_goalie_scraper.get_starting_goalies(list({player.name for player in goalies}))
+        for player in goalies:
+            player.starting_behind_net = starting.get(player.name, False)
+
+    def refresh_projections(self):
+        current = self.league.nhl
+        nhl = NHL(teams_playing=current.teams_playing, projections=NHL.fetch_projections(), starting_goalie_scraper=current.starting_goalie_scraper)
+        if self.cache:
+            snapshot.save_nhl(nhl)
+        self.league.nhl = nhl
+        self.league.player_statistics.nhl = nhl
+
+    def refresh_pools(self):
+        self.league.refresh_players()
+        statistics = self.league.player_statistics
+        statistics.players = self.league.players
+        statistics.players_details = self.league.players_details
+        self.update_rankings()
+
+    def refresh_stats(self):
+        self.league.player_statistics.refresh()
+        self.update_rankings()
+
+    def refresh_roster(self):
+        self.roster.get_roster()
+        self.league.update_player_rankings(self.roster.players, evaluate=True)
 
+    def move_inactive_players(self, roster):
         # self.roster.set_lineup()
-        self.roster.move_player_to_bench_from_inactive()
-        self.roster.move_injured_players_to_inactive()
-
-        if not self.roster.is_full():
-            if self.enough_moves_left():
-                self.roster.add_best_free_agent()
-            else:
-                self.logger.info("Not enough moves left at this point in the week, skipping free agent addition")
-        self.sync_roster_and_league()
-
-        self.roster.set_lineup()
+        roster.move_player_to_bench_from_inactive()
+        roster.move_injured_players_to_inactive()
+
+    def add_free_agents(self, roster, pools, rankings):
+        if self.use_matchup and self.matchup is not None:
+            return self.add_matchup_free_agent(roster)
+        if roster.is_full():
+            return
+        if self.enough_moves_left():
+            roster.add_best_free_agent()
+        else:
+            self.logger.info("Not enough moves left at this point in the week, skipping free agent addition")
+
+    def add_matchup_free_agent(self, roster):
+        """Make the add (and drop, on a full roster) that raises this week's win probability the most"""
+        if not self.enough_moves_left():
+            self.logger.info("Not enough moves left at this point in the week, skipping free agent addition")
+            return
+        best = self.matchup_moves[0] if self.matchup_moves else None
+        if best is None or best[2]["win"] < matchup.MIN_WIN_GAIN:
+            self.logger.info("No free agent raises the matchup win probability enough")
+            if not roster.is_full():
+                roster.add_best_free_agent()
+            return
+        free_agent, drop, gain = best
+        dropping = f" for {drop.name}" if drop else ""
+        self.logger.info(f"Adding {free_agent.name}{dropping}, {gain['win']:+.1%} win probability")
+        roster.add_and_drop_player(free_agent, drop)
+
+    def simulate_matchup(self, league, roster, pools, rankings):
+        """Log this week's category win probabilities and score every move that would raise them"""
+        try:
+            opponent_key = league.league.to_team(self.team_key).matchup(league.league.current_week())
+            opponent_ids = {str(entry["player_id"]) for entry in league.league.to_team(opponent_key).roster()}
+        except Exception as e:
+            self.logger.error(f"Error getting this week's opponent: {e}")
+            return None
+        opponents = [player for player in pools["taken"] if str(player.player_id) in opponent_ids]
+        candidates = [player for player in pools["free_agents"] if player.percent_owned > matchup.MIN_PERCENT_OWNED]
+        self.matchup = matchup.WeeklyMatchup(league, roster.players, opponents, candidates)
+        baseline = self.matchup.baseline
+        self.logger.info(f"Matchup win probability against {opponent_key}: {baseline['win']:.1%}")
+        for category, probability in baseline["categories"].items():
+            self.logger.info(f"- {category}: {probability:.1%}")
+        self.matchup_moves = self.matchup.score_free_agents(candidates, open_spot=not roster.is_full())
+        for free_agent, drop, gain in self.matchup_moves[:5]:
+            dropping = f" for {drop.name}" if drop else ""
+            self.logger.info(f"Adding {free_agent.name}{dropping}: {gain['win']:+.1%} win probability, {gain['expected_categories']:+.2f} categories")
+        return self.matchup
+
+    def set_lineup(self, roster):
+        roster.set_lineup()
+
+    def remaining_week_dates(self):
+        """Dates after today up to the end of the league's current scoring week"""
+        today = datetime.date.today()
+        try:
+            _, week_end = self.league.league.week_date_range(self.league.league.current_week())
+        except Exception as e:
+            self.logger.error(f"Error getting the scoring week, assuming it ends on Sunday: {e}")
+            week_end = today + datetime.timedelta(days=6 - today.weekday())
+        return [today + datetime.timedelta(days=offset) for offset in range(1, (week_end - today).days + 1)]
+
+    def set_week_lineups(self, roster):
+        dates = self.remaining_week_dates()
+        submitted = roster.set_future_lineups(dates, LineupFingerprints())
+        self.logger.info(f"Submitted lineups for {len(submitted)} of {len(dates)} remaining dates this week")
+        return submitted
+
+    def run_actions(self, free_agents=True, lineup=True):
+        """Move players between the inactive list and bench, fill open spots and set the lineup"""
+        targets = []
+        if lineup:
+            targets.append("inactive")
+        if free_agents:
+            if self.use_matchup:
+                targets.append("matchup")
+            targets.append("free_agents")
+        if lineup:
+            targets.append("lineup")
+        if lineup and self.week:
+            targets.append("week_lineups")
+        self.pipeline.run(targets)
+        # Anything the stages staged but did not send yet goes out in one call per date
+        self.roster.apply_lineup_changes()
+
+        if self.time_to_first_decision is None:
+            self.time_to_first_decision = time.perf_counter() - PROCESS_START
+            self.logger.info(f"Time to first decision: {self.time_to_first_decision:.2f}s")
 
         # if len(self.roster.change_position_payload) > 0:
         #     self.logger.info(f"Applying lineup changes for injured players: {len(self.roster.change_position_payload)}")
@@ -134,6 +402,15 @@ class Manager:
         # lineup.log_lineup()
         # self.roster.lineup = lineup.lineup
 
+    def record_history(self):
+        """Append today's players, one row each, to the player history; lineup-only runs have no fresh stats to add"""
+        if self.league.player_statistics is None:
+            return
+        # Later lists hold the ranked and evaluated copy of a player; the roster's own copy goes last so
+        # the history records which players were ours
+        players = {player.player_id: player for player in self.all_players()[len(self.roster.players) :] + self.roster.players}
+        PlayerHistory().append(list(players.values()), self.league.time_periods)
+
     def get_best_lineup(self):
         self.roster.lineup.calculate_best_lineup()
 
@@ -149,23 +426,26 @@ class Manager:
     def sync_roster(self):
         self.logger.info(f"Syncing roster. Current Moves Left: {self.roster.moves_left}")
         self.roster = Roster(self.yahoo_api, self.league)
-        if self.cache:
-            cache.save_object(self.roster, "roster")
         self.logger.info(f"Synced roster. Current Moves Left: {self.roster.moves_left}")
 
-    def sync_roster_and_league(self):
-        """Update all player objects with the current league reference"""
-        for player in self.roster.players:
-            player.league = self.league
-        for player in self.league.players["taken"]:
-            player.league = self.league
-        for player in self.league.players["free_agents"]:
-            player.league = self.league
-        for player in self.league.player_statistics.master_player_rankings.players:
-            player.league = self.league
-        self.roster.league = self.league
-
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--free-agents", dest="free_agents", action="store_true", help="Also add and drop free agents; without it the run only sets the lineup")
+    parser.add_argument("--lineup-only", dest="lineup_only", action="store_true", help="Only set the lineup, using the rankings saved by the last full run")
+    parser.add_argument("--report", dest="report", help="Where to write the JSON run report (defaults to cache/reports)")
+    parser.add_argument("--thresholds", dest="thresholds", help="JSON file of span and counter limits to flag regressions against")
+    parser.add_argument("--week", dest="week", action="store_true", help="Also submit lineups for the rest of the scoring week")
+    parser.add_argument("--matchup", dest="matchup", action="store_true", help="With --free-agents, choose the add and drop that raise this week's matchup win probability the most")
+    parser.add_argument("--daemon", dest="daemon", action="store_true", help="Keep state in memory and run refreshes and actions on a schedule")
+    args = parser.parse_args()
+    logging.info(f"Arguments: {args}")
+
+    telemetry.install_http_hooks()
     yahoo_api = api.YahooApi(os.path.dirname(os.path.realpath(__file__)))
-    manager = Manager(yahoo_api)
+    if args.daemon:
+        manager = Manager(yahoo_api, run_actions=False)
+        BotDaemon(manager).run_forever()
+    else:
+        manager = Manager(yahoo_api, lineup_only=args.lineup_only, week=args.week, free_agents=args.free_agents, use_matchup=args.matchup)
+    telemetry.write_report(args.report, telemetry.load_thresholds(args.thresholds) if args.thresholds else None)
@@ -0,0 +1,236 @@
+import logging
+from datetime import date as Date, timedelta
+from aggregates import numeric
+from windows import RATE_STATS
+from util.lazy import lazy_import
+import telemetry
+
+np = lazy_import("numpy")
+
+NUM_SIMULATIONS = 20000
+# Per game rates are an EWMA of the daily stat lines, weighted towards the last week
+MATCHUP_HALFLIFE = 7
+MATCHUP_DAYS = 14
+# Share of their team's games a goalie starts when the starters page has not named them
+GOALIE_START_SHARE = 0.6
+# Stats that can go negative are drawn from a normal distribution with this per game spread; the rest are Poisson
+NORMAL_STAT_SD = {"+/-": 1.2}
+# Same ownership floor as Roster.find_free_agents_by_positions
+MIN_PERCENT_OWNED = 15
+# Roster players each free agent is tried against as the drop, the ones whose loss alone costs the least
+DROP_CHOICES = 3
+# Smallest rise in win probability worth spending a move on
+MIN_WIN_GAIN = 0.02
+
+
+def active_slots(league):
+    """Count of each starting position; the bench and inactive slots do not score"""
+    return {position: data["count"] for position, data in league.league_positions.items() if position != "BN" and position not in league.inactive_positions}
+
+
+def lineup_rows(players, playing, slots, inactive_positions):
+    """Indexes of the players started on a day: healthy players with a game, best unified score first, each in the first open slot they fit"""
+    open_slots = dict(slots)
+    started = []
+    for index in sorted(range(len(players)), key=lambda index: players[index].unified_score or 0, reverse=True):
+        player = players[index]
+        if not playing(player) or player.is_inactive or player.position in inactive_positions:
+            continue
+        positions = [position for position in player.eligible_positions if position != "Util" and position not in inactive_positions]
+        if not player.is_goalie:
+            positions.append("Util")
+        position = next((position for position in positions if open_slots.get(position, 0) > 0), None)
+        if position:
+            open_slots[position] -= 1
+            started.append(index)
+    return started
+
+
+def poisson_quantiles(mean, uniforms):
+    """Poisson(mean) at the given uniforms by inverting the CDF, so draws that share uniforms move together as the mean changes"""
+    if mean <= 0:
+        return np.zeros(len(uniforms))
+    counts = np.arange(int(mean + 12 * np.sqrt(mean) + 12) + 1)
+    log_factorials = np.concatenate([[0.0], np.cumsum(np.log(counts[1:]))])
+    cdf = np.cumsum(np.exp(counts * np.log(mean) - mean - log_factorials))
+    return np.minimum(np.searchsorted(cdf, uniforms * cdf[-1], side="left"), counts[-1]).astype(float)
+
+
+class MatchupSimulator:
+    """Monte Carlo head-to-head week between two lines of expected totals.
+
+    A line holds, per stat, what a side has already banked this week, the expected total of its remaining
+    games and the games behind it. The opponent is drawn once; our side is redrawn for every line asked
+    about from the same uniforms and normals, so the change in win probability between two of our lines
+    reflects the lines and not the noise of two separate draws.
+    """
+
+    def __init__(self, categories, stats, inverse_stats, theirs, simulations=NUM_SIMULATIONS, seed=None):
+        self.logger = logging.getLogger(__name__)
+        rng = np.random.default_rng(seed)
+        self.stats = list(stats)
+        self.inverse_stats = inverse_stats
+        self.simulations = simulations
+        self.uniforms = rng.random((simulations, len(self.stats)))
+        self.normals = rng.standard_normal((simulations, len(self.stats)))
+        self.categories = [category for category in categories if self.can_simulate(category)]
+        skipped = [category for category in categories if category not in self.categories]
+        if skipped:
+            self.logger.info(f"Not simulating {skipped}, their components are not league categories")
+        self.theirs = self.sample(theirs, rng.random((simulations, len(self.stats))), rng.standard_normal((simulations, len(self.stats))))
+
+    def can_simulate(self, category):
+        if category == "GAA":
+            return "GA" in self.stats
+        if category == "SV%":
+            return "SV" in self.stats and "GA" in self.stats
+        return category in self.stats
+
+    def sample(self, line, uniforms, normals):
+        """Simulated weekly totals per stat for a line"""
+        totals = {}
+        for column, stat in enumerate(self.stats):
+            if stat in RATE_STATS:
+                continue
+            mean = line["means"][column]
+            if stat in NORMAL_STAT_SD:
+                draws = mean + np.sqrt(line["games"][column]) * NORMAL_STAT_SD[stat] * normals[:, column]
+            else:
+                draws = poisson_quantiles(mean, uniforms[:, column])
+            totals[stat] = line["banked"][column] + draws
+        # Ratios are rebuilt from their simulated components
+        with np.errstate(invalid="ignore", divide="ignore"):
+            if "GAA" in self.categories:
+                totals["GAA"] = totals["GA"] / line["goalie_games"] if line["goalie_games"] > 0 else np.zeros(self.simulations)
+            if "SV%" in self.categories:
+                totals["SV%"] = np.nan_to_num(totals["SV"] / (totals["SV"] + totals["GA"]))
+        return totals
+
+    def outcome(self, line):
+        """Category win probabilities (ties count half) and the chance of winning more categories than we lose"""
+        ours = self.sample(line, self.uniforms, self.normals)
+        wins = np.zeros(self.simulations)
+        losses = np.zeros(self.simulations)
+        categories = {}
+        for category in self.categories:
+            difference = ours[category] - self.theirs[category]
+            if category in self.inverse_stats:
+                difference = -difference
+            won = difference > 0
+            lost = difference < 0
+            wins += won
+            losses += lost
+            categories[category] = float(won.mean() + 0.5 * (~won & ~lost).mean())
+        win = float((wins > losses).mean() + 0.5 * (wins == losses).mean())
+        return {"win": win, "expected_categories": float(sum(categories.values())), "categories": categories}
+
+
+class WeeklyMatchup:
+    """This week's matchup against the opponent, built from the league's schedule and per-date stat lines.
+
+    Banked totals are the completed days of the week, counting only the players our lineup logic would have
+    started on each of them. Remaining totals are the players' per game rates times the games they are
+    expected to start through the end of the week.
+    """
+
+    def __init__(self, league, our_players, their_players, candidates=(), today=None, simulations=NUM_SIMULATIONS, seed=None):
+        self.logger = logging.getLogger(__name__)
+        self.league = league
+        statistics = league.player_statistics
+        self.stats = statistics.skater_categories + statistics.goalie_categories
+        self.slots = active_slots(league)
+        today = today or Date.today()
+        week_start, week_end = league.league.week_date_range(league.league.current_week())
+        self.today = today
+        self.banked_dates = [week_start + timedelta(days=offset) for offset in range(max(0, (today - week_start).days))]
+        self.dates = [today + timedelta(days=offset) for offset in range(max(0, (week_end - today).days + 1))]
+        self.schedule = {date: league.nhl.teams_playing if date == today else league.nhl.teams_playing_on(date) for date in self.dates}
+
+        players = {str(player.player_id): player for player in list(our_players) + list(their_players) + list(candidates)}
+        player_ids = list(players)
+        self.ledger = league.universe.daily_ledger(league.league_categories)
+        rates = statistics.ewma_stats([players[player_id] for player_id in player_ids], MATCHUP_HALFLIFE, days=MATCHUP_DAYS)
+        self.rates = {player_id: rates[row] for row, player_id in enumerate(player_ids)}
+
+        self.our_players = list(our_players)
+        theirs = self.line(their_players)
+        self.simulator = MatchupSimulator(
+            [category["display_name"] for category in league.league_categories], self.stats, league.inverse_league_stats, theirs, simulations, seed
+        )
+        self.baseline = self.simulator.outcome(self.line(self.our_players))
+
+    def expected_games(self, players):
+        """Games each player is expected to start over the rest of the week"""
+        games = np.zeros(len(players))
+        for date in self.dates:
+            playing = self.schedule[date]
+            for index in lineup_rows(players, lambda player: playing.get(player.team, False), self.slots, self.league.inactive_positions):
+                player = players[index]
+                if not player.is_goalie:
+                    games[index] += 1
+                elif date == self.today and player.starting_behind_net:
+                    games[index] += 1
+                else:
+                    games[index] += GOALIE_START_SHARE
+        return games
+
+    def banked(self, players):
+        """Totals and goalie games already played this week by the players that would have been started"""
+        totals = np.zeros(len(self.stats))
+        goalie_games = 0
+        for date in self.banked_dates:
+            lines = self.ledger.lines.get(str(date), {})
+            for index in lineup_rows(players, lambda player: str(player.player_id) in lines, self.slots, self.league.inactive_positions):
+                line = lines[str(players[index].player_id)]
+                totals += [numeric(line.get(stat)) or 0 for stat in self.stats]
+                goalie_games += players[index].is_goalie
+        return totals, goalie_games
+
+    def line(self, players):
+        players = list(players)
+        games = self.expected_games(players)
+        rates = np.array([self.rates.get(str(player.player_id), np.full(len(self.stats), np.nan)) for player in players]).reshape(len(players), len(self.stats))
+        played = ~np.isnan(rates)
+        banked, banked_goalie_games = self.banked(players)
+        is_goalie = np.array([player.is_goalie for player in players], dtype=bool)
+        return {
+            "means": (games[:, None] * np.where(played, rates, 0.0)).sum(axis=0),
+            "games": (games[:, None] * played).sum(axis=0),
+            "banked": banked,
+            "goalie_games": banked_goalie_games + games[is_goalie].sum(),
+        }
+
+    def move_gain(self, add=None, drop=None):
+        """Change in matchup and category win probability from adding and/or dropping a player"""
+        players = [player for player in self.our_players if drop is None or player.player_id != drop.player_id]
+        if add is not None:
+            players.append(add)
+        outcome = self.simulator.outcome(self.line(players))
+        return {
+            "win": outcome["win"] - self.baseline["win"],
+            "expected_categories": outcome["expected_categories"] - self.baseline["expected_categories"],
+            "categories": {category: value - self.baseline["categories"][category] for category, value in outcome["categories"].items()},
+        }
+
+    @telemetry.span("matchup.score_free_agents")
+    def score_free_agents(self, free_agents, open_spot=False):
+        """(free agent, dropped player or None, gain) for every free agent, best first.
+
+        With an open spot nobody is dropped. Otherwise each free agent is tried against the DROP_CHOICES roster
+        players whose loss alone costs the least and keeps the drop that leaves the best matchup.
+        """
+        if open_spot:
+            drops = [None]
+        else:
+            droppable = [player for player in self.our_players if not player.cant_cut]
+            drops = sorted(droppable, key=lambda player: self.move_gain(drop=player)["win"], reverse=True)[:DROP_CHOICES]
+        if not drops:
+            return []
+        scored = []
+        for free_agent in free_agents:
+            gains = [(drop, self.move_gain(add=free_agent, drop=drop)) for drop in drops]
+            drop, gain = max(gains, key=lambda item: (item[1]["win"], item[1]["expected_categories"]))
+            scored.append((free_agent, drop, gain))
+        # Expected categories break ties when the win probability is already settled either way
+        scored.sort(key=lambda item: (item[2]["win"], item[2]["expected_categories"]), reverse=True)
+        return scored
@@ -2,43 +2,115 @@ import logging
 from datetime import datetime
 import requests
 import json
-from util.constants import NHL_TEAM_ID, NEXT_GAME_URL
+from util.constants import NHL_TEAM_ID, NEXT_GAME_URL, SCHEDULE_URL
 from util.parse import FantasyHockeyProjectionScraper, FantasyHockeyGoalieScraper, StartingGoalieScraper
-from tqdm import tqdm
+from util.lazy import tqdm
+from telemetry import span
+
+logger = logging.getLogger(__name__)
 
 
 class NHL:
-    def __init__(self):
+    def __init__(self, teams_playing=None, projections=None, starting_goalie_scraper=None, week_schedule=None, game_starts=None):
+        """Schedule, projections and starting goalies are fetched unless they are passed in"""
         self.logger = logging.getLogger(__name__)
-        self.teams_playing = self.get_all_teams_next_games()
-        scraper_skaters_scraper = FantasyHockeyProjectionScraper(url="https://www.numberfire.com/nhl/fantasy/remaining-projections/skaters")
-        scraper_skaters_scraper.fetch_data()
-        scraper_goalies_scraper = FantasyHockeyProjectionScraper(url="https://www.numberfire.com/nhl/fantasy/remaining-projections/goalies")
-        scraper_goalies_scraper.fetch_data()
-        self.skaters = scraper_skaters_scraper.fetch_all_players()
-        self.goalies = scraper_goalies_scraper.fetch_all_players()
+        self.teams_playing = teams_playing if teams_playing is not None else self.get_all_teams_next_games()
+        projections = projections if projections is not None else self.fetch_projections()
+        self.skaters = projections.get("skaters", {})
+        self.goalies = projections.get("goalies", {})
         self.player_projections = {**self.skaters, **self.goalies}
-        scrape_goalies_extra_scraper = FantasyHockeyGoalieScraper()
+        self.goalie_extra_stats = projections.get("goalie_extra_stats", {})
+        self.starting_goalie_scraper = starting_goalie_scraper or StartingGoalieScraper()
+        # Teams playing on each date of the week, fetched the first time a future date is asked for
+        self.week_schedule = week_schedule
+        # First game start on each date of the week, fetched the first time the lineup lock times are asked for
+        self.game_starts = game_starts
 
-        self.goalie_extra_stats = scrape_goalies_extra_scraper.fetch_all_time_periods()
-        self.starting_goalie_scraper = StartingGoalieScraper()
+    @classmethod
+    def from_snapshot(cls, snapshot):
+        """Rebuild the schedule and projections from a snapshot without scraping"""
+        teams_playing = {team: bool(playing) for team, playing in zip(snapshot.strings["team"].values, snapshot.columns["playing"])}
+        return cls(teams_playing=teams_playing, projections=snapshot.extra)
 
-    # Remove the starting_goalie_scraper from the state to avoid pickling it
-    def __getstate__(self):
-        # Get the current state of the instance
-        state = self.__dict__.copy()
-        # Remove the attribute you want to ignore
-        if "starting_goalie_scraper" in state:
-            state["starting_goalie_scraper"] = None
-        return state
+    @staticmethod
+    @span("nhl.fetch_projections")
+    def fetch_projections():
+        skaters_scraper = FantasyHockeyProjectionScraper(url="https://www.numberfire.com/nhl/fantasy/remaining-projections/skaters")
+        skaters_scraper.fetch_data()
+        goalies_scraper = FantasyHockeyProjectionScraper(url="https://www.numberfire.com/nhl/fantasy/remaining-projections/goalies")
+        goalies_scraper.fetch_data()
+        return {
+            "skaters": skaters_scraper.fetch_all_players(),
+            "goalies": goalies_scraper.fetch_all_players(),
+            "goalie_extra_stats": FantasyHockeyGoalieScraper().fetch_all_time_periods(),
+        }
 
     def is_goalie_starting_behind_net(self, name):
         if not self.starting_goalie_scraper:
             self.starting_goalie_scraper = StartingGoalieScraper()
-        starting_behind_net = self.starting_goalie_scraper.get_starting_goalies([name]).get(name, False)
+        # The starters page is fetched once and then reused for every goalie
+        starting_behind_net = self.starting_goalie_scraper.get_starting_goalies([name], refresh=False).get(name, False)
         return starting_behind_net
 
-    def get_all_teams_next_games(self):
+    def teams_playing_on(self, date):
+        """Same format as teams_playing, for any date of the current week"""
+        if date == datetime.now().date():
+            return self.teams_playing
+        if self.week_schedule is None:
+            self.week_schedule = self.get_week_schedule()
+        playing = self.week_schedule.get(str(date), [])
+        return {team: team in playing for team in NHL_TEAM_ID.keys()}
+
+    def lock_times(self):
+        """When lineups lock on each date of the week: the first game's start, in local time"""
+        if self.game_starts is None:
+            self.game_starts = self.get_game_starts()
+        return [datetime.fromisoformat(start) for start in self.game_starts.values()]
+
+    @staticmethod
+    @span("nhl.get_game_starts")
+    def get_game_starts():
+        """
+        Returns the start of the first game on each date of the current week
+
+        Returns:
+            dict: Format {'YYYY-MM-DD': 'YYYY-MM-DDTHH:MM:SS'} in local time
+        """
+        game_starts = {}
+        try:
+            response = requests.get(SCHEDULE_URL)
+            for day in json.loads(response.content).get("gameWeek", []):
+                starts = [game["startTimeUTC"] for game in day.get("games", []) if game.get("startTimeUTC")]
+                if starts:
+                    first_start = datetime.fromisoformat(min(starts).replace("Z", "+00:00")).astimezone().replace(tzinfo=None)
+                    game_starts[day["date"]] = first_start.isoformat()
+        except Exception as e:
+            logger.error(f"Error getting the game start times for the week: {str(e)}")
+        return game_starts
+
+    @staticmethod
+    @span("nhl.get_week_schedule")
+    def get_week_schedule():
+        """
+        Returns the teams playing on each date of the current week
+
+        Returns:
+            dict: Format {'YYYY-MM-DD': ['Team Name', ...]}
+        """
+        week_schedule = {}
+        for team in tqdm(NHL_TEAM_ID.keys(), desc="Fetching NHL schedule for the week..."):
+            try:
+                response = requests.get(NEXT_GAME_URL % NHL_TEAM_ID[team])
+                for game in json.loads(response.content).get("games", []):
+                    if game.get("gameDate"):
+                        week_schedule.setdefault(game["gameDate"], []).append(team)
+            except Exception as e:
+                logger.error(f"Error getting the week schedule for {team}: {str(e)}")
+        return week_schedule
+
+    @staticmethod
+    @span("nhl.get_all_teams_next_games")
+    def get_all_teams_next_games():
         """
         Returns a dictionary of all NHL teams with boolean values indicating if they play today
 
@@ -51,7 +123,7 @@ class NHL:
         for team in tqdm(NHL_TEAM_ID.keys(), desc="Fetching NHL teams playing today..."):
             try:
                 url = NEXT_GAME_URL % NHL_TEAM_ID[team]
-                self.logger.debug("Next game url: %s" % url)
+                logger.debug("Next game url: %s" % url)
                 response = requests.get(url)
                 json_content = json.loads(response.content)
 
@@ -66,14 +138,14 @@ class NHL:
 
                 if next_game_date:
                     next_game_date = datetime.strptime(next_game_date, "%Y-%m-%d").date()
-                    self.logger.debug(f"Comparing {next_game_date} to {today}: {next_game_date == today}")
+                    logger.debug(f"Comparing {next_game_date} to {today}: {next_game_date == today}")
                     teams_playing[team] = next_game_date == today
                 else:
                     teams_playing[team] = False
 
             except Exception as e:
-                self.logger.error(f"Error getting next game for {team}: {str(e)}")
+                logger.error(f"Error getting next game for {team}: {str(e)}")
                 teams_playing[team] = False
 
-        self.logger.debug(f"Teams playing today: {teams_playing}")
+        logger.debug(f"Teams playing today: {teams_playing}")
         return teams_playing
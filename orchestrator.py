@@ -0,0 +1,114 @@
+#!/usr/bin/env python
+"""Runs the manager for every team in tokens/teams.json, building the NHL data once per cycle.
+
+    ./orchestrator.py [--lineup-only] [--free-agents [--matchup]] [--week] [--workers N]
+"""
+
+import os
+import time
+import logging
+import argparse
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import snapshot
+import telemetry
+import universe
+from nhl import NHL
+from cache import CACHE_DIR
+from util.config import Config
+from util.parse import StartingGoalieScraper
+from yahoo import scheduler
+
+DIRECTORY_PATH = os.path.dirname(os.path.realpath(__file__))
+# Each team keeps its snapshots and pool sync state in its own cache directory
+TEAMS_DIR = os.path.join(DIRECTORY_PATH, CACHE_DIR, "teams")
+# Player details and stat lines are shared by every team on the same game
+SHARED_UNIVERSE_DIR = os.path.join(DIRECTORY_PATH, CACHE_DIR, "universe")
+
+logging.basicConfig(level=logging.INFO, format="%(levelname)s: %(message)s")
+logger = logging.getLogger(__name__)
+
+
+def team_name(credentials):
+    return credentials.get("name") or f"{credentials['game_key']}.l.{credentials['league_id']}.t.{credentials['team_id']}"
+
+
+def build_shared_nhl(cache=True, week=False):
+    """Schedule, projections and starting goalies are the same for every team, so they are fetched once"""
+    nhl = snapshot.load_nhl() if cache else None
+    if nhl is None or not nhl.skaters:
+        nhl = NHL(teams_playing=nhl.teams_playing if nhl else None, starting_goalie_scraper=StartingGoalieScraper())
+        if cache:
+            snapshot.save_nhl(nhl)
+    # Fetched here so every worker receives the page with the NHL object instead of scraping it again
+    nhl.starting_goalie_scraper.fetch_data()
+    nhl.lock_times()
+    if week:
+        nhl.week_schedule = NHL.get_week_schedule()
+    return nhl
+
+
+def run_team(credentials, nhl, lineup_only=False, workers=1, week=False, free_agents=False, use_matchup=False):
+    """Run the manager for one team inside a worker process and return a summary of the run"""
+    import yahoo.api as api
+    from manager import Manager
+
+    name = team_name(credentials)
+    workdir = os.path.join(TEAMS_DIR, name)
+    os.makedirs(workdir, exist_ok=True)
+    os.chdir(workdir)
+    universe.UNIVERSE_DIR = SHARED_UNIVERSE_DIR
+    # Worker processes split the Yahoo request budget between them
+    scheduler.scheduler.set_rate(scheduler.REQUESTS_PER_SECOND / workers, max(1, scheduler.BURST // workers))
+    telemetry.telemetry.reset()
+    telemetry.install_http_hooks()
+
+    started = time.perf_counter()
+    error = None
+    try:
+        yahoo_api = api.YahooApi(DIRECTORY_PATH, credentials=credentials)
+        Manager(yahoo_api, lineup_only=lineup_only, nhl=nhl, week=week, free_agents=free_agents, use_matchup=use_matchup)
+    except Exception as e:
+        logger.error(f"Error running team {name}: {e}")
+        error = str(e)
+    report = telemetry.write_report()
+    return {"team": name, "seconds": time.perf_counter() - started, "error": error, "requests": report["counters"]}
+
+
+def run_teams(teams, nhl, workers=None, lineup_only=False, week=False, free_agents=False, use_matchup=False):
+    """Fan the teams out over a process pool, one manager run per team"""
+    workers = min(workers or os.cpu_count() or 1, len(teams))
+    results = []
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = {executor.submit(run_team, credentials, nhl, lineup_only, workers, week, free_agents, use_matchup): team_name(credentials) for credentials in teams}
+        for future in as_completed(futures):
+            try:
+                results.append(future.result())
+            except Exception as e:
+                logger.error(f"Error in worker for team {futures[future]}: {e}")
+                results.append({"team": futures[future], "seconds": 0.0, "error": str(e), "requests": {}})
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--lineup-only", dest="lineup_only", action="store_true", help="Only set the lineups, using the rankings saved by the last full run")
+    parser.add_argument("--free-agents", dest="free_agents", action="store_true", help="Also add and drop free agents; without it the runs only set the lineups")
+    parser.add_argument("--matchup", dest="matchup", action="store_true", help="With --free-agents, choose each team's add and drop by its matchup win probability")
+    parser.add_argument("--week", dest="week", action="store_true", help="Also submit lineups for the rest of the scoring week")
+    parser.add_argument("--workers", type=int, help="Number of worker processes (defaults to the number of cores)")
+    args = parser.parse_args()
+    logging.info(f"Arguments: {args}")
+
+    started = time.perf_counter()
+    teams = Config(DIRECTORY_PATH).getTeamCredentials()
+    nhl = build_shared_nhl(week=args.week)
+    logger.info(f"Built NHL data in {time.perf_counter() - started:.2f}s, running {len(teams)} teams")
+
+    results = run_teams(
+        teams, nhl, workers=args.workers, lineup_only=args.lineup_only, week=args.week, free_agents=args.free_agents, use_matchup=args.matchup
+    )
+    for result in sorted(results, key=lambda result: result["team"]):
+        yahoo_requests = result["requests"].get("yahoo", {}).get("requests", 0)
+        status = f"failed: {result['error']}" if result["error"] else "ok"
+        logger.info(f"{result['team']}: {status} in {result['seconds']:.2f}s, {yahoo_requests} Yahoo requests")
+    logger.info(f"Ran {len(teams)} teams in {time.perf_counter() - started:.2f}s")
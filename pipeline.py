@@ -0,0 +1,105 @@
+import time
+import logging
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+import telemetry
+
+PIPELINE_WORKERS = 4
+
+
+class Stage:
+    """A named step of a run. func receives the outputs of its inputs, in order.
+
+    after lists stages that must finish first when they are part of the same run, without pulling them in.
+    load returns a previously saved output (or None) so the stage and everything it needs can be skipped.
+    Stages with cache=False (actions) run again on every run instead of reusing their last output.
+    """
+
+    def __init__(self, name, func, inputs=(), after=(), load=None, cache=True):
+        self.name = name
+        self.func = func
+        self.inputs = list(inputs)
+        self.after = list(after)
+        self.load = load
+        self.cache = cache
+
+
+class Pipeline:
+    """Runs the stages a set of targets needs, in parallel where their inputs allow it"""
+
+    def __init__(self, stages, max_workers=PIPELINE_WORKERS):
+        self.logger = logging.getLogger(__name__)
+        self.stages = {stage.name: stage for stage in stages}
+        self.max_workers = max_workers
+        self.results = {}
+        self.durations = {}
+
+    def invalidate(self, name):
+        """Drop the output of a stage and of every stage that depends on it"""
+        self.results.pop(name, None)
+        for stage in self.stages.values():
+            if name in stage.inputs and stage.name in self.results:
+                self.invalidate(stage.name)
+
+    def plan(self, targets):
+        """Return the stages that have to run for the targets, reusing outputs that are already available"""
+        needed = set()
+
+        def visit(name, path):
+            if name in needed:
+                return
+            if name in path:
+                raise ValueError(f"Pipeline cycle: {' -> '.join(path + [name])}")
+            stage = self.stages[name]
+            if stage.cache and name in self.results:
+                return
+            if stage.load is not None:
+                loaded = stage.load()
+                if loaded is not None:
+                    self.logger.debug(f"Stage {name} loaded from cache")
+                    telemetry.count("pipeline", cache_hits=1)
+                    self.results[name] = loaded
+                    return
+            for dependency in stage.inputs:
+                visit(dependency, path + [name])
+            needed.add(name)
+
+        for target in targets:
+            visit(target, [])
+        return needed
+
+    def run(self, targets):
+        """Run everything the targets need and return {target: output}"""
+        pending = self.plan(targets)
+        self.logger.info(f"Running stages: {sorted(pending)}")
+        running = {}
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            while pending or running:
+                busy = pending | set(running.values())
+                for name in sorted(pending):
+                    stage = self.stages[name]
+                    if not any(dependency in busy for dependency in stage.inputs + stage.after):
+                        pending.discard(name)
+                        args = [self.results[dependency] for dependency in stage.inputs]
+                        running[executor.submit(self.run_stage, stage, args)] = name
+                if not running:
+                    raise ValueError(f"Stages can never run: {sorted(pending)}")
+
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    name = running.pop(future)
+                    try:
+                        self.results[name] = future.result()
+                    except Exception as e:
+                        self.logger.error(f"Stage {name} failed: {e}")
+                        for other in running:
+                            other.cancel()
+                        raise
+        return {target: self.results.get(target) for target in targets}
+
+    def run_stage(self, stage, args):
+        started = time.perf_counter()
+        with telemetry.span(f"stage:{stage.name}"):
+            result = stage.func(*args)
+        self.durations[stage.name] = time.perf_counter() - started
+        self.logger.info(f"Stage {stage.name} finished in {self.durations[stage.name]:.3f}s")
+        return result
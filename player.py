@@ -1,4 +1,5 @@
 import logging
+from scoring import BatchPlayerEvaluator
 
 
 class Player:
@@ -41,6 +42,46 @@ class Player:
         self.rankings = {}
         self.unified_score = 0
 
+    @classmethod
+    def from_snapshot(cls, snapshot, index, league):
+        """Rebuild a player from a snapshot row without calling Yahoo or the scrapers"""
+        player = cls.__new__(cls)
+        player.logger = logging.getLogger(__name__)
+        player.league = league
+        player.player_id = int(snapshot.columns["player_id"][index])
+        player.name = snapshot.string("name", index)
+        player.position = snapshot.string("position", index)
+        player.position_type = snapshot.string("position_type", index)
+        player.eligible_positions = snapshot.eligible_positions(index)
+        player.status = snapshot.string("status", index)
+        player.percent_owned = float(snapshot.columns["percent_owned"][index])
+        player.cant_cut = player.percent_owned >= 80
+        player.must_start = player.percent_owned >= 93
+        player.is_goalie = bool(snapshot.columns["is_goalie"][index])
+        player.points = float(snapshot.columns["points"][index])
+        player.team = snapshot.string("team", index)
+        player.game_today = league.nhl.teams_playing.get(player.team, False)
+        # Starters are named during the day and the snapshot can be a day old, so this is looked up again as in __init__
+        player.starting_behind_net = player.is_goalie and bool(league.nhl.is_goalie_starting_behind_net(player.name))
+        player.has_inactive_position = any(pos in player.eligible_positions for pos in league.inactive_positions)
+        player.is_inactive = player.status in league.not_playing_statuses
+        player.is_rostered_as_inactive = player.position in league.inactive_positions
+        player.location = snapshot.string("location", index) or ""
+        player.stats = snapshot.stats(index)
+        player.normalized_stats = {}
+        player.rankings = snapshot.rankings(index)
+        player.unified_score = float(snapshot.columns["unified_score"][index])
+        player.data = {
+            "player_id": player.player_id,
+            "name": player.name,
+            "selected_position": player.position or "",
+            "eligible_positions": player.eligible_positions,
+            "status": player.status,
+            "percent_owned": player.percent_owned,
+            "key": league.yahoo_api.credentials["game_key"] + ".p." + str(player.player_id),
+        }
+        return player
+
     def build_player_data(self, player):
         """Get the extra attributes for a player"""
         player_data = player
@@ -59,172 +100,11 @@ class Player:
         return player_data
 
     def evaluate_player(self, no_log=False):
-        last_week_score = self.rankings[self.league.time_periods[0]]["weighted_score"]
-        last_month_score = self.rankings[self.league.time_periods[1]]["weighted_score"]
-        season_score = self.rankings[self.league.time_periods[2]]["weighted_score"]
-        projected_rank = self.rankings[self.league.time_periods[2]]["projected_rank"]
-        owned_percentage = self.percent_owned
-
-        def calculate_score_from_percentile(player_score, percentiles):
-            if player_score >= percentiles["90th"]:
-                return 3
-            elif player_score >= percentiles["80th"]:
-                return 2.5
-            elif player_score >= percentiles["70th"]:
-                return 2
-            elif player_score >= percentiles["60th"]:
-                return 1
-            elif player_score >= percentiles["50th"]:
-                return 0.5
-            elif player_score >= percentiles["40th"]:
-                return -0.5
-            elif player_score >= percentiles["30th"]:
-                return -1
-            elif player_score >= percentiles["20th"]:
-                return -2
-            elif player_score >= percentiles["10th"]:
-                return -2.5
-            elif player_score >= percentiles["5th"]:
-                return -3
-            else:
-                return -3
-
-        def calculate_score_from_ownership(ownership):
-            if ownership >= 90:
-                return 1
-            elif ownership >= 80:
-                return 0.5
-            elif ownership >= 35:
-                return 0.0
-            elif ownership >= 20:
-                return -1
-            elif ownership >= 10:
-                return -1.5
-            else:
-                return -2
-
-        def calculate_score_from_projections_vs_performance(last_week_score, season_score, projected_rank):
-            percentile_score_last_week = calculate_score_from_percentile(
-                last_week_score, self.league.average_weighted_scores[self.league.time_periods[0]]["percentiles"]
-            )
-            percentile_score_last_month = calculate_score_from_percentile(
-                last_month_score, self.league.average_weighted_scores[self.league.time_periods[1]]["percentiles"]
-            )
-
-            # Calculate percentile scores for season and last week
-            percentile_score_season = calculate_score_from_percentile(
-                season_score, self.league.average_weighted_scores[self.league.time_periods[2]]["percentiles"]
-            )
-            # Combine the scores (can adjust weighting between season and last week if needed)
-            combined_percentile_score = (percentile_score_season * 0.6 + percentile_score_last_week * 0.4 + percentile_score_last_month * 0.5) / 3
-            self.logger.info(f"  - Combined Percentile Score: {combined_percentile_score:.2f}")
-            if combined_percentile_score > 2.5:
-                return 0
-
-            # Evaluate based on projection rank
-            if projected_rank < 40:  # Highly ranked players are expected to perform well
-                if combined_percentile_score <= 1.5:  # Poor percentile performance
-                    return -2.5
-                elif combined_percentile_score <= 1.75:
-                    return -2
-                elif combined_percentile_score <= 2:
-                    return -1.5
-                elif combined_percentile_score <= 2.25:
-                    return -1
-                elif combined_percentile_score <= 2.5:
-                    return -0.5
-                else:
-                    return 0  # Reward good percentile performance
-
-            elif projected_rank < 70:  # Highly ranked players are expected to perform well
-                if combined_percentile_score <= 1.5:  # Poor percentile performance
-                    return -1.5
-                elif combined_percentile_score <= 1.75:
-                    return -1
-                elif combined_percentile_score <= 2:
-                    return -0.5
-                else:
-                    return 0  # Reward good percentile performance
-
-            elif projected_rank < 100:  # Medium-ranked players
-                if combined_percentile_score <= 1.5:  # Very poor performance
-                    return -0.5
-                else:
-                    return 0
-            else:  # Low-ranked players
-                return 0  # No additional penalty for lower expectations
-
+        evaluator = BatchPlayerEvaluator(self.league, [self])
+        player_score = float(evaluator.evaluate()[0])
         if not no_log:
             self.logger.info(f"\nEvaluating {self.name}:")
-        else:
-            self.logger.debug(f"\nEvaluating {self.name}:")
-            self.logger.debug(f"  Base Stats:")
-            self.logger.debug(f"    - Last Week Score: {last_week_score:.2f}")
-            self.logger.debug(f"    - Season Score: {season_score:.2f}")
-        self.logger.debug(f"    - Projected Rank: {projected_rank}")
-        self.logger.debug(f"    - Ownership: {owned_percentage}%")
-        player_score = 0
-        reasons = []
-        self.logger.debug(f"  Factor 1 - Last Week:")
-        last_week_score_from_percentile = calculate_score_from_percentile(
-            last_week_score, self.league.average_weighted_scores[self.league.time_periods[0]]["percentiles"]
-        )
-        last_week_score_from_percentile *= self.league.last_week_weight
-        player_score += last_week_score_from_percentile
-        reasons.append(f"  - Last Week Score: {last_week_score_from_percentile:.2f}")
-
-        self.logger.debug(f"  Factor 2 - Last Month:")
-        last_month_score_from_percentile = calculate_score_from_percentile(
-            last_month_score, self.league.average_weighted_scores[self.league.time_periods[1]]["percentiles"]
-        )
-        last_month_score_from_percentile *= self.league.last_month_weight
-        player_score += last_month_score_from_percentile
-        reasons.append(f"  - Last Month Score: {last_month_score_from_percentile:.2f}")
-
-        self.logger.debug(f"  Factor 3 - Season:")
-        season_score_from_percentile = calculate_score_from_percentile(
-            season_score, self.league.average_weighted_scores[self.league.time_periods[2]]["percentiles"]
-        )
-        season_score_from_percentile *= self.league.season_weight
-        reasons.append(f"  - Season Score: {season_score_from_percentile:.2f}")
-        player_score += season_score_from_percentile
-
-        self.logger.debug(f"  Factor 3 - Projected Rank Vs Performance:")
-        projected_rank_vs_performance = calculate_score_from_projections_vs_performance(last_week_score, season_score, projected_rank)
-        projected_rank_vs_performance *= self.league.projected_rank_weight
-        player_score += projected_rank_vs_performance
-        reasons.append(f"  - Projected Rank Vs Performance: {projected_rank_vs_performance:.2f}")
-
-        self.logger.debug(f"  Factor 4 - Ownership Percentage:")
-        ownership_score = calculate_score_from_ownership(owned_percentage)
-        ownership_score *= self.league.percent_owned_weight
-        player_score += ownership_score
-        reasons.append(f"  - Ownership Percentage: {ownership_score:.2f}")
-        self.logger.debug(f"  Factor 5 - Preseason Poor projections:")
-        if projected_rank > 200:
-            player_score -= 0.75
-            reasons.append(f"❌ Extremely low projections ({projected_rank}): -0.75 point")
-        elif projected_rank > 150:
-            player_score -= 0.50
-            reasons.append(f"❌ Extremely low projections ({projected_rank}): -0.50 point")
-        elif projected_rank > 100:
-            player_score -= 0.25
-            reasons.append(f"❌ Low projections ({projected_rank}): -0.5 point")
-        else:
-            reasons.append(f"✅ Projected rank is acceptable")
-
-        if self.is_inactive:
-            player_score -= 1
-            reasons.append(f"❌ Inactive status: -1 point")
-
-        self.logger.debug(f"  Final Player Score: {player_score}")
-        if not no_log:
-            self.logger.info(f"Candidate: {self.name} [{player_score}]")
-
-            for reason in reasons:
-                self.logger.info(f"- {reason}")
-
-        self.unified_score = player_score
+            evaluator.log_player(self)
         return player_score
 
     def __str__(self):
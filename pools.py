@@ -0,0 +1,158 @@
+import os
+import json
+import logging
+from datetime import datetime, timedelta
+import snapshot
+from cache import CACHE_DIR
+from player import Player
+from util import constants
+import telemetry
+
+POOL_SYNC_FILE = os.path.join(CACHE_DIR, "pool_sync.json")
+POOL_SNAPSHOT_DATE = "latest"
+TRANSACTION_FEED_COUNT = 25
+FULL_RECONCILE_INTERVAL = timedelta(hours=24)
+
+
+def transaction_moves(transaction):
+    """Flatten a Yahoo transaction into (player_id, type, destination_type) moves"""
+    moves = []
+    for key, entry in transaction.get("players", {}).items():
+        if key == "count":
+            continue
+        info, data = entry["player"][0], entry["player"][1]
+        player_id = next(int(item["player_id"]) for item in info if isinstance(item, dict) and "player_id" in item)
+        transaction_data = data["transaction_data"]
+        if isinstance(transaction_data, list):
+            transaction_data = transaction_data[0]
+        moves.append((player_id, transaction_data.get("type"), transaction_data.get("destination_type")))
+    return moves
+
+
+class PlayerPoolSync:
+    """Keeps the taken and free agent pools current by replaying the league's add/drop feed"""
+
+    def __init__(self, league, state_path=POOL_SYNC_FILE):
+        self.logger = logging.getLogger(__name__)
+        self.league = league
+        self.state_path = state_path
+        self.state = self.load_state()
+
+    def load_state(self):
+        if not os.path.exists(self.state_path):
+            return {}
+        try:
+            with open(self.state_path, "r") as f:
+                return json.load(f)
+        except Exception as e:
+            self.logger.error(f"Error loading pool sync state: {e}")
+            return {}
+
+    def save_state(self):
+        os.makedirs(os.path.dirname(self.state_path) or ".", exist_ok=True)
+        tmp_path = f"{self.state_path}.tmp-{os.getpid()}"
+        with open(tmp_path, "w") as f:
+            json.dump(self.state, f)
+        os.replace(tmp_path, self.state_path)
+
+    def needs_full_reconcile(self, now):
+        if self.state.get("league_key") != self.league.league_key or "last_full_sync" not in self.state:
+            return True
+        return now - datetime.fromisoformat(self.state["last_full_sync"]) > FULL_RECONCILE_INTERVAL
+
+    def sync(self, now=None):
+        """Return (taken, free_agents) pools, applied incrementally from the feed when possible"""
+        now = now or datetime.now()
+        taken = None
+        free_agents = None
+        if not self.needs_full_reconcile(now):
+            taken = snapshot.load_players("pool_taken", self.league, POOL_SNAPSHOT_DATE)
+            free_agents = snapshot.load_players("pool_free_agents", self.league, POOL_SNAPSHOT_DATE)
+
+        if taken is None or free_agents is None:
+            return self.full_reconcile(now)
+
+        transactions = self.fetch_transactions()
+        last_timestamp = self.state.get("last_timestamp", 0)
+        new_transactions = [t for t in transactions if int(t.get("timestamp", 0)) > last_timestamp]
+        if len(transactions) >= TRANSACTION_FEED_COUNT and len(new_transactions) == len(transactions):
+            self.logger.info("Transaction feed has more changes than a single page, running a full reconciliation")
+            return self.full_reconcile(now)
+
+        telemetry.count("pools", cache_hits=1)
+        taken, free_agents = self.apply_transactions(taken, free_agents, new_transactions)
+        if new_transactions:
+            self.state["last_timestamp"] = max(int(t["timestamp"]) for t in new_transactions)
+            self.save(taken, free_agents)
+        self.logger.info(f"Applied {len(new_transactions)} transactions to the player pools")
+        return taken, free_agents
+
+    def fetch_transactions(self):
+        try:
+            return self.league.league.transactions("add,drop", str(TRANSACTION_FEED_COUNT))
+        except Exception as e:
+            self.logger.error(f"Error fetching transactions feed: {e}")
+            return []
+
+    def apply_transactions(self, taken, free_agents, transactions):
+        pools = {player.player_id: player for player in taken + free_agents}
+        for transaction in sorted(transactions, key=lambda t: int(t.get("timestamp", 0))):
+            if transaction.get("status", "successful") != "successful":
+                continue
+            for player_id, move_type, destination_type in transaction_moves(transaction):
+                player = pools.get(player_id) or self.build_player(player_id)
+                if player is None:
+                    continue
+                pools[player_id] = player
+                if move_type == "add":
+                    player.location = constants.LOCATION_TAKEN
+                elif move_type == "drop":
+                    # Players dropped to waivers are not claimable as free agents until they clear
+                    player.location = constants.LOCATION_FREE_AGENT if destination_type != "waivers" else ""
+                self.logger.debug(f"{move_type} {player.name} -> {player.location or 'waivers'}")
+
+        taken = [player for player in pools.values() if player.location == constants.LOCATION_TAKEN]
+        free_agents = [player for player in pools.values() if player.location == constants.LOCATION_FREE_AGENT]
+        return taken, free_agents
+
+    def build_player(self, player_id):
+        """Create a Player for someone that was in neither pool, e.g. a player coming off waivers"""
+        try:
+            details = self.league.universe.player_details(self.league.league, [player_id])
+        except Exception as e:
+            self.logger.error(f"Error fetching details for player {player_id}: {e}")
+            return None
+        if not details:
+            return None
+        detail = details[0]
+        player = Player(
+            {
+                "player_id": int(detail["player_id"]),
+                "name": detail["name"]["full"],
+                "position_type": detail.get("position_type"),
+                "eligible_positions": [p["position"] for p in detail.get("eligible_positions", [])],
+                "status": detail.get("status", ""),
+                "team": detail.get("editorial_team_full_name"),
+            },
+            self.league,
+        )
+        return player
+
+    def full_reconcile(self, now):
+        self.logger.info("Running full reconciliation of taken and free agent pools")
+        telemetry.count("pools", cache_misses=1)
+        transactions = self.fetch_transactions()
+        taken = self.league.fetch_players_raw(location="taken")
+        free_agents = self.league.fetch_players_raw(location="free_agents") + self.league.fetch_players_raw(location="free_agents_goalies")
+        self.state = {
+            "league_key": self.league.league_key,
+            "last_full_sync": now.isoformat(),
+            "last_timestamp": max((int(t.get("timestamp", 0)) for t in transactions), default=0),
+        }
+        self.save(taken, free_agents)
+        return taken, free_agents
+
+    def save(self, taken, free_agents):
+        snapshot.save_players(taken, "pool_taken", self.league.time_periods, POOL_SNAPSHOT_DATE)
+        snapshot.save_players(free_agents, "pool_free_agents", self.league.time_periods, POOL_SNAPSHOT_DATE)
+        self.save_state()
@@ -3,8 +3,10 @@ from lineup import RosterLineup
 from player import Player
 from util import constants
 from stats import LeagueStatistics
-from tqdm import tqdm
-import datetime
+from roster_writes import RosterWriteBuffer, LineupFingerprints
+from scoring import BatchMoveScorer, DROP_THRESHOLD, ADD_THRESHOLD
+from util.lazy import tqdm
+from telemetry import span
 
 
 class Roster:
@@ -15,7 +17,10 @@ class Roster:
         self.players = None
         self.teams_playing = None
         self.moves_left = None
-        self.change_position_payload = []
+        # Inactive, bench and lineup moves from every stage, sent together
+        self.writes = RosterWriteBuffer(self.yahoo_api.team)
+        # Drop/add scores for the roster and free agents, built on first use after the rankings
+        self.move_scorer = None
 
         self.get_roster()
 
@@ -30,10 +35,12 @@ class Roster:
         self.logger.info(f"Roster full: {self.is_full()}")
         self.logger.info(f"Open roster spots: {self.open_roster_spots}")
 
+    @span("roster.get_roster")
     def get_roster(self):
         lineups = {}
         team = []
         roster = self.yahoo_api.get_roster()
+        self.move_scorer = None
 
         for player in tqdm(roster, desc="Fetching current roster from yahoo.."):
             p = Player(player, self.league)
@@ -44,7 +51,13 @@ class Roster:
             lineups[p.position].append(p)
 
         self.league.players_details["roster"] = self.league.get_players_details(team)
+        self.writes.set_current({player.player_id: player.position for player in team})
         self.players = team
+        # Moves not sent yet still apply to the refetched roster
+        for player in team:
+            position = self.writes.staged_position(player.player_id)
+            if position:
+                self.set_player_position(player, position)
 
         self.update_roster_info()
         return team
@@ -72,10 +85,60 @@ class Roster:
             for player in players:
                 self.logger.info(f"{position} - {player.name}")
                 self.add_lineup_change(player.player_id, position)
-        if len(self.change_position_payload) > 0:
-            self.logger.info(f"Applying lineup changes: {len(self.change_position_payload)}")
+        if self.writes.has_changes():
             self.apply_lineup_changes()
             self.lineup.log_lineup()
+        else:
+            self.writes.discard()
+
+    def lineup_fingerprint(self, teams_playing):
+        """Everything the lineup for a date is calculated from"""
+        parts = [
+            "|".join(
+                [
+                    str(player.player_id),
+                    str(player.status),
+                    ",".join(player.eligible_positions),
+                    str(player.position in self.league.inactive_positions),
+                    str(teams_playing.get(player.team, False)),
+                    f"{player.unified_score:.1f}",
+                ]
+            )
+            for player in sorted(self.players, key=lambda player: player.player_id)
+        ]
+        return LineupFingerprints.fingerprint(parts)
+
+    def set_future_lineups(self, dates, fingerprints):
+        """
+        Calculates and submits the lineup for each date whose inputs changed since it was last submitted
+        """
+        game_today = {player.player_id: player.game_today for player in self.players}
+        staged = {}
+        try:
+            for date in dates:
+                teams_playing = self.league.nhl.teams_playing_on(date)
+                fingerprint = self.lineup_fingerprint(teams_playing)
+                if not fingerprints.changed(date, fingerprint):
+                    self.logger.info(f"Lineup inputs for {date} are unchanged, skipping")
+                    continue
+                for player in self.players:
+                    player.game_today = teams_playing.get(player.team, False)
+                lineup = RosterLineup(self.league, self.players)
+                if lineup.calculate_best_lineup() is None:
+                    continue
+                for position, players in lineup.lineup.items():
+                    for player in players:
+                        self.writes.stage(player.player_id, position, date)
+                staged[date] = fingerprint
+        finally:
+            for player in self.players:
+                player.game_today = game_today[player.player_id]
+
+        self.writes.flush()
+        for date, fingerprint in staged.items():
+            fingerprints.record(date, fingerprint)
+        fingerprints.save()
+        return list(staged)
 
     def move_player_to_bench_from_inactive(self):
         """
@@ -87,8 +150,7 @@ class Roster:
                 if not player.has_inactive_position:
                     if not self.is_full():
                         self.logger.info(f"Removing {player.name} from injured list and adding to bench")
-                        self.add_roster_change(player.player_id, "BN")
-                        self.lineup["BN"].append(player)
+                        self.add_lineup_change(player.player_id, "BN")
                     else:
                         self.logger.info(f"Roster is full, skipping {player.name}")
 
@@ -121,8 +183,7 @@ class Roster:
                         self.logger.info(f"Open IR spots: {open_ir_spots}")
                     else:
                         self.logger.info(f"No {get_inactive_position} spots available, skipping {player.name}")
-        self.logger.info(f"Payload: {self.change_position_payload}")
-        self.apply_lineup_changes()
+        self.logger.info(f"Staged moves: {self.writes.pending}")
 
     def get_open_roster_positions(self):
         required_positions = self.league.league_positions
@@ -150,16 +211,24 @@ class Roster:
         return open_positions
 
     def add_lineup_change(self, player_id, position):
-        self.change_position_payload.append({"player_id": player_id, "selected_position": position})
+        """Stage a move and apply it to the local roster so later stages see it"""
+        self.writes.stage(player_id, position)
+        player = next((player for player in self.players if player.player_id == player_id), None)
+        if player:
+            self.set_player_position(player, position)
+
+    def set_player_position(self, player, position):
+        player.position = position
+        player.is_rostered_as_inactive = position in self.league.inactive_positions
 
     def apply_lineup_changes(self):
-        if len(self.change_position_payload) > 0:
-            self.logger.info(f"Applying lineup changes: {self.change_position_payload}")
-            self.yahoo_api.team.change_positions(datetime.datetime.now(), self.change_position_payload)
-            self.change_position_payload = []
-            self.get_roster()
+        """Send every staged move; the local roster already reflects them, so it is not refetched"""
+        if self.writes.flush():
+            self.update_roster_info()
 
     def add_and_drop_player(self, player_to_add, player_to_drop):
+        # Staged inactive moves go first, as they can free the roster spot the add needs
+        self.apply_lineup_changes()
         if player_to_drop:
             self.yahoo_api.team.add_and_drop_players(player_to_add.player_id, player_to_drop.player_id)
         else:
@@ -204,6 +273,7 @@ class Roster:
         )
         positions_without_util = [pos for pos in player.eligible_positions if pos != "Util" and pos not in self.league.inactive_positions]
         free_agents = self.find_free_agents_by_positions(positions_without_util)
+        scorer = self.move_scores(free_agents)
         res = []
         for free_agent in free_agents:
             fa_last_week_rank = free_agent.rankings[self.league.time_periods[0]]["weighted_score"]
@@ -216,9 +286,10 @@ class Roster:
             self.logger.debug(f"[{free_agent.name}] [{fa_last_week_rank} | {fa_season_rank}] - Proj: [{fa_projected_rank}]")
 
             if fa_rank_score > potential_player_rank_score:
-                add_score = self.__evaluate_player__(free_agent, is_drop=False)
+                add_score = scorer.score(free_agent, is_drop=False)
                 self.logger.debug(f"Add Score: {add_score}")
-                if add_score >= 0:
+                if add_score >= ADD_THRESHOLD:
+                    scorer.log_player(free_agent, is_drop=False)
                     self.logger.info(
                         f"[{free_agent.name}] Last Week Score: {fa_last_week_rank} | Season Score: {fa_season_rank} | Projected Rank: {fa_projected_rank}"
                     )
@@ -235,13 +306,13 @@ class Roster:
 
     def find_potential_players_to_drop(self):
         res = []
-        for player in self.players:
-            if player.cant_cut:
-                continue
-
-            drop_score = self.__evaluate_player__(player)
+        candidates = [player for player in self.players if not player.cant_cut]
+        scorer = self.move_scores(candidates)
+        for player in candidates:
+            drop_score = scorer.score(player)
 
-            if drop_score >= 4:
+            if drop_score >= DROP_THRESHOLD:
+                scorer.log_player(player)
                 self.logger.info(f"Potential drop candidate: {player.name}")
                 res.append((player, drop_score))
 
@@ -272,120 +343,14 @@ class Roster:
             self.logger.info(f"{player.name} added to roster")
             return
 
-    def __evaluate_player__(self, player, is_drop=True):
-        last_week_score = player.rankings[self.league.time_periods[0]]["weighted_score"]
-        season_score = player.rankings[self.league.time_periods[2]]["weighted_score"]
-        projected_rank = player.rankings[self.league.time_periods[2]]["projected_rank"]
-        owned_percentage = player.percent_owned
-
-        self.logger.debug(f"\nEvaluating {player.name}:")
-        self.logger.debug(f"  Base Stats:")
-        self.logger.debug(f"    - Last Week Score: {last_week_score:.2f}")
-        self.logger.debug(f"    - Season Score: {season_score:.2f}")
-        self.logger.debug(f"    - Projected Rank: {projected_rank}")
-        self.logger.debug(f"    - Ownership: {owned_percentage}%")
-        player_score = 0
-        reasons = []
-        # Factor 1: Recent Performance vs Season Performance
-        self.logger.debug(f"  Factor 1 - Recent vs Season Performance:")
-        if last_week_score < (season_score * 0.7):
-            player_score += 3
-            reasons.append(f"❌ Recent performance ({last_week_score:.2f}) < 70% of season average ({season_score * 0.7:.2f}): +2 points")
-        elif last_week_score < (season_score * 0.85):
-            player_score += 1
-            reasons.append(f"⚠️ Recent performance ({last_week_score:.2f}) < 85% of season average ({season_score * 0.85:.2f}): +1 point")
-        else:
-            if last_week_score > (season_score * 1.2) and season_score > 2:
-                player_score -= 1
-                reasons.append(f"🔥 Recent performance ({last_week_score:.2f}) > 120% of season average ({season_score * 1.2:.2f}): -1 point")
-            else:
-                reasons.append(f"✅ Recent performance stable")
-
-        # Factor 2: Absolute (Recent) Performance Threshold
-        self.logger.debug(f"  Factor 2 - Absolute (Recent) Performance:")
-        if last_week_score < 1.5:
-            player_score += 2
-            reasons.append(f"❌ Very poor recent performance < 1.5: +2 points")
-        elif last_week_score < 2.0:
-            player_score += 1
-            reasons.append(f"⚠️ Poor recent performance < 2.0: +1 point")
-        else:
-            if last_week_score > 2.5:
-                player_score -= 1
-                if not is_drop:
-                    player_score -= 1
-                reasons.append(f"🔥 Absolute (Recent) performance ({last_week_score:.2f}) > 2.75: -1 point")
-
-            else:
-                reasons.append(f"✅ Absolute (Recent) performance acceptable")
-
-        # Factor 3: Absolute (Season) Performance Threshold
-        self.logger.debug(f"  Factor 3 - Absolute (Season) Performance:")
-        if season_score < 1.5:
-            player_score += 2
-            reasons.append(f"❌ Very poor season performance < 1.5: +2 points")
-        elif season_score < 2.0:
-            player_score += 1
-            reasons.append(f"⚠️ Poor season performance < 2.0: +1 point")
-        else:
-            if season_score > 2.75:
-                player_score -= 2
-                reasons.append(f"🔥 Absolute (Season) performance ({season_score:.2f}) > 2.75: -1 point")
-            elif season_score > 2.5:
-                player_score -= 1
-                reasons.append(f"🔥 Absolute (Season) performance ({season_score:.2f}) > 2.5: -1 point")
-            else:
-                reasons.append(f"✅ Absolute (Season) performance acceptable")
-
-        # Factor 4: Ownership Percentage
-        self.logger.debug(f"  Factor 4 - Ownership Percentage:")
-        if owned_percentage < 20:
-            player_score += 2
-            reasons.append(f"❌ Very low ownership < 20%: +2 points")
-        elif owned_percentage < 30:
-            player_score += 1
-            reasons.append(f"⚠️ Low ownership < 30%: +1 point")
-        else:
-            reasons.append(f"✅ Ownership acceptable")
-
-        # Factor 5: Preseason Expectations vs Performance
-        performance_vs_projection = (last_week_score + season_score) / 2
-        self.logger.debug(f"  Factor 5 - Preseason Expectations Vs Performance:")
-        self.logger.debug(f"    - Average Performance: {performance_vs_projection:.2f}")
-        if projected_rank < 50:
-            if performance_vs_projection < 2.3:
-                player_score += 2
-                reasons.append(f"❌ High draft pick ({projected_rank}) underperforming: +2 points")
-            else:
-                player_score -= 2
-                reasons.append(f"🔥 High draft pick ({projected_rank}) meeting expectations: -2 points")
-        elif projected_rank < 100:
-            if performance_vs_projection < 2.3:
-                player_score += 1
-                reasons.append(f"⚠️ Medium draft pick ({projected_rank}) underperforming: +1 point")
-            else:
-                player_score -= 1
-                reasons.append(f"🔥 Medium draft pick ({projected_rank}) meeting expectations: -1 point")
-        else:
-            reasons.append(f"✅ Meeting expectations or low draft pick")
-
-        self.logger.debug(f"  Factor 6 - Preseason Projection:")
-        if projected_rank > 200:
-            player_score += 1
-            reasons.append(f"❌ Extremely low projections ({projected_rank}): +1 point")
-        else:
-            reasons.append(f"✅ Projected rank is acceptable")
-
-        self.logger.debug(f"  Final Player Score: {player_score}")
-        if not is_drop:
-            player_score = player_score * -1
-
-        threshold = 4 if is_drop else 0
-        if player_score >= threshold:
-            self.logger.info(f"Candidate: {player.name} [{player_score}]")
-            for reason in reasons:
-                self.logger.info(f"- {reason}")
-        return player_score
+    def move_scores(self, players):
+        """Drop/add scorer over the roster and the free agent pool, rebuilt when asked about a player it has not scored"""
+        if self.move_scorer is None or any(player not in self.move_scorer for player in players):
+            last_week, season = self.league.time_periods[0], self.league.time_periods[2]
+            pool = [player for player in self.players + self.league.players["free_agents"] if player.rankings.get(last_week) and player.rankings.get(season)]
+            pooled = {id(player) for player in pool}
+            self.move_scorer = BatchMoveScorer(self.league, pool + [player for player in players if id(player) not in pooled])
+        return self.move_scorer
 
     def __repr__(self):
         return f"Roster(players={self.players})"
@@ -0,0 +1,112 @@
+import os
+import json
+import hashlib
+import logging
+import datetime
+from cache import CACHE_DIR
+import telemetry
+
+LINEUP_FINGERPRINTS_FILE = os.path.join(CACHE_DIR, "lineup_fingerprints.json")
+
+
+class RosterWriteBuffer:
+    """Position changes collected from every stage of a run and sent as one change_positions call per date.
+
+    A player moved more than once keeps only the last position, and moves back to the position the
+    player already holds on Yahoo are dropped before anything is sent. Only dates whose positions were
+    read from Yahoo can drop moves; every staged move is sent for any other date.
+    """
+
+    def __init__(self, team):
+        self.logger = logging.getLogger(__name__)
+        self.team = team
+        self.current = {}
+        self.pending = {}
+        self.flushed_dates = []
+
+    def set_current(self, positions, date=None):
+        """Record the positions Yahoo holds on a date, as {player_id: selected_position}"""
+        self.current[date or datetime.date.today()] = {str(player_id): position for player_id, position in positions.items()}
+
+    def stage(self, player_id, position, date=None):
+        date = date or datetime.date.today()
+        self.pending.setdefault(date, {})[str(player_id)] = position
+
+    def staged_position(self, player_id, date=None):
+        return self.pending.get(date or datetime.date.today(), {}).get(str(player_id))
+
+    def payload(self, date):
+        """The moves for a date that change something on Yahoo"""
+        current = self.current.get(date, {})
+        return [
+            {"player_id": player_id, "selected_position": position}
+            for player_id, position in self.pending.get(date, {}).items()
+            if current.get(player_id) != position
+        ]
+
+    def has_changes(self):
+        return any(self.payload(date) for date in self.pending)
+
+    def discard(self, date=None):
+        if date is None:
+            self.pending = {}
+        else:
+            self.pending.pop(date, None)
+
+    def flush(self):
+        """Send the pending moves, one call per date, and return how many moves were sent"""
+        sent = 0
+        self.flushed_dates = []
+        for date in sorted(self.pending):
+            payload = self.payload(date)
+            staged = len(self.pending[date])
+            if not payload:
+                self.logger.info(f"All {staged} staged moves for {date} match the current lineup, nothing to send")
+                continue
+            self.logger.info(f"Sending {len(payload)} of {staged} staged moves for {date}: {payload}")
+            self.team.change_positions(date, payload)
+            telemetry.count("roster_writes", calls=1, moves=len(payload), coalesced=staged - len(payload))
+            if date in self.current:
+                self.current[date].update({move["player_id"]: move["selected_position"] for move in payload})
+            self.flushed_dates.append(date)
+            sent += len(payload)
+        self.pending = {}
+        return sent
+
+
+class LineupFingerprints:
+    """Fingerprint of the inputs behind the lineup submitted for each date, so unchanged dates are not resubmitted"""
+
+    def __init__(self, path=LINEUP_FINGERPRINTS_FILE):
+        self.logger = logging.getLogger(__name__)
+        self.path = path
+        self.fingerprints = {}
+        if os.path.exists(path):
+            try:
+                with open(path, "r") as f:
+                    self.fingerprints = json.load(f)
+            except Exception as e:
+                self.logger.error(f"Error loading lineup fingerprints from {path}: {e}")
+
+    @staticmethod
+    def fingerprint(parts):
+        return hashlib.sha1("\n".join(parts).encode()).hexdigest()
+
+    def changed(self, date, fingerprint):
+        return self.fingerprints.get(str(date)) != fingerprint
+
+    def record(self, date, fingerprint):
+        self.fingerprints[str(date)] = fingerprint
+
+    def save(self):
+        # Dates already played are never submitted again
+        today = str(datetime.date.today())
+        self.fingerprints = {date: fingerprint for date, fingerprint in self.fingerprints.items() if date >= today}
+        try:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            tmp_path = f"{self.path}.tmp-{os.getpid()}"
+            with open(tmp_path, "w") as f:
+                json.dump(self.fingerprints, f)
+            os.replace(tmp_path, self.path)
+        except Exception as e:
+            self.logger.error(f"Error saving lineup fingerprints to {self.path}: {e}")
@@ -0,0 +1,255 @@
+import logging
+import operator
+from util.lazy import lazy_import
+
+np = lazy_import("numpy")
+
+# Percentile levels reported by PlayerRankings.get_weighted_score_statistics, highest first
+PERCENTILE_LEVELS = [95, 90, 80, 70, 60, 50, 40, 30, 20, 10, 5]
+PERCENTILE_LABELS = [f"{level}th" for level in PERCENTILE_LEVELS]
+
+# Tables are plain lists so importing this module does not pull in numpy
+# Ascending cut points and the score for landing at or above each one (index 0 is below the 10th)
+PERCENTILE_BUCKET_LABELS = ["10th", "20th", "30th", "40th", "50th", "60th", "70th", "80th", "90th"]
+PERCENTILE_BUCKET_SCORES = [-3, -2.5, -2, -1, -0.5, 0.5, 1, 2, 2.5, 3]
+
+OWNERSHIP_CUTS = [10, 20, 35, 80, 90]
+OWNERSHIP_SCORES = [-2, -1.5, -1, 0, 0.5, 1]
+
+# Combined percentile score is compared with "<=", one row per projected rank tier (<40, <70, <100, rest)
+PROJECTED_RANK_TIERS = [40, 70, 100]
+COMBINED_PERCENTILE_CUTS = [1.5, 1.75, 2, 2.25, 2.5]
+PROJECTION_VS_PERFORMANCE_SCORES = [
+    [-2.5, -2, -1.5, -1, -0.5, 0],
+    [-1.5, -1, -0.5, 0, 0, 0],
+    [-0.5, 0, 0, 0, 0, 0],
+    [0, 0, 0, 0, 0, 0],
+]
+
+# Penalty for poor preseason projections, compared with ">"
+PRESEASON_RANK_CUTS = [100, 150, 200]
+PRESEASON_RANK_PENALTIES = [0, -0.25, -0.5, -0.75]
+INACTIVE_PENALTY = -1
+
+
+def percentile_bucket_scores(scores, percentiles):
+    """Map scores to the percentile bucket scores used by Player.evaluate_player"""
+    cuts = np.array([percentiles[label] for label in PERCENTILE_BUCKET_LABELS])
+    return np.asarray(PERCENTILE_BUCKET_SCORES)[np.searchsorted(cuts, scores, side="right")]
+
+
+# Decision weights read from the League by unified_score_components
+DECISION_WEIGHTS = ["last_week_weight", "last_month_weight", "season_weight", "projected_rank_weight", "percent_owned_weight"]
+
+
+def unified_score_components(scores, projected_rank, owned_percentage, inactive, percentiles, weights):
+    """Components of the unified score for arrays of players.
+
+    scores holds the weighted score for last week, last month and season in its columns, percentiles the
+    matching get_weighted_score_statistics percentiles, and weights the DECISION_WEIGHTS by name.
+    """
+    buckets = [percentile_bucket_scores(scores[:, column], percentiles[column]) for column in range(3)]
+    last_week, last_month, season = buckets
+    combined_percentile_score = (season * 0.6 + last_week * 0.4 + last_month * 0.5) / 3
+    rank_tier = np.searchsorted(PROJECTED_RANK_TIERS, projected_rank, side="right")
+    combined_bucket = np.searchsorted(COMBINED_PERCENTILE_CUTS, combined_percentile_score, side="left")
+    return {
+        "last_week": last_week * weights["last_week_weight"],
+        "last_month": last_month * weights["last_month_weight"],
+        "season": season * weights["season_weight"],
+        "projection_vs_performance": np.asarray(PROJECTION_VS_PERFORMANCE_SCORES)[rank_tier, combined_bucket] * weights["projected_rank_weight"],
+        "ownership": np.asarray(OWNERSHIP_SCORES)[np.searchsorted(OWNERSHIP_CUTS, owned_percentage, side="right")] * weights["percent_owned_weight"],
+        "preseason": np.asarray(PRESEASON_RANK_PENALTIES)[np.searchsorted(PRESEASON_RANK_CUTS, projected_rank, side="left")],
+        "inactive": np.where(inactive, INACTIVE_PENALTY, 0),
+    }
+
+
+# Drop and add rules, one block per factor. Within a block the first rule whose clauses all hold decides the
+# points, as (clauses, drop points, add points, reason); a clause compares a feature with a number or with
+# (feature, multiplier). Add scores are the negated sum of the add points.
+MOVE_RULES = [
+    (
+        "Recent vs Season Performance",
+        [
+            ([("last_week", "<", ("season", 0.7))], 3, 3, "❌ Recent performance ({last_week:.2f}) < 70% of season average ({season_70:.2f}): +2 points"),
+            ([("last_week", "<", ("season", 0.85))], 1, 1, "⚠️ Recent performance ({last_week:.2f}) < 85% of season average ({season_85:.2f}): +1 point"),
+            (
+                [("last_week", ">", ("season", 1.2)), ("season", ">", 2)],
+                -1,
+                -1,
+                "🔥 Recent performance ({last_week:.2f}) > 120% of season average ({season_120:.2f}): -1 point",
+            ),
+            ([], 0, 0, "✅ Recent performance stable"),
+        ],
+    ),
+    (
+        "Absolute (Recent) Performance",
+        [
+            ([("last_week", "<", 1.5)], 2, 2, "❌ Very poor recent performance < 1.5: +2 points"),
+            ([("last_week", "<", 2.0)], 1, 1, "⚠️ Poor recent performance < 2.0: +1 point"),
+            ([("last_week", ">", 2.5)], -1, -2, "🔥 Absolute (Recent) performance ({last_week:.2f}) > 2.75: -1 point"),
+            ([], 0, 0, "✅ Absolute (Recent) performance acceptable"),
+        ],
+    ),
+    (
+        "Absolute (Season) Performance",
+        [
+            ([("season", "<", 1.5)], 2, 2, "❌ Very poor season performance < 1.5: +2 points"),
+            ([("season", "<", 2.0)], 1, 1, "⚠️ Poor season performance < 2.0: +1 point"),
+            ([("season", ">", 2.75)], -2, -2, "🔥 Absolute (Season) performance ({season:.2f}) > 2.75: -1 point"),
+            ([("season", ">", 2.5)], -1, -1, "🔥 Absolute (Season) performance ({season:.2f}) > 2.5: -1 point"),
+            ([], 0, 0, "✅ Absolute (Season) performance acceptable"),
+        ],
+    ),
+    (
+        "Ownership Percentage",
+        [
+            ([("owned", "<", 20)], 2, 2, "❌ Very low ownership < 20%: +2 points"),
+            ([("owned", "<", 30)], 1, 1, "⚠️ Low ownership < 30%: +1 point"),
+            ([], 0, 0, "✅ Ownership acceptable"),
+        ],
+    ),
+    (
+        "Preseason Expectations Vs Performance",
+        [
+            ([("projected_rank", "<", 50), ("performance", "<", 2.3)], 2, 2, "❌ High draft pick ({projected_rank}) underperforming: +2 points"),
+            ([("projected_rank", "<", 50)], -2, -2, "🔥 High draft pick ({projected_rank}) meeting expectations: -2 points"),
+            ([("projected_rank", "<", 100), ("performance", "<", 2.3)], 1, 1, "⚠️ Medium draft pick ({projected_rank}) underperforming: +1 point"),
+            ([("projected_rank", "<", 100)], -1, -1, "🔥 Medium draft pick ({projected_rank}) meeting expectations: -1 point"),
+            ([], 0, 0, "✅ Meeting expectations or low draft pick"),
+        ],
+    ),
+    (
+        "Preseason Projection",
+        [
+            ([("projected_rank", ">", 200)], 1, 1, "❌ Extremely low projections ({projected_rank}): +1 point"),
+            ([], 0, 0, "✅ Projected rank is acceptable"),
+        ],
+    ),
+]
+MOVE_OPERATORS = {"<": operator.lt, ">": operator.gt}
+# Players at or above these scores are drop or add candidates
+DROP_THRESHOLD = 4
+ADD_THRESHOLD = 0
+
+
+class BatchMoveScorer:
+    """Drop and add scores from MOVE_RULES for arrays of players, worked out in one pass.
+
+    Only the index of the rule each player met in each block is kept; reasons are formatted when a player is logged.
+    """
+
+    def __init__(self, league, players):
+        self.logger = logging.getLogger(__name__)
+        self.players = list(players)
+        self.positions = {id(player): index for index, player in enumerate(self.players)}
+        last_week, season = league.time_periods[0], league.time_periods[2]
+        self.features = {
+            "last_week": np.array([player.rankings[last_week]["weighted_score"] for player in self.players], dtype=float),
+            "season": np.array([player.rankings[season]["weighted_score"] for player in self.players], dtype=float),
+            "projected_rank": np.array([player.rankings[season]["projected_rank"] for player in self.players], dtype=float),
+            "owned": np.array([player.percent_owned for player in self.players], dtype=float),
+        }
+        self.features["performance"] = (self.features["last_week"] + self.features["season"]) / 2
+        self.matches = [self.match(rules) for _, rules in MOVE_RULES]
+        self.drop_scores = sum(np.array([rule[1] for rule in rules])[matched] for (_, rules), matched in zip(MOVE_RULES, self.matches))
+        self.add_scores = -sum(np.array([rule[2] for rule in rules])[matched] for (_, rules), matched in zip(MOVE_RULES, self.matches))
+
+    def clause(self, feature, op, threshold):
+        if isinstance(threshold, tuple):
+            threshold = self.features[threshold[0]] * threshold[1]
+        return MOVE_OPERATORS[op](self.features[feature], threshold)
+
+    def match(self, rules):
+        """Index of the first rule each player meets; the last rule of a block has no clauses and catches the rest"""
+        conditions = [
+            np.logical_and.reduce([self.clause(*clause) for clause in clauses]) if clauses else np.ones(len(self.players), dtype=bool)
+            for clauses, _, _, _ in rules
+        ]
+        return np.select(conditions, np.arange(len(rules)), default=len(rules) - 1)
+
+    def __contains__(self, player):
+        return id(player) in self.positions
+
+    def score(self, player, is_drop=True):
+        index = self.positions[id(player)]
+        return int(self.drop_scores[index] if is_drop else self.add_scores[index])
+
+    def reasons(self, player):
+        index = self.positions[id(player)]
+        season = self.features["season"][index]
+        projected_rank = self.features["projected_rank"][index]
+        values = {
+            "last_week": self.features["last_week"][index],
+            "season": season,
+            "season_70": season * 0.7,
+            "season_85": season * 0.85,
+            "season_120": season * 1.2,
+            "projected_rank": int(projected_rank) if np.isfinite(projected_rank) else projected_rank,
+        }
+        return [rules[matched[index]][3].format(**values) for (_, rules), matched in zip(MOVE_RULES, self.matches)]
+
+    def log_player(self, player, is_drop=True):
+        self.logger.info(f"Candidate: {player.name} [{self.score(player, is_drop)}]")
+        for reason in self.reasons(player):
+            self.logger.info(f"- {reason}")
+
+
+class BatchPlayerEvaluator:
+    def __init__(self, league, players):
+        self.logger = logging.getLogger(__name__)
+        self.league = league
+        self.players = list(players)
+        self.positions = {id(player): index for index, player in enumerate(self.players)}
+        self.components = {}
+        self.unified_scores = np.zeros(len(self.players))
+
+    def evaluate(self):
+        """Score every player in one vectorized pass and store the result on player.unified_score"""
+        league = self.league
+        season = league.time_periods[2]
+        scores = np.array(
+            [[player.rankings[period]["weighted_score"] for period in league.time_periods] for player in self.players], dtype=float
+        ).reshape(len(self.players), len(league.time_periods))
+        projected_rank = np.array([player.rankings[season]["projected_rank"] for player in self.players], dtype=float)
+        owned_percentage = np.array([player.percent_owned for player in self.players], dtype=float)
+        inactive = np.array([player.is_inactive for player in self.players], dtype=bool)
+
+        percentiles = [league.average_weighted_scores[period]["percentiles"] for period in league.time_periods]
+        weights = {name: getattr(league, name) for name in DECISION_WEIGHTS}
+        self.components = unified_score_components(scores, projected_rank, owned_percentage, inactive, percentiles, weights)
+        self.projected_rank = projected_rank
+        self.unified_scores = sum(self.components.values())
+
+        for player, score in zip(self.players, self.unified_scores):
+            player.unified_score = float(score)
+        return self.unified_scores
+
+    def reasons(self, player):
+        """Build the human readable breakdown for a single evaluated player"""
+        index = self.positions[id(player)]
+        components = {name: values[index] for name, values in self.components.items()}
+        projected_rank = self.projected_rank[index]
+        projected_rank = int(projected_rank) if np.isfinite(projected_rank) else projected_rank
+
+        reasons = [
+            f"  - Last Week Score: {components['last_week']:.2f}",
+            f"  - Last Month Score: {components['last_month']:.2f}",
+            f"  - Season Score: {components['season']:.2f}",
+            f"  - Projected Rank Vs Performance: {components['projection_vs_performance']:.2f}",
+            f"  - Ownership Percentage: {components['ownership']:.2f}",
+        ]
+        if components["preseason"] == -0.25:
+            reasons.append(f"❌ Low projections ({projected_rank}): -0.25 point")
+        elif components["preseason"] < 0:
+            reasons.append(f"❌ Extremely low projections ({projected_rank}): {components['preseason']:.2f} point")
+        else:
+            reasons.append("✅ Projected rank is acceptable")
+        if components["inactive"]:
+            reasons.append("❌ Inactive status: -1 point")
+        return reasons
+
+    def log_player(self, player):
+        self.logger.info(f"Candidate: {player.name} [{player.unified_score}]")
+        for reason in self.reasons(player):
+            self.logger.info(f"- {reason}")
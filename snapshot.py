@@ -0,0 +1,240 @@
+import os
+import json
+import shutil
+import logging
+from datetime import datetime
+from cache import CACHE_DIR
+from nhl import NHL
+from player import Player
+from util.lazy import lazy_import
+import telemetry
+
+np = lazy_import("numpy")
+
+SNAPSHOT_VERSION = 1
+SNAPSHOT_DIR = os.path.join(CACHE_DIR, "snapshots")
+HEADER_FILE = "header.json"
+STRING_COLUMNS = ["name", "team", "status", "position", "location", "position_type"]
+
+logger = logging.getLogger(__name__)
+
+
+class StringTable:
+    """Interns strings so columns can store small integer codes instead of Python objects"""
+
+    def __init__(self, values=None):
+        self.values = list(values or [])
+        self.codes = {value: code for code, value in enumerate(self.values)}
+
+    def code(self, value):
+        value = "" if value is None else str(value)
+        if value not in self.codes:
+            self.codes[value] = len(self.values)
+            self.values.append(value)
+        return self.codes[value]
+
+    def __getitem__(self, code):
+        return self.values[code]
+
+
+class Snapshot:
+    """A data-only, memory-mapped view of a saved snapshot directory"""
+
+    def __init__(self, path, header, columns):
+        self.path = path
+        self.header = header
+        self.columns = columns
+        self.strings = {column: StringTable(values) for column, values in header["strings"].items()}
+        self.time_periods = header["time_periods"]
+        self.stat_names = header["stat_names"]
+        self.extra = header.get("extra", {})
+
+    def __len__(self):
+        return self.header["count"]
+
+    def string(self, column, index):
+        value = self.strings[column][int(self.columns[column][index])]
+        return value if value != "" else None
+
+    def eligible_positions(self, index):
+        mask = int(self.columns["eligible"][index])
+        return [position for bit, position in enumerate(self.strings["eligible"].values) if mask & (1 << bit)]
+
+    def stats(self, index):
+        stats = {}
+        values = self.columns["stats"][index]
+        present = self.columns["stats_present"][index]
+        for period_index, period in enumerate(self.time_periods):
+            period_stats = {}
+            for stat_index, stat in enumerate(self.stat_names):
+                if present[period_index, stat_index]:
+                    value = values[period_index, stat_index]
+                    period_stats[stat] = "-" if np.isnan(value) else float(value)
+            if period_stats:
+                stats[period] = period_stats
+        return stats
+
+    def rankings(self, index):
+        rankings = {}
+        ranked = self.columns["ranked"][index]
+        projected_rank = float(self.columns["projected_rank"][index])
+        projected_rank = int(projected_rank) if np.isfinite(projected_rank) else projected_rank
+        for period_index, period in enumerate(self.time_periods):
+            if ranked[period_index]:
+                weighted_score = float(self.columns["weighted_score"][index, period_index])
+                rankings[period] = {"score": weighted_score, "projected_rank": projected_rank, "weighted_score": weighted_score}
+        return rankings
+
+
+def snapshot_path(name, date_str=None):
+    date_str = date_str or datetime.now().strftime("%Y-%m-%d")
+    return os.path.join(SNAPSHOT_DIR, f"{date_str}_{name}")
+
+
+def write_snapshot(path, columns, header):
+    """Write columns and header to a temporary directory and swap it into place"""
+    tmp_path = f"{path}.tmp-{os.getpid()}"
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    os.makedirs(tmp_path)
+    for column, values in columns.items():
+        np.save(os.path.join(tmp_path, f"{column}.npy"), values, allow_pickle=False)
+    with open(os.path.join(tmp_path, HEADER_FILE), "w") as f:
+        json.dump({"version": SNAPSHOT_VERSION, "created": datetime.now().isoformat(), **header}, f)
+    shutil.rmtree(path, ignore_errors=True)
+    os.replace(tmp_path, path)
+
+
+def read_snapshot(path):
+    """Memory-map a snapshot directory, returning None when it is missing or from another format version"""
+    header_path = os.path.join(path, HEADER_FILE)
+    if not os.path.exists(header_path):
+        logger.debug(f"No snapshot found at {path}")
+        telemetry.count("snapshot", cache_misses=1)
+        return None
+    try:
+        with open(header_path, "r") as f:
+            header = json.load(f)
+        if header.get("version") != SNAPSHOT_VERSION:
+            logger.info(f"Ignoring snapshot {path} with version {header.get('version')}, expected {SNAPSHOT_VERSION}")
+            return None
+        columns = {}
+        for filename in os.listdir(path):
+            if filename.endswith(".npy"):
+                columns[filename[: -len(".npy")]] = np.load(os.path.join(path, filename), mmap_mode="r", allow_pickle=False)
+        telemetry.count("snapshot", cache_hits=1)
+        return Snapshot(path, header, columns)
+    except Exception as e:
+        logger.error(f"Error loading snapshot {path}: {e}")
+        return None
+
+
+def player_columns(players, time_periods):
+    """Flatten Player objects into columnar arrays plus the string tables needed to decode them"""
+    strings = {column: StringTable() for column in STRING_COLUMNS}
+    eligible = StringTable()
+    stat_names = StringTable()
+    for player in players:
+        for period_stats in player.stats.values():
+            for stat in period_stats:
+                stat_names.code(stat)
+
+    count = len(players)
+    shape = (count, len(time_periods), len(stat_names.values))
+    columns = {
+        "player_id": np.zeros(count, dtype=np.int64),
+        "eligible": np.zeros(count, dtype=np.uint64),
+        "percent_owned": np.zeros(count, dtype=np.float32),
+        "points": np.zeros(count, dtype=np.float64),
+        "is_goalie": np.zeros(count, dtype=bool),
+        "game_today": np.zeros(count, dtype=bool),
+        "starting_behind_net": np.zeros(count, dtype=bool),
+        "stats": np.full(shape, np.nan),
+        "stats_present": np.zeros(shape, dtype=bool),
+        "weighted_score": np.zeros((count, len(time_periods))),
+        "ranked": np.zeros((count, len(time_periods)), dtype=bool),
+        "projected_rank": np.full(count, np.inf),
+        "unified_score": np.zeros(count),
+    }
+    for column in STRING_COLUMNS:
+        columns[column] = np.zeros(count, dtype=np.int32)
+
+    for index, player in enumerate(players):
+        columns["player_id"][index] = int(player.player_id)
+        columns["name"][index] = strings["name"].code(player.name)
+        columns["team"][index] = strings["team"].code(player.team)
+        columns["status"][index] = strings["status"].code(player.status)
+        columns["position"][index] = strings["position"].code(player.position)
+        columns["location"][index] = strings["location"].code(player.location)
+        columns["position_type"][index] = strings["position_type"].code(player.position_type)
+        columns["eligible"][index] = sum(1 << eligible.code(position) for position in player.eligible_positions)
+        columns["percent_owned"][index] = float(player.percent_owned or 0)
+        columns["points"][index] = float(player.points or 0)
+        columns["is_goalie"][index] = player.is_goalie
+        columns["game_today"][index] = bool(player.game_today)
+        columns["starting_behind_net"][index] = bool(player.starting_behind_net)
+        columns["unified_score"][index] = float(player.unified_score or 0)
+        for period_index, period in enumerate(time_periods):
+            for stat, value in player.stats.get(period, {}).items():
+                stat_index = stat_names.codes[stat]
+                columns["stats_present"][index, period_index, stat_index] = True
+                try:
+                    columns["stats"][index, period_index, stat_index] = float(value)
+                except (TypeError, ValueError):
+                    pass
+            ranking = player.rankings.get(period)
+            if ranking:
+                columns["ranked"][index, period_index] = True
+                columns["weighted_score"][index, period_index] = ranking["weighted_score"]
+                columns["projected_rank"][index] = ranking["projected_rank"]
+
+    strings = {column: table.values for column, table in strings.items()}
+    strings["eligible"] = eligible.values
+    header = {"count": count, "time_periods": list(time_periods), "stat_names": stat_names.values, "strings": strings}
+    return columns, header
+
+
+def save_players(players, name, time_periods, date_str=None):
+    """Save a player pool, including stats and rankings, as a columnar snapshot"""
+    try:
+        columns, header = player_columns(players, time_periods)
+        path = snapshot_path(name, date_str)
+        write_snapshot(path, columns, header)
+        logger.debug(f"Snapshot of {len(players)} players saved to {path}")
+    except Exception as e:
+        logger.error(f"Error saving snapshot {name}: {e}")
+
+
+def load_players(name, league, date_str=None):
+    """Load a snapshot of a player pool (today's by default) as Player objects bound to the given league"""
+    snapshot = read_snapshot(snapshot_path(name, date_str))
+    if snapshot is None:
+        return None
+    return [Player.from_snapshot(snapshot, index, league) for index in range(len(snapshot))]
+
+
+def save_nhl(nhl):
+    """Save the schedule and scraped projections held by an NHL object"""
+    try:
+        teams = list(nhl.teams_playing.keys())
+        columns = {"playing": np.array([bool(nhl.teams_playing[team]) for team in teams], dtype=bool)}
+        header = {
+            "count": len(teams),
+            "time_periods": [],
+            "stat_names": [],
+            "strings": {"team": teams},
+            "extra": {
+                "skaters": nhl.skaters,
+                "goalies": nhl.goalies,
+                "goalie_extra_stats": nhl.goalie_extra_stats,
+            },
+        }
+        write_snapshot(snapshot_path("nhl"), columns, header)
+    except Exception as e:
+        logger.error(f"Error saving NHL snapshot: {e}")
+
+
+def load_nhl():
+    snapshot = read_snapshot(snapshot_path("nhl"))
+    if snapshot is None:
+        return None
+    return NHL.from_snapshot(snapshot)
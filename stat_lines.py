@@ -0,0 +1,135 @@
+import os
+import json
+import logging
+from datetime import datetime, timedelta
+from cache import CACHE_DIR, file_lock
+import telemetry
+
+STAT_LINES_FILE = os.path.join(CACHE_DIR, "stat_lines.json")
+
+# Each period is refreshed once its stat lines predate the most recent refresh boundary.
+# refresh_hour is the local hour by which the previous night's games are final, and
+# max_age forces a refresh even if no boundary has passed (None to rely on the boundary only).
+REFRESH_POLICIES = {
+    "lastweek": {"refresh_hour": 4, "max_age": timedelta(hours=24)},
+    "lastmonth": {"refresh_hour": 4, "max_age": timedelta(hours=24)},
+    "season": {"refresh_hour": 4, "max_age": None},
+}
+DEFAULT_REFRESH_POLICY = {"refresh_hour": 4, "max_age": timedelta(hours=12)}
+
+
+def last_refresh_boundary(period, now=None):
+    """Return the most recent time after which stat lines for the period are considered stale"""
+    now = now or datetime.now()
+    policy = REFRESH_POLICIES.get(period, DEFAULT_REFRESH_POLICY)
+    boundary = now.replace(hour=policy["refresh_hour"], minute=0, second=0, microsecond=0)
+    if boundary > now:
+        boundary -= timedelta(days=1)
+    return boundary
+
+
+def is_stale(period, fetched_at, now=None):
+    now = now or datetime.now()
+    if fetched_at < last_refresh_boundary(period, now):
+        return True
+    max_age = REFRESH_POLICIES.get(period, DEFAULT_REFRESH_POLICY)["max_age"]
+    return max_age is not None and now - fetched_at > max_age
+
+
+class StatLineStore:
+    """Stat lines per (player, period), each tagged with the time it was fetched from Yahoo.
+
+    A shared store may be written by several processes, so saving merges with the file on disk
+    and keeps whichever line for a player and period was fetched last.
+    """
+
+    def __init__(self, path=STAT_LINES_FILE, shared=False):
+        self.logger = logging.getLogger(__name__)
+        self.path = path
+        self.shared = shared
+        self.lines = {}
+        self.dirty = False
+        self.load()
+
+    def load(self):
+        self.lines = self.read_lines()
+
+    def read_lines(self):
+        if not os.path.exists(self.path):
+            return {}
+        try:
+            with open(self.path, "r") as f:
+                return json.load(f)
+        except Exception as e:
+            self.logger.error(f"Error loading stat lines from {self.path}: {e}")
+            return {}
+
+    def merge(self, lines):
+        """Take every line from lines that is newer than the one held here"""
+        for player_id, periods in lines.items():
+            held = self.lines.setdefault(player_id, {})
+            for period, line in periods.items():
+                if period not in held or line["fetched_at"] > held[period]["fetched_at"]:
+                    held[period] = line
+
+    def save(self):
+        if not self.dirty:
+            return
+        try:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            if self.shared:
+                with file_lock(self.path):
+                    self.merge(self.read_lines())
+                    self.write_lines()
+            else:
+                self.write_lines()
+            self.dirty = False
+        except Exception as e:
+            self.logger.error(f"Error saving stat lines to {self.path}: {e}")
+
+    def write_lines(self):
+        tmp_path = f"{self.path}.tmp-{os.getpid()}"
+        with open(tmp_path, "w") as f:
+            json.dump(self.lines, f)
+        os.replace(tmp_path, self.path)
+
+    def get(self, player_id, period):
+        """Return the stored stat row for a player and period, or None"""
+        line = self.lines.get(str(player_id), {}).get(period)
+        return line["stats"] if line else None
+
+    def fetched_at(self, player_id, period):
+        line = self.lines.get(str(player_id), {}).get(period)
+        return datetime.fromisoformat(line["fetched_at"]) if line else None
+
+    def stale_ids(self, player_ids, period, now=None):
+        """Return the ids whose stat line for the period is missing or past its refresh schedule"""
+        stale = []
+        for player_id in player_ids:
+            fetched_at = self.fetched_at(player_id, period)
+            if fetched_at is None or is_stale(period, fetched_at, now):
+                stale.append(player_id)
+        return stale
+
+    def update(self, period, stat_rows, fetched_at=None):
+        fetched_at = (fetched_at or datetime.now()).isoformat()
+        for row in stat_rows:
+            self.lines.setdefault(str(row["player_id"]), {})[period] = {"fetched_at": fetched_at, "stats": row}
+        self.dirty = self.dirty or len(stat_rows) > 0
+
+    def refresh(self, league, player_ids, period, now=None):
+        """Fetch only the stale stat lines for the period and return the rows for every requested player"""
+        if self.shared:
+            # Another league or team on the same game may have fetched these lines since they were loaded
+            self.merge(self.read_lines())
+        stale_ids = self.stale_ids(player_ids, period, now)
+        self.logger.info(f"{len(stale_ids)} of {len(player_ids)} {period} stat lines are stale")
+        telemetry.count("stat_lines", cache_hits=len(player_ids) - len(stale_ids), cache_misses=len(stale_ids))
+        if stale_ids:
+            self.update(period, league.player_stats(stale_ids, req_type=period), now)
+        rows = []
+        for player_id in player_ids:
+            row = self.get(player_id, period)
+            if row is not None:
+                rows.append(row)
+        return rows
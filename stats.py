@@ -1,16 +1,27 @@
 import logging
 from league import League
-import cache
-import pandas as pd
+import snapshot
+from stat_lines import StatLineStore
 import os
 from util import constants
-from tqdm import tqdm
-import numpy as np
+from util.lazy import lazy_import, tqdm
+from telemetry import span
+from scoring import BatchPlayerEvaluator, PERCENTILE_LABELS, PERCENTILE_LEVELS
+from aggregates import StatAggregateStore, numeric
+import windows
+
+pd = lazy_import("pandas")
+
+PROJECTIONS_DIR = os.path.join(os.path.dirname(__file__), "projections")
 
 
 class LeagueStatistics(League):
-    def __init__(self, yahoo_api, league_key, team_key, nhl, roster):
-        super().__init__(yahoo_api, league_key, team_key, nhl)
+    def __init__(self, yahoo_api, league_key, team_key, nhl, roster, league=None, stat_lines=None):
+        # Pools already loaded by the given league are reused instead of being fetched again
+        super().__init__(yahoo_api, league_key, team_key, nhl, load_players=league is None)
+        if league is not None:
+            self.players = league.players
+            self.players_details = league.players_details
 
         self.logger = logging.getLogger(__name__)
         self.projection_weight = 0.3
@@ -18,24 +29,39 @@ class LeagueStatistics(League):
         self.score_weight = 0.7
 
         self.roster = roster
-        self.taken = cache.load_object("league_taken_stats") or self.get_stats_for_league(location="taken")
-        self.free_agents = cache.load_object("league_free_agents_stats") or self.get_stats_for_league(location="free_agents")
-        self.rostered = cache.load_object("league_rostered_stats") or self.get_stats_for_league(location="roster")
-        cache.save_object(self.rostered, "league_rostered_stats")
-        cache.save_object(self.free_agents, "league_free_agents_stats")
-        cache.save_object(self.taken, "league_taken_stats")
-        # self.normalized_roster = self.normalize_stats(self.rostered)
-        self.taken_averaged = self.get_average_stats(self.taken)
-        self.normalize_stats(self.rostered)
-        self.normalize_stats(self.free_agents)
-        self.normalize_stats(self.taken)
-
+        self.stat_lines = stat_lines or StatLineStore()
+        # League-wide aggregates of the taken players' stat lines, kept in step with each refresh
+        self.aggregates = StatAggregateStore()
         self.skater_projections = self.load_skater_projections()
         self.goalie_projections = self.load_goalie_projections()
         self.logger.debug(f"Skater Projections: {self.skater_projections.head()}")
         self.logger.debug(f"Goalie Projections: {self.goalie_projections.head()}")
 
+        self.refresh(use_snapshot=True)
+
+    @span("statistics.refresh")
+    def refresh(self, use_snapshot=False):
+        """Pull stats for every pool (only stale stat lines hit Yahoo), normalize them and rebuild the rankings"""
+        if use_snapshot:
+            self.taken = self.load_stats_snapshot("league_taken_stats") or self.get_stats_for_league(location="taken")
+            self.free_agents = self.load_stats_snapshot("league_free_agents_stats") or self.get_stats_for_league(location="free_agents")
+            self.rostered = self.load_stats_snapshot("league_rostered_stats") or self.get_stats_for_league(location="roster")
+        else:
+            self.taken = self.get_stats_for_league(location="taken")
+            self.free_agents = self.get_stats_for_league(location="free_agents")
+            self.rostered = self.get_stats_for_league(location="roster")
+        snapshot.save_players(list(self.rostered.values()), "league_rostered_stats", self.time_periods)
+        snapshot.save_players(list(self.free_agents.values()), "league_free_agents_stats", self.time_periods)
+        snapshot.save_players(list(self.taken.values()), "league_taken_stats", self.time_periods)
+        # self.normalized_roster = self.normalize_stats(self.rostered)
+        self.update_aggregates(self.taken)
+        self.taken_averaged = self.get_average_stats()
+        self.normalize_stats(self.rostered)
+        self.normalize_stats(self.free_agents)
+        self.normalize_stats(self.taken)
+
         self.master_player_rankings = PlayerRankings()
+        self.projected_ranks = self.build_projected_ranks()
 
         ranked_rostered = self.calculate_player_rankings(self.rostered)
         ranked_free_agents = self.calculate_player_rankings(self.free_agents)
@@ -49,9 +75,15 @@ class LeagueStatistics(League):
                 break
         logging.info("--------------------------------")
 
+    def load_stats_snapshot(self, name):
+        players = snapshot.load_players(name, self)
+        if players is None:
+            return None
+        return {player.name: player for player in players}
+
     def load_skater_projections(self):
         try:
-            data = pd.read_csv(os.path.join(os.path.dirname(__file__), "projections/skater_projections.csv"))
+            data = pd.read_csv(os.path.join(PROJECTIONS_DIR, "skater_projections.csv"))
             logging.info("Skater projections loaded successfully.")
             sorted_data = data.sort_values(by="Rank", ascending=True)
             return sorted_data
@@ -60,91 +92,65 @@ class LeagueStatistics(League):
 
     def load_goalie_projections(self):
         try:
-            data = pd.read_csv(os.path.join(os.path.dirname(__file__), "projections/goalie_projections.csv"))
+            data = pd.read_csv(os.path.join(PROJECTIONS_DIR, "goalie_projections.csv"))
             logging.info("Goalie projections loaded successfully.")
             sorted_data = data.sort_values(by="Rank", ascending=True)
             return sorted_data
         except Exception as e:
             logging.error(f"An error occurred while loading the file: {e}")
 
-    def get_average_stats(self, players_to_average):
-        # Initialize dictionaries to store totals and counts
-        totals = {role: {period: {} for period in self.time_periods} for role in ["goalies", "skaters"]}
-        counts = {role: {period: {} for period in self.time_periods} for role in ["goalies", "skaters"]}
-
-        # Iterate through each player to populate totals and counts
-        for player in players_to_average.values():
-            role = "goalies" if player.is_goalie else "skaters"
+    def build_projected_ranks(self):
+        """Projection rank by Yahoo player id, so ranking a player is a dict lookup instead of a scan of the CSV"""
+        crosswalk = self.universe.crosswalk
+        for players in (self.rostered, self.free_agents, self.taken):
+            crosswalk.register_players(players.values())
+        ranks = {}
+        for role, projections, column in (("skaters", self.skater_projections, "Player"), ("goalies", self.goalie_projections, "player")):
+            rows = zip(projections[column].values, projections["Rank"].values) if projections is not None else []
+            ranks[role] = crosswalk.key_by_id(rows, "projections")
+        crosswalk.save()
+        return ranks
+
+    def update_aggregates(self, players):
+        """Bring the aggregates in line with the players' stat lines; only lines that changed are touched"""
+        self.aggregates.sync(
+            {
+                player.player_id: [("goalies" if player.is_goalie else "skaters", period, stats) for period, stats in player.stats.items()]
+                for player in players.values()
+            }
+        )
+
+    def get_average_stats(self):
+        averages = {role: {period: {} for period in self.time_periods} for role in ["goalies", "skaters"]}
+        for role in averages:
             categories = self.goalie_categories if role == "goalies" else self.skater_categories
-
             for period in self.time_periods:
-                if period in player.stats:
-                    for stat, value in player.stats[period].items():
-                        if stat in categories:
-                            if stat not in totals[role][period]:
-                                totals[role][period][stat] = 0
-                                counts[role][period][stat] = 0
-                            try:
-                                totals[role][period][stat] += value
-                                counts[role][period][stat] += 1
-                            except Exception as e:
-                                logging.debug(f"Error adding {value} to {stat} for {player.name} in {period}: {e}")
-
-        # Calculate averages
-        averages = {role: {period: {} for period in self.time_periods} for role in ["goalies", "skaters"]}
-        for role in totals:
-            for period in totals[role]:
-                for stat in totals[role][period]:
-                    if counts[role][period][stat] > 0:  # Avoid division by zero
-                        averages[role][period][stat] = totals[role][period][stat] / counts[role][period][stat]
-
+                averages[role][period] = self.aggregates.averages(role, period, categories)
         return averages
 
+    def window_stats(self, players, days):
+        """Stats over the last `days` completed days, from per-date lines, keyed by player id"""
+        ledger = self.universe.daily_ledger(self.league_categories)
+        player_ids = [player.player_id for player in players]
+        ledger.refresh(self.league, player_ids, days=days)
+        return ledger.window_lines(player_ids, self.skater_categories + self.goalie_categories, days)
+
+    def ewma_stats(self, players, halflife, days=None):
+        """Per game averages weighted towards recent days, as a (players, categories) array in the order of players"""
+        ledger = self.universe.daily_ledger(self.league_categories)
+        player_ids = [player.player_id for player in players]
+        ledger.refresh(self.league, player_ids, days=days or windows.LEDGER_DAYS)
+        return ledger.ewma(player_ids, self.skater_categories + self.goalie_categories, halflife)
+
+    @span("statistics.normalize_stats")
     def normalize_stats(self, players):
         # Initialize the normalized stats dictionary
         normalized_players = {}
 
-        # Global stat max and min dictionaries
-        global_thresholds = {period: {"max": {}, "min": {}} for period in self.time_periods}
-
-        # Debugging: Check initial data stats
-        for name, player in players.items():
-            for time_frame in self.time_periods:
-                time_frame_stats = player.stats.get(time_frame, {})
-
-        # Iterate through each player and timeframe to update global max/min
-        for name, player in self.taken.items():
-            for time_frame, time_frame_stats in player.stats.items():
-                for stat, value in time_frame_stats.items():
-                    # Convert string numbers to floats if necessary
-                    if isinstance(value, str):
-                        value = float(value) if value.replace(".", "", 1).isdigit() else 0
-                    # Initialize or update global max and min for each timeframe
-                    if stat not in global_thresholds[time_frame]["max"] or value > global_thresholds[time_frame]["max"][stat]:
-                        global_thresholds[time_frame]["max"][stat] = value
-                    if stat not in global_thresholds[time_frame]["min"] or value < global_thresholds[time_frame]["min"][stat]:
-                        global_thresholds[time_frame]["min"][stat] = value
-
+        # Global stat max and min over the taken players, read from the aggregates
+        global_thresholds = {period: self.aggregates.thresholds(period, ["goalies", "skaters"]) for period in self.time_periods}
         logging.debug(f"Global Thresholds: {global_thresholds}")
-        # Normalize stats using global max and min
-        for name, player in players.items():
-            for time_frame in self.time_periods:
-                player_normalized_stats = {}
 
-                time_frame_stats = player.stats.get(time_frame, {})
-                normalized_stats = {}
-                for stat, value in time_frame_stats.items():
-                    value = float(value) if isinstance(value, str) and value.replace(".", "", 1).isdigit() else 0
-                    max_val = global_thresholds[time_frame]["max"][stat]
-                    min_val = global_thresholds[time_frame]["min"][stat]
-                    if max_val == min_val:
-                        normalized_stats[stat] = 1  # Handle the case where all values are the same
-                    else:
-                        normalized_stats[stat] = (value - min_val) / (max_val - min_val)
-
-            player_normalized_stats[time_frame] = normalized_stats
-
-            normalized_players[name] = player_normalized_stats
         # Normalize each player's stats
         for name, player in players.items():
             normalized_players[name] = {}
@@ -156,8 +162,7 @@ class LeagueStatistics(League):
                     # Calculate normalized value
                     max_val = global_thresholds[time_frame]["max"][stat]
                     min_val = global_thresholds[time_frame]["min"][stat]
-                    if isinstance(value, str):
-                        value = float(value) if value.replace(".", "", 1).isdigit() else 0
+                    value = numeric(value) or 0
                     if max_val > min_val:
                         normalized_value = round((value - min_val) / (max_val - min_val), 2)
                         if stat in self.inverse_league_stats and player.is_goalie:
@@ -171,6 +176,7 @@ class LeagueStatistics(League):
             logging.debug(f"Normalized Players: {normalized_players}")
         return normalized_players
 
+    @span("statistics.get_stats_for_league")
     def get_stats_for_league(self, location="taken", position=None):
         location_details = location
         if location == "taken":
@@ -204,27 +210,24 @@ class LeagueStatistics(League):
 
             player_stats_dict[player.name] = player
         for time_frame in tqdm(self.time_periods, desc="Fetching player stats for each time frame.."):
-            player_stats = self.league.player_stats(player_ids, req_type=time_frame)
+            player_stats = self.stat_lines.refresh(self.league, player_ids, time_frame)
             for stat in player_stats:
                 cleaned_stats = {k: v for k, v in stat.items() if k != "player_id" and k != "name" and k != "position_type"}
                 logging.debug(f"Stats for Player ID {stat['player_id']} during {time_frame}: {cleaned_stats}")
                 player_stats_dict[stat["name"]].stats[time_frame] = cleaned_stats
+        self.stat_lines.save()
 
         logging.info("Player stats for all time frames updated successfully in self.league_stats")
         logging.debug(f"League stats: {player_stats_dict}")
         return player_stats_dict
 
+    @span("statistics.calculate_player_rankings")
     def calculate_player_rankings(self, players):
         logging.info(f"Getting rankings for {len(players)} players")
         ranked_players = []
         for name, player in tqdm(players.items(), desc="Calculating player rankings.."):
-            if player.is_goalie:
-                player_rank = self.goalie_projections.loc[self.goalie_projections["player"] == name, "Rank"]
-            else:
-                player_rank = self.skater_projections.loc[self.skater_projections["Player"] == name, "Rank"]
-            projected_rank = float("inf")
-            if not player_rank.empty:
-                projected_rank = int(player_rank.iloc[0])
+            player_rank = self.projected_ranks["goalies" if player.is_goalie else "skaters"].get(player.player_id)
+            projected_rank = float("inf") if player_rank is None else int(player_rank)
 
             player.rankings = {period: {} for period in self.time_periods}
             for time_frame, stats in player.normalized_stats.items():
@@ -250,14 +253,21 @@ class LeagueStatistics(League):
 class PlayerRankings:
     def __init__(self):
         self.players = []
+        self.evaluator = None
+        # Weighted scores per period, so averages and percentiles follow each added or re-ranked player
+        self.scores = StatAggregateStore()
 
     def add_player(self, player):
         if player not in self.players:
             self.players.append(player)
+        for time_frame, ranking in player.rankings.items():
+            if "weighted_score" in ranking:
+                self.scores.upsert(id(player), "all", time_frame, {"weighted_score": ranking["weighted_score"]})
 
-    def evaluate_all_players(self):
-        for player in self.players:
-            player.evaluate_player(no_log=True)
+    def evaluate_all_players(self, league):
+        """Score the whole pool in one pass, reasons are only built for players that get logged"""
+        self.evaluator = BatchPlayerEvaluator(league, self.players)
+        return self.evaluator.evaluate()
 
     def get_by_time_period(self, time_frame, location="all"):
         filtered_players = self.players if location == "all" else [p for p in self.players if p.location == location]
@@ -271,24 +281,16 @@ class PlayerRankings:
         return sum(player.rankings[time_frame]["weighted_score"] for player in self.players) / len(self.players)
 
     def get_weighted_score_statistics(self, time_frame):
-        scores = [player.rankings[time_frame]["weighted_score"] for player in self.players]
-
-        # Calculate average
-        average = sum(scores) / len(scores) if scores else 0
-
-        # Calculate percentiles
-        percentiles = {
-            "95th": np.percentile(scores, 95),
-            "90th": np.percentile(scores, 90),
-            "80th": np.percentile(scores, 80),
-            "70th": np.percentile(scores, 70),
-            "60th": np.percentile(scores, 60),
-            "50th": np.percentile(scores, 50),
-            "40th": np.percentile(scores, 40),
-            "30th": np.percentile(scores, 30),
-            "20th": np.percentile(scores, 20),
-            "10th": np.percentile(scores, 10),
-            "5th": np.percentile(scores, 5),
-        }
-
-        return {"average": average, "percentiles": percentiles}
+        return self.get_weighted_score_statistics_by_period([time_frame])[time_frame]
+
+    def get_weighted_score_statistics_by_period(self, time_frames):
+        statistics = {}
+        for time_frame in time_frames:
+            scores = self.scores.aggregate("all", time_frame, "weighted_score")
+            if scores is None or not scores.count:
+                # An empty pool scores zero, as the average did before the store
+                statistics[time_frame] = {"average": 0.0, "percentiles": {label: 0.0 for label in PERCENTILE_LABELS}}
+                continue
+            percentiles = {label: float(scores.percentile(level)) for label, level in zip(PERCENTILE_LABELS, PERCENTILE_LEVELS)}
+            statistics[time_frame] = {"average": float(scores.mean()), "percentiles": percentiles}
+        return statistics
@@ -0,0 +1,370 @@
+import os
+import logging
+import datetime
+from util import constants
+from util.lazy import lazy_import
+
+np = lazy_import("numpy")
+pd = lazy_import("pandas")
+
+# Shaped like yahoo_fantasy_api's League.positions(), with IR slots
+DEFAULT_POSITIONS = {
+    "C": {"position_type": "P", "count": 2},
+    "LW": {"position_type": "P", "count": 2},
+    "RW": {"position_type": "P", "count": 2},
+    "D": {"position_type": "P", "count": 4},
+    "Util": {"position_type": "P", "count": 1},
+    "G": {"position_type": "G", "count": 2},
+    "BN": {"count": 4},
+    "IR+": {"count": 2},
+    "NA": {"count": 1},
+}
+SKATER_CATEGORIES = ["G", "A", "+/-", "PIM", "PPP", "SOG", "FW", "HIT", "BLK"]
+GOALIE_CATEGORIES = ["W", "GA", "GAA", "SV", "SV%", "SHO"]
+# Mean per game for each skater category, scaled by player quality
+SKATER_RATES = {"G": 0.3, "A": 0.45, "+/-": 0.05, "PIM": 0.5, "PPP": 0.2, "SOG": 2.4, "FW": 3.0, "HIT": 1.5, "BLK": 1.0}
+PERIOD_GAMES = {"lastweek": 3, "lastmonth": 13, "season": 60, "date": 1}
+POSITION_SHARES = [("C", 0.27), ("LW", 0.18), ("RW", 0.18), ("D", 0.30), ("G", 0.07)]
+SYLLABLES = ["ka", "lo", "mer", "vin", "sta", "ro", "ny", "dal", "bek", "tor", "an", "li", "son", "hav", "ric", "pel", "ov", "ma"]
+INJURY_STATUSES = ["DTD", "O", "IR", "IR-LT", "NA"]
+# Slots that are neither started nor on the bench, as League.inactive_positions
+INACTIVE_POSITIONS = ["IR+", "IL", "NA", "IR", "IR-LT"]
+
+
+def synthetic_name(index):
+    """Unique, pronounceable names derived from the player index"""
+    first = SYLLABLES[index % len(SYLLABLES)] + SYLLABLES[(index // len(SYLLABLES)) % len(SYLLABLES)]
+    rest = index // (len(SYLLABLES) ** 2)
+    last = SYLLABLES[(index * 7) % len(SYLLABLES)] + SYLLABLES[rest % len(SYLLABLES)] + SYLLABLES[(rest // len(SYLLABLES)) % len(SYLLABLES)]
+    return f"{first.title()} {last.title()}{index}"
+
+
+class SyntheticTeam:
+    """Stands in for yahoo_fantasy_api's Team, recording roster writes instead of sending them"""
+
+    def __init__(self, league, team_index):
+        self.league = league
+        self.team_index = team_index
+        self.writes = []
+
+    def roster(self):
+        return [self.league.roster_entry(player) for player in self.league.players if player["owner"] == self.team_index]
+
+    def change_positions(self, time_frame, modified_lineup):
+        self.writes.append(("change_positions", time_frame, list(modified_lineup)))
+        # Only the roster returned by roster() is kept, which is today's
+        if time_frame > datetime.date.today():
+            return
+        for change in modified_lineup:
+            self.league.by_id[int(change["player_id"])]["selected_position"] = change["selected_position"]
+
+    def matchup(self, week):
+        """Teams play the team next to them in the standings, the last one the first when the count is odd"""
+        opponent = self.team_index ^ 1 if self.team_index ^ 1 < self.league.num_teams else 0
+        return self.league.team_key(opponent)
+
+    def add_player(self, player_id):
+        self.writes.append(("add_player", player_id))
+        self.league.move_player(player_id, self.team_index)
+
+    def add_and_drop_players(self, add_player_id, drop_player_id):
+        self.writes.append(("add_and_drop_players", add_player_id, drop_player_id))
+        self.league.move_player(drop_player_id, None)
+        self.league.move_player(add_player_id, self.team_index)
+
+
+class SyntheticGoalieStarters:
+    """Answers NHL.is_goalie_starting_behind_net from the generated depth charts"""
+
+    def __init__(self, starters):
+        self.starters = starters
+
+    def fetch_data(self):
+        pass
+
+    def get_starting_goalies(self, goalie_names, refresh=True):
+        return {name: name in self.starters for name in goalie_names}
+
+
+class SyntheticLeague:
+    """A generated league that answers the yahoo_fantasy_api League calls made by League, Roster and LeagueStatistics"""
+
+    def __init__(self, num_teams=12, free_agents=1500, positions=None, seed=0, game_key="453", league_id=1, max_weekly_adds=4):
+        self.logger = logging.getLogger(__name__)
+        self.rng = np.random.default_rng(seed)
+        self.seed = seed
+        self.num_teams = num_teams
+        self.game_key = game_key
+        self.league_id = league_id
+        self.league_key = f"{game_key}.l.{league_id}"
+        self.positions_data = positions or DEFAULT_POSITIONS
+        self.max_weekly_adds = max_weekly_adds
+        self.nhl_teams = list(constants.NHL_TEAM_ID.keys())
+        self.teams_playing = {team: bool(playing) for team, playing in zip(self.nhl_teams, self.rng.random(len(self.nhl_teams)) < 0.5)}
+
+        roster_size = sum(int(info["count"]) for info in self.positions_data.values())
+        self.players = self.generate_players(num_teams * roster_size + free_agents)
+        self.by_id = {player["player_id"]: player for player in self.players}
+        self.assign_rosters(roster_size)
+        self.stats = {period: self.generate_stats(period) for period in constants.TIME_PERIODS}
+        self.daily_stats = {}
+        self.team_adds = {index: int(self.rng.integers(0, max_weekly_adds + 1)) for index in range(num_teams)}
+        self.teams_cache = {}
+
+    def generate_players(self, count):
+        rng = self.rng
+        shares = np.array([share for _, share in POSITION_SHARES])
+        primary = rng.choice(len(POSITION_SHARES), size=count, p=shares / shares.sum())
+        # Quality is heavy tailed: a few stars, a long tail of depth players
+        quality = rng.lognormal(mean=0.0, sigma=0.45, size=count)
+        order = np.argsort(-quality)
+        ranks = np.empty(count, dtype=int)
+        ranks[order] = np.arange(1, count + 1)
+        players = []
+        for index in range(count):
+            position = POSITION_SHARES[primary[index]][0]
+            eligible = [position]
+            if position in ["C", "LW", "RW"] and rng.random() < 0.35:
+                eligible.append(str(rng.choice([p for p in ["C", "LW", "RW"] if p != position])))
+            if position != "G":
+                eligible.append("Util")
+            status = ""
+            if rng.random() < 0.08:
+                status = str(rng.choice(INJURY_STATUSES))
+                if status in ["IR", "IR-LT"]:
+                    eligible.append("IR+")
+                elif status == "NA":
+                    eligible.append("NA")
+            players.append(
+                {
+                    "player_id": 10000 + index,
+                    "name": synthetic_name(index),
+                    "position_type": "G" if position == "G" else "P",
+                    "eligible_positions": eligible,
+                    "status": status,
+                    "team": self.nhl_teams[int(rng.integers(len(self.nhl_teams)))],
+                    "quality": float(quality[index]),
+                    "projected_rank": int(ranks[index]),
+                    "owner": None,
+                    "selected_position": "",
+                    "percent_owned": 0,
+                }
+            )
+        return players
+
+    def assign_rosters(self, roster_size):
+        """Snake draft that fills every team's starting slots before its bench, then set ownership from quality and whether a player is rostered"""
+        available = sorted(self.players, key=lambda player: -player["quality"])
+        starting_slots = [
+            position for position, info in self.positions_data.items() if position != "BN" and position not in INACTIVE_POSITIONS for _ in range(int(info["count"]))
+        ]
+        for draft_round in range(roster_size):
+            order = range(self.num_teams) if draft_round % 2 == 0 else reversed(range(self.num_teams))
+            slot = starting_slots[draft_round] if draft_round < len(starting_slots) else None
+            for team_index in order:
+                if not available:
+                    break
+                # Falls back to best available when the pool has run out of a position
+                index = next((index for index, player in enumerate(available) if slot in player["eligible_positions"]), 0) if slot else 0
+                player = available.pop(index)
+                player["owner"] = team_index
+        for team_index in range(self.num_teams):
+            self.set_lineup_positions(team_index)
+        noise = self.rng.normal(0, 8, len(self.players))
+        for player, jitter in zip(self.players, noise):
+            base = 55 + 35 * min(player["quality"] / 2.5, 1) if player["owner"] is not None else 20 * min(player["quality"] / 1.5, 1)
+            player["percent_owned"] = int(max(1, min(100, base + jitter)))
+
+    def set_lineup_positions(self, team_index):
+        roster = sorted([p for p in self.players if p["owner"] == team_index], key=lambda player: -player["quality"])
+        open_slots = {position: int(info["count"]) for position, info in self.positions_data.items()}
+        for player in roster:
+            slot = next((pos for pos in player["eligible_positions"] if open_slots.get(pos, 0) > 0), None)
+            slot = slot or "BN"
+            open_slots[slot] = open_slots.get(slot, 0) - 1
+            player["selected_position"] = slot
+
+    def generate_stats(self, period, rng=None):
+        """Stat rows shaped like League.player_stats, '-' for players without games in the period"""
+        rng = rng or self.rng
+        games = PERIOD_GAMES.get(period, 10)
+        rows = {}
+        for player in self.players:
+            played = int(rng.binomial(games, 0.9 if not player["status"] else 0.3))
+            row = {"player_id": player["player_id"], "name": player["name"], "position_type": player["position_type"]}
+            if player["position_type"] == "G":
+                starts = int(rng.binomial(played, 0.6)) if played else 0
+                shots = starts * rng.normal(29, 3)
+                save_rate = min(0.95, max(0.86, rng.normal(0.895 + 0.01 * player["quality"], 0.01)))
+                saves = round(shots * save_rate)
+                goals_against = round(shots - saves)
+                row.update(
+                    {
+                        "W": int(rng.binomial(starts, min(0.75, 0.4 + 0.1 * player["quality"]))),
+                        "GA": goals_against,
+                        "GAA": round(goals_against / starts, 2) if starts else "-",
+                        "SV": saves,
+                        "SV%": round(saves / shots, 3) if starts else "-",
+                        "SHO": int(rng.binomial(starts, 0.06)),
+                    }
+                )
+            else:
+                for stat, rate in SKATER_RATES.items():
+                    if not played:
+                        row[stat] = "-"
+                    elif stat == "+/-":
+                        row[stat] = int(round(rng.normal(rate * played * player["quality"], 3)))
+                    else:
+                        row[stat] = float(rng.poisson(rate * player["quality"] * played))
+            rows[player["player_id"]] = row
+        return rows
+
+    def move_player(self, player_id, team_index):
+        player = self.by_id[int(player_id)]
+        player["owner"] = team_index
+        player["selected_position"] = "BN" if team_index is not None else ""
+
+    def roster_entry(self, player):
+        keys = ["player_id", "name", "position_type", "eligible_positions", "status", "selected_position"]
+        return {key: player[key] for key in keys}
+
+    def pool_entry(self, player):
+        keys = ["player_id", "name", "position_type", "eligible_positions", "status", "percent_owned"]
+        return {key: player[key] for key in keys}
+
+    # yahoo_fantasy_api League interface
+
+    def positions(self):
+        return self.positions_data
+
+    def settings(self):
+        return {"name": "Synthetic League", "num_teams": self.num_teams, "max_weekly_adds": str(self.max_weekly_adds)}
+
+    def stat_categories(self):
+        return [{"display_name": stat, "position_type": "P"} for stat in SKATER_CATEGORIES] + [
+            {"display_name": stat, "position_type": "G"} for stat in GOALIE_CATEGORIES
+        ]
+
+    def team_key(self, team_index):
+        return f"{self.league_key}.t.{team_index + 1}"
+
+    def teams(self):
+        return {
+            self.team_key(index): {"team_key": self.team_key(index), "name": f"Team {index + 1}", "roster_adds": {"coverage_type": "week", "value": str(adds)}}
+            for index, adds in self.team_adds.items()
+        }
+
+    def taken_players(self):
+        return [self.pool_entry(player) for player in self.players if player["owner"] is not None]
+
+    def free_agents(self, position):
+        return [
+            self.pool_entry(player)
+            for player in self.players
+            if player["owner"] is None and (position in player["eligible_positions"] or position == player["position_type"])
+        ]
+
+    def player_details(self, player_ids):
+        details = []
+        for player_id in player_ids if isinstance(player_ids, list) else [player_ids]:
+            player = self.by_id.get(int(player_id))
+            if player:
+                details.append(
+                    {
+                        "player_id": str(player["player_id"]),
+                        "name": {"full": player["name"]},
+                        "editorial_team_full_name": player["team"],
+                        "eligible_positions": [{"position": position} for position in player["eligible_positions"]],
+                        "position_type": player["position_type"],
+                        "status": player["status"],
+                    }
+                )
+        return details
+
+    def percent_owned(self, player_ids):
+        return [{"player_id": int(player_id), "percent_owned": self.by_id[int(player_id)]["percent_owned"]} for player_id in player_ids]
+
+    def date_stats(self, date):
+        """One night of stat lines, drawn from the seed and the date so every run sees the same games"""
+        key = str(date)
+        if key not in self.daily_stats:
+            self.daily_stats[key] = self.generate_stats("date", np.random.default_rng([self.seed, date.toordinal()]))
+        return self.daily_stats[key]
+
+    def player_stats(self, player_ids, req_type, date=None, week=None, season=None):
+        period_rows = self.date_stats(date) if req_type == "date" else self.stats.get(req_type, self.stats["season"])
+        return [dict(period_rows[int(player_id)]) for player_id in player_ids if int(player_id) in period_rows]
+
+    def transactions(self, tran_types, count):
+        return []
+
+    def current_week(self):
+        return 1
+
+    def week_date_range(self, week):
+        today = datetime.date.today()
+        start = today - datetime.timedelta(days=today.weekday())
+        return start, start + datetime.timedelta(days=6)
+
+    def to_team(self, team_key):
+        team_index = int(team_key.split(".t.")[1]) - 1
+        if team_index not in self.teams_cache:
+            self.teams_cache[team_index] = SyntheticTeam(self, team_index)
+        return self.teams_cache[team_index]
+
+    # Data the scrapers and NHL schedule would otherwise provide
+
+    def nhl(self):
+        from nhl import NHL
+
+        starters = set()
+        for team in self.nhl_teams:
+            goalies = sorted((p for p in self.players if p["position_type"] == "G" and p["team"] == team), key=lambda p: -p["quality"])
+            if goalies and self.teams_playing[team]:
+                starters.add(goalies[0]["name"])
+        return NHL(
+            teams_playing=self.teams_playing,
+            projections={},
+            starting_goalie_scraper=SyntheticGoalieStarters(starters),
+            week_schedule=self.week_schedule(),
+            game_starts={date: f"{date}T19:00:00" for date in self.week_schedule()},
+        )
+
+    def week_schedule(self):
+        """Teams playing on each date of the week, drawn separately so the rest of the league stays the same for a seed"""
+        rng = np.random.default_rng(self.seed + 1)
+        start, end = self.week_date_range(self.current_week())
+        schedule = {}
+        for offset in range((end - start).days + 1):
+            date = start + datetime.timedelta(days=offset)
+            if date == datetime.date.today():
+                schedule[str(date)] = [team for team, playing in self.teams_playing.items() if playing]
+            else:
+                schedule[str(date)] = [team for team, playing in zip(self.nhl_teams, rng.random(len(self.nhl_teams)) < 0.5) if playing]
+        return schedule
+
+    def write_projections(self, directory):
+        """Write projection CSVs with the columns LeagueStatistics reads, ranked by generated quality"""
+        os.makedirs(directory, exist_ok=True)
+        skaters = [p for p in self.players if p["position_type"] == "P"]
+        goalies = [p for p in self.players if p["position_type"] == "G"]
+        pd.DataFrame({"Player": [p["name"] for p in skaters], "Rank": [p["projected_rank"] for p in skaters]}).to_csv(
+            os.path.join(directory, "skater_projections.csv"), index=False
+        )
+        pd.DataFrame({"player": [p["name"] for p in goalies], "Rank": [p["projected_rank"] for p in goalies]}).to_csv(
+            os.path.join(directory, "goalie_projections.csv"), index=False
+        )
+
+
+class SyntheticYahooApi:
+    """Exposes the same attributes Manager reads from YahooApi, backed by a SyntheticLeague"""
+
+    def __init__(self, league, team_index=0):
+        self.league = league
+        self.league_key = league.league_key
+        self.team_key = league.team_key(team_index)
+        self.team = league.to_team(self.team_key)
+        self.credentials = {"game_key": league.game_key, "league_id": league.league_id, "team_id": team_index + 1}
+
+    def get_roster(self):
+        return self.team.roster()
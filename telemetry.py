@@ -0,0 +1,201 @@
+import os
+import json
+import time
+import logging
+import threading
+import functools
+from datetime import datetime
+from urllib.parse import urlparse
+import requests
+from cache import CACHE_DIR
+
+REPORT_DIR = os.path.join(CACHE_DIR, "reports")
+
+# Outbound hosts grouped into the sources reported on
+SOURCE_HOSTS = {
+    "fantasysports.yahooapis.com": "yahoo",
+    "api.login.yahoo.com": "yahoo",
+    "api-web.nhle.com": "nhl",
+    "www.numberfire.com": "numberfire",
+    "www.quanthockey.com": "quanthockey",
+    "www.sportsgrid.com": "sportsgrid",
+    "www.fantasysp.com": "fantasysp",
+}
+
+logger = logging.getLogger(__name__)
+
+
+class Telemetry:
+    """Span timings and per-source counters collected over one run"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.local = threading.local()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.started = datetime.now()
+            self.started_clock = time.perf_counter()
+            self.spans = {}
+            self.counters = {}
+            self.stage_counters = {}
+            self.failed_requests = set()
+
+    def span_stack(self):
+        if not hasattr(self.local, "spans"):
+            self.local.spans = []
+        return self.local.spans
+
+    def current_stage(self):
+        """Innermost pipeline stage running on this thread, if any"""
+        return next((name for name in reversed(self.span_stack()) if name.startswith("stage:")), None)
+
+    def record_span(self, name, seconds):
+        with self.lock:
+            entry = self.spans.setdefault(name, {"count": 0, "total_seconds": 0.0, "max_seconds": 0.0})
+            entry["count"] += 1
+            entry["total_seconds"] += seconds
+            entry["max_seconds"] = max(entry["max_seconds"], seconds)
+
+    def count(self, source, **amounts):
+        stage = self.current_stage()
+        with self.lock:
+            targets = [self.counters.setdefault(source, {})]
+            if stage:
+                targets.append(self.stage_counters.setdefault(stage, {}).setdefault(source, {}))
+            for counters in targets:
+                for name, amount in amounts.items():
+                    counters[name] = counters.get(name, 0) + amount
+
+    def report(self):
+        with self.lock:
+            return {
+                "started": self.started.isoformat(),
+                "wall_seconds": time.perf_counter() - self.started_clock,
+                "spans": {name: dict(entry) for name, entry in self.spans.items()},
+                "counters": {source: dict(counters) for source, counters in self.counters.items()},
+                "stage_counters": {
+                    stage: {source: dict(counters) for source, counters in sources.items()} for stage, sources in self.stage_counters.items()
+                },
+            }
+
+
+telemetry = Telemetry()
+
+
+class span:
+    """Time a block or, used as a decorator, every call of a function"""
+
+    def __init__(self, name):
+        self.name = name
+        self.started = None
+
+    def __enter__(self):
+        telemetry.span_stack().append(self.name)
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        telemetry.record_span(self.name, time.perf_counter() - self.started)
+        telemetry.span_stack().pop()
+        return False
+
+    def __call__(self, func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(self.name):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+
+def count(source, **amounts):
+    telemetry.count(source, **amounts)
+
+
+def request_source(url):
+    return SOURCE_HOSTS.get(urlparse(url).netloc, "other")
+
+
+def install_http_hooks():
+    """Count requests, bytes, errors and retries for every requests.Session, including the one yahoo_fantasy_api uses"""
+    if getattr(requests.Session.send, "telemetry_hook", False):
+        return
+    original_send = requests.Session.send
+
+    def send(session, request, **kwargs):
+        source = request_source(request.url)
+        key = (request.method, request.url)
+        # A request that repeats one that just failed is counted as a retry
+        retried = key in telemetry.failed_requests
+        try:
+            with span(f"http:{source}"):
+                response = original_send(session, request, **kwargs)
+        except Exception:
+            telemetry.failed_requests.add(key)
+            count(source, requests=1, errors=1, retries=int(retried))
+            raise
+        if kwargs.get("stream"):
+            size = int(response.headers.get("Content-Length", 0) or 0)
+        else:
+            size = len(response.content or b"")
+        failed = response.status_code >= 400
+        if failed:
+            telemetry.failed_requests.add(key)
+        else:
+            telemetry.failed_requests.discard(key)
+        count(source, requests=1, bytes=size, errors=int(failed), retries=int(retried))
+        return response
+
+    send.telemetry_hook = True
+    requests.Session.send = send
+
+
+def load_thresholds(path):
+    """Thresholds look like {"spans": {"stage:rankings": 5.0}, "counters": {"yahoo.requests": 150}}"""
+    try:
+        with open(path, "r") as f:
+            return json.load(f)
+    except Exception as e:
+        logger.error(f"Error loading thresholds from {path}: {e}")
+        return {}
+
+
+def check_thresholds(report, thresholds):
+    """Return every span total or counter that is above its threshold"""
+    regressions = []
+    for name, limit in thresholds.get("spans", {}).items():
+        seconds = report["spans"].get(name, {}).get("total_seconds", 0)
+        if seconds > limit:
+            regressions.append({"metric": name, "value": seconds, "limit": limit})
+    for name, limit in thresholds.get("counters", {}).items():
+        source, _, counter = name.partition(".")
+        value = report["counters"].get(source, {}).get(counter, 0)
+        if value > limit:
+            regressions.append({"metric": name, "value": value, "limit": limit})
+    return regressions
+
+
+def write_report(path=None, thresholds=None):
+    """Write the run report as JSON, flagging anything over the thresholds, and return it"""
+    report = telemetry.report()
+    # The scheduler imports this module, so it is imported when the report is written
+    from yahoo.scheduler import scheduler
+
+    report["queues"] = scheduler.metrics()
+    if thresholds:
+        report["regressions"] = check_thresholds(report, thresholds)
+        for regression in report["regressions"]:
+            logger.warning(f"{regression['metric']} is {regression['value']:.2f}, over the threshold of {regression['limit']}")
+    path = path or os.path.join(REPORT_DIR, f"run_{telemetry.started.strftime('%Y-%m-%d_%H%M%S')}.json")
+    try:
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp_path = f"{path}.tmp-{os.getpid()}"
+        with open(tmp_path, "w") as f:
+            json.dump(report, f, indent=2)
+        os.replace(tmp_path, path)
+        logger.info(f"Run report written to {path}")
+    except Exception as e:
+        logger.error(f"Error writing run report to {path}: {e}")
+    return report
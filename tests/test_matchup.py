@@ -0,0 +1,55 @@
+import numpy as np
+import pytest
+from types import SimpleNamespace
+from matchup import MatchupSimulator, WeeklyMatchup, poisson_quantiles
+
+STATS = ["G", "+/-", "GA"]
+
+
+def line(means, banked):
+    return {"means": np.array(means, dtype=float), "games": np.zeros(len(STATS)), "banked": np.array(banked, dtype=float), "goalie_games": 0}
+
+
+def test_poisson_quantiles_invert_the_cdf():
+    # Poisson(1) CDF: 0.368 at 0, 0.736 at 1, 0.920 at 2
+    draws = poisson_quantiles(1.0, np.array([0.1, 0.5, 0.9]))
+    assert draws.tolist() == [0, 1, 2]
+    assert draws.sum() == 3
+    assert poisson_quantiles(0.0, np.array([0.5, 0.9])).tolist() == [0, 0]
+
+
+def test_poisson_quantiles_average_the_mean():
+    uniforms = (np.arange(100000) + 0.5) / 100000
+    assert poisson_quantiles(2.5, uniforms).mean() == pytest.approx(2.5, abs=0.01)
+
+
+def test_category_win_probabilities_for_a_known_line():
+    theirs = line([0, 0, 0], [2, 1, 2])
+    simulator = MatchupSimulator(STATS, STATS, ["GA"], theirs, simulations=20000, seed=0)
+    # Win G 3-2, tie +/- 1-1, lose GA 4-2 as fewer goals against wins
+    outcome = simulator.outcome(line([0, 0, 0], [3, 1, 4]))
+    assert outcome["categories"] == {"G": 1.0, "+/-": 0.5, "GA": 0.0}
+    assert outcome["win"] == 0.5
+    assert outcome["expected_categories"] == 1.5
+
+    # One expected goal against a banked tie: win unless no goal is scored (e ** -1), which ties
+    outcome = simulator.outcome(line([1, 0, 0], [2, 1, 2]))
+    assert outcome["categories"]["G"] == pytest.approx(1 - np.exp(-1) / 2, abs=0.01)
+
+
+def test_free_agents_keep_their_best_drop():
+    players = {name: SimpleNamespace(name=name, player_id=name, cant_cut=False) for name in ["a", "b", "c", "d", "x", "y"]}
+    players["d"].cant_cut = True
+    # Dropping c alone costs the least, but x fits best in place of a
+    gains = {(None, "a"): -0.05, (None, "b"): -0.10, (None, "c"): -0.01, ("x", "a"): 0.20, ("x", "b"): 0.05, ("x", "c"): 0.10}
+    matchup = WeeklyMatchup.__new__(WeeklyMatchup)
+    matchup.our_players = [players[name] for name in "abcd"]
+
+    def move_gain(add=None, drop=None):
+        win = gains.get((add and add.name, drop and drop.name), 0.0)
+        return {"win": win, "expected_categories": win * 10, "categories": {}}
+
+    matchup.move_gain = move_gain
+    scored = matchup.score_free_agents([players["y"], players["x"]])
+    assert [(free_agent.name, drop.name, gain["win"]) for free_agent, drop, gain in scored] == [("x", "a", 0.20), ("y", "c", 0.0)]
+    assert [drop for _, drop, _ in matchup.score_free_agents([players["x"]], open_spot=True)] == [None]
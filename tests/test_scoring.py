@@ -0,0 +1,35 @@
+from types import SimpleNamespace
+from scoring import BatchMoveScorer
+
+TIME_PERIODS = ["lastweek", "lastmonth", "season"]
+
+
+def player(name, last_week, season, projected_rank, owned):
+    rankings = {
+        "lastweek": {"weighted_score": last_week},
+        "lastmonth": {"weighted_score": last_week},
+        "season": {"weighted_score": season, "projected_rank": projected_rank},
+    }
+    return SimpleNamespace(name=name, rankings=rankings, percent_owned=owned)
+
+
+def test_move_scores_add_up_the_rules_each_player_meets():
+    slumping = player("slumping", 1.0, 3.0, 40, 10)
+    hot = player("hot", 4.0, 3.0, 150, 50)
+    scorer = BatchMoveScorer(SimpleNamespace(time_periods=TIME_PERIODS), [slumping, hot])
+    # Recent < 70% of season 3, recent < 1.5 2, season > 2.75 -2, owned < 20% 2, high pick underperforming 2
+    assert scorer.score(slumping) == 7
+    assert scorer.score(slumping, is_drop=False) == -7
+    # Recent > 120% of season -1 (add -1), recent > 2.5 -1 (add -2), season > 2.75 -2
+    assert scorer.score(hot) == -4
+    assert scorer.score(hot, is_drop=False) == 5
+
+
+def test_reasons_name_the_rule_met_in_each_block():
+    hot = player("hot", 4.0, 3.0, 150, 50)
+    scorer = BatchMoveScorer(SimpleNamespace(time_periods=TIME_PERIODS), [hot])
+    reasons = scorer.reasons(hot)
+    assert reasons[0] == "🔥 Recent performance (4.00) > 120% of season average (3.60): -1 point"
+    assert reasons[3] == "✅ Ownership acceptable"
+    assert reasons[5] == "✅ Projected rank is acceptable"
+    assert hot in scorer and player("other", 0, 0, 0, 0) not in scorer
@@ -0,0 +1,58 @@
+import pytest
+from datetime import date as Date
+from windows import DailyStatLedger, with_goalie_games
+
+LINES = {
+    "2026-10-01": {"1": {"G": 1}, "2": {"G": 4}, "30": {"GA": 2, "GAA": 2.0, "SV": 28, "SV%": 0.933}},
+    "2026-10-02": {"1": {"G": 2}, "2": {"G": "-"}},
+    "2026-10-03": {"1": {"G": 3}, "30": {"GA": 4, "GAA": 4.0, "SV": 26, "SV%": 0.867}},
+}
+
+
+@pytest.fixture
+def ledger(tmp_path):
+    ledger = DailyStatLedger(str(tmp_path / "daily_lines.json"))
+    ledger.merge({"lines": LINES})
+    return ledger
+
+
+def test_window_sums_the_last_days(ledger):
+    totals, games = ledger.window(["1", "2"], ["G"], 3)
+    assert totals[:, 0].tolist() == [6, 4]
+    assert games[:, 0].tolist() == [3, 1]
+
+    totals, games = ledger.window(["1", "2"], ["G"], 2)
+    assert totals[:, 0].tolist() == [5, 0]
+    assert games[:, 0].tolist() == [2, 0]
+
+
+def test_window_ends_before_the_given_date(ledger):
+    totals, _ = ledger.window(["1"], ["G"], 2, end=Date(2026, 10, 3))
+    assert totals[0, 0] == 3
+
+
+def test_ewma_halves_the_weight_every_halflife(ledger):
+    # Weights 0.25, 0.5 and 1 for goals of 1, 2 and 3
+    averages = ledger.ewma(["1", "2"], ["G"], halflife=1)
+    assert averages[0, 0] == pytest.approx((0.25 * 1 + 0.5 * 2 + 1 * 3) / 1.75)
+    assert averages[1, 0] == pytest.approx(4)
+
+
+def test_goalie_lines_gain_games_and_minutes():
+    assert with_goalie_games({"GA": 3, "GAA": 4.5, "SV": 20}) == {"GA": 3, "GAA": 4.5, "SV": 20, "GP": 1, "TOI": 40.0}
+    assert with_goalie_games({"GA": 0, "GAA": 0.0, "SV": 30})["TOI"] == 60.0
+    assert with_goalie_games({"G": 1}) == {"G": 1}
+
+
+def test_window_lines_rebuild_ratios_from_totals(ledger):
+    lines = ledger.window_lines(["30", "1"], ["GA", "GAA", "SV%", "GP"], 3)
+    assert lines["30"]["GA"] == 6
+    assert lines["30"]["GP"] == 2
+    assert lines["30"]["GAA"] == pytest.approx(60 * 6 / 120)
+    assert lines["30"]["SV%"] == pytest.approx(54 / 60)
+    assert lines["1"]["GAA"] == "-"
+
+
+def test_prune_drops_dates_outside_the_season_and_window(ledger):
+    ledger.prune(today=Date(2026, 10, 30))
+    assert sorted(ledger.lines) == ["2026-10-02", "2026-10-03"]
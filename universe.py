@@ -0,0 +1,131 @@
+import os
+import json
+import hashlib
+import logging
+from datetime import datetime, timedelta
+from cache import CACHE_DIR, file_lock
+from stat_lines import StatLineStore
+from windows import DailyStatLedger
+from util.identity import PlayerCrosswalk
+import telemetry
+
+# Relative to the working directory like the other caches; the orchestrator points it at one directory for every team
+UNIVERSE_DIR = os.path.join(CACHE_DIR, "universe")
+# Eligibility and NHL team change with trades and roster moves, so details are refetched after this long
+DETAILS_MAX_AGE = timedelta(hours=12)
+
+logger = logging.getLogger(__name__)
+
+universes = {}
+
+
+def game_key_of(league_key):
+    return str(league_key).split(".")[0]
+
+
+def category_signature(league_categories):
+    """Stat rows hold the league's own categories, so leagues only share stat lines when their categories match"""
+    names = sorted(f"{category['position_type']}:{category['display_name']}" for category in league_categories)
+    return hashlib.sha1(",".join(names).encode()).hexdigest()[:10]
+
+
+def for_game(game_key, directory=None):
+    """The universe for a game, shared by every league and team in this process"""
+    path = os.path.join(directory or UNIVERSE_DIR, str(game_key))
+    if path not in universes:
+        universes[path] = PlayerUniverse(game_key, path)
+    return universes[path]
+
+
+class PlayerUniverse:
+    """Player details, eligibility, stat lines and name crosswalk for one game_key, which are the same whichever league asks.
+
+    Ownership and taken or free agent status are league specific and stay with the league.
+    """
+
+    def __init__(self, game_key, path):
+        self.logger = logging.getLogger(__name__)
+        self.game_key = str(game_key)
+        self.path = path
+        self.details_path = os.path.join(path, "details.json")
+        self.details = self.read_details()
+        self.dirty = False
+        self.stat_line_stores = {}
+        self.ledgers = {}
+        # Yahoo player ids are per game, so each game keeps its own name crosswalk
+        self.crosswalk = PlayerCrosswalk(os.path.join(path, "identity.json"))
+
+    def read_details(self):
+        if not os.path.exists(self.details_path):
+            return {}
+        try:
+            with open(self.details_path, "r") as f:
+                return json.load(f)
+        except Exception as e:
+            self.logger.error(f"Error loading player details from {self.details_path}: {e}")
+            return {}
+
+    def stat_lines(self, league_categories):
+        """Stat line store shared by every league on this game with the same categories"""
+        signature = category_signature(league_categories)
+        if signature not in self.stat_line_stores:
+            self.stat_line_stores[signature] = StatLineStore(os.path.join(self.path, f"stat_lines_{signature}.json"), shared=True)
+        return self.stat_line_stores[signature]
+
+    def daily_ledger(self, league_categories):
+        """Per-date stat lines shared the same way as the period stat lines"""
+        signature = category_signature(league_categories)
+        if signature not in self.ledgers:
+            self.ledgers[signature] = DailyStatLedger(os.path.join(self.path, f"daily_lines_{signature}.json"), shared=True)
+        return self.ledgers[signature]
+
+    def stale_detail_ids(self, player_ids, now):
+        stale = []
+        for player_id in player_ids:
+            entry = self.details.get(str(player_id))
+            if entry is None or now - datetime.fromisoformat(entry["fetched_at"]) > DETAILS_MAX_AGE:
+                stale.append(player_id)
+        return stale
+
+    def player_details(self, league, player_ids, now=None):
+        """Return details for every player, fetching from the league API only those missing or out of date"""
+        now = now or datetime.now()
+        stale_ids = self.stale_detail_ids(player_ids, now)
+        if stale_ids:
+            # Another process may have fetched them since this universe was loaded
+            self.merge(self.read_details())
+            stale_ids = self.stale_detail_ids(player_ids, now)
+        telemetry.count("universe", cache_hits=len(player_ids) - len(stale_ids), cache_misses=len(stale_ids))
+        if stale_ids:
+            fetched_at = now.isoformat()
+            for detail in league.player_details(stale_ids):
+                self.details[str(detail["player_id"])] = {"fetched_at": fetched_at, "details": detail}
+            self.dirty = True
+            self.save()
+        return [self.details[str(player_id)]["details"] for player_id in player_ids if str(player_id) in self.details]
+
+    def eligible_positions(self, player_id):
+        entry = self.details.get(str(player_id))
+        if entry is None:
+            return None
+        return [position["position"] for position in entry["details"].get("eligible_positions", [])]
+
+    def merge(self, details):
+        for player_id, entry in details.items():
+            held = self.details.get(player_id)
+            if held is None or entry["fetched_at"] > held["fetched_at"]:
+                self.details[player_id] = entry
+
+    def save(self):
+        if not self.dirty:
+            return
+        try:
+            with file_lock(self.details_path):
+                self.merge(self.read_details())
+                tmp_path = f"{self.details_path}.tmp-{os.getpid()}"
+                with open(tmp_path, "w") as f:
+                    json.dump(self.details, f)
+                os.replace(tmp_path, self.details_path)
+            self.dirty = False
+        except Exception as e:
+            self.logger.error(f"Error saving player details to {self.details_path}: {e}")
@@ -31,6 +31,7 @@ class Config:
         self.credentials_path = os.path.join(
             directory_path, "tokens", "credentials.json"
         )
+        self.teams_path = os.path.join(directory_path, "tokens", "teams.json")
         self._load_credentials()
 
     def _load_credentials(self):
@@ -77,3 +78,38 @@ class Config:
         if self.refresh_token:
             res["refresh_token"] = self.refresh_token
         return res
+
+    def getTeamCredentials(self):
+        """
+        Credentials for every team listed in tokens/teams.json, e.g.
+        [{"name": "keepers", "game_key": "453", "league_id": "1234",
+          "team_id": "5", "token_file": "tokens/keepers.json"}]
+
+        Missing fields fall back to the default credentials, and each team
+        gets its own OAuth token file.
+        """
+        if not os.path.exists(self.teams_path):
+            self.logger.info(
+                f"No teams file at {self.teams_path}, using the default team"
+            )
+            return [self.getCredentials()]
+
+        with open(self.teams_path, "r") as file:
+            teams = json.load(file)
+
+        res = []
+        for team in teams:
+            credentials = {**self.getCredentials(), **team}
+            token_file = team.get(
+                "token_file",
+                os.path.join(
+                    "tokens",
+                    f"secrets_{credentials['league_id']}_"
+                    f"{credentials['team_id']}.json",
+                ),
+            )
+            credentials["token_file"] = os.path.join(
+                self.directory_path, token_file
+            )
+            res.append(credentials)
+        return res
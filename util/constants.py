@@ -6,6 +6,7 @@ REQUEST_AUTH_URL = "https://api.login.yahoo.com/oauth2/request_auth"
 REQUEST_TOKEN_URL = "https://api.login.yahoo.com/oauth2/get_token"
 BASE_YAHOO_API_URL = "https://fantasysports.yahooapis.com/fantasy/v2/"
 NEXT_GAME_URL = "https://api-web.nhle.com/v1/club-schedule/%s/week/now"
+SCHEDULE_URL = "https://api-web.nhle.com/v1/schedule/now"
 DIRECTORY_PATH = os.path.dirname(os.path.realpath(__file__))
 TOKEN_PATH = DIRECTORY_PATH + "/tokens/secrets.json"
 
@@ -47,3 +48,5 @@ NHL_TEAM_ID = {
 LOCATION_TAKEN = "taken"
 LOCATION_FREE_AGENT = "free_agents"
 LOCATION_ROSTER = "roster"
+
+TIME_PERIODS = ["lastweek", "lastmonth", "season"]
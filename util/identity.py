@@ -0,0 +1,154 @@
+import os
+import re
+import json
+import difflib
+import logging
+import unicodedata
+from cache import CACHE_DIR, file_lock
+
+IDENTITY_FILE = os.path.join(CACHE_DIR, "identity.json")
+# Names closer than this to exactly one Yahoo name are taken as that player
+FUZZY_CUTOFF = 0.88
+NAME_SUFFIXES = {"jr", "sr", "ii", "iii", "iv"}
+
+
+def canonical_name(name):
+    """Lowercase ASCII name without punctuation or suffixes, so 'Pierre-Luc Dubé Jr.' and 'pierre luc dube' agree"""
+    name = unicodedata.normalize("NFKD", str(name).replace("\\'", "'")).encode("ascii", "ignore").decode()
+    name = re.sub(r"[^a-z0-9 ]+", " ", name.lower().replace("'", "").replace("’", ""))
+    tokens = [token for token in name.split() if token not in NAME_SUFFIXES]
+    return " ".join(tokens)
+
+
+def quanthockey_name(name):
+    """quanthockey drops non-ASCII characters instead of folding them, so 'Dubé' arrives as 'Dub'"""
+    return canonical_name("".join(c for c in str(name).replace("\\'", "'") if c.isascii()))
+
+
+def sportsgrid_name(name):
+    """sportsgrid lists starters as 'F.Lastname'; full names are reduced to the same form"""
+    name = str(name).strip()
+    abbreviated = re.match(r"^(\w)\.\s*(.+)$", name)
+    if abbreviated:
+        first, last = abbreviated.groups()
+    else:
+        first, _, last = name.partition(" ")
+    first = canonical_name(first)
+    return f"{first[:1]}.{canonical_name(last).replace(' ', '')}" if first and last else ""
+
+
+# The key each source would produce for a Yahoo full name
+SOURCE_FORMS = {
+    "yahoo": canonical_name,
+    "projections": canonical_name,
+    "quanthockey": quanthockey_name,
+    "sportsgrid": sportsgrid_name,
+}
+
+
+class PlayerCrosswalk:
+    """Maps the name form of every data source to Yahoo player ids.
+
+    Yahoo names are registered once and each source's key is precomputed, so a join is a dict lookup.
+    Names no key matches fall back to difflib against the same source's keys; the result is kept and
+    fuzzy matches are saved with the names so they are only searched for once.
+    """
+
+    def __init__(self, path=IDENTITY_FILE):
+        self.logger = logging.getLogger(__name__)
+        self.path = path
+        self.names = {}
+        self.matches = {source: {} for source in SOURCE_FORMS}
+        self.index = {source: {} for source in SOURCE_FORMS}
+        self.misses = {source: set() for source in SOURCE_FORMS}
+        self.keys = {}
+        self.dirty = False
+        self.merge(self.read())
+        self.dirty = False
+
+    def read(self):
+        if not os.path.exists(self.path):
+            return {}
+        try:
+            with open(self.path, "r") as f:
+                return json.load(f)
+        except Exception as e:
+            self.logger.error(f"Error loading player identities from {self.path}: {e}")
+            return {}
+
+    def merge(self, data):
+        for player_id, name in data.get("names", {}).items():
+            self.register(player_id, name)
+        for source, matches in data.get("matches", {}).items():
+            if source in self.matches:
+                for key, player_id in matches.items():
+                    self.matches[source].setdefault(key, str(player_id))
+
+    def register(self, player_id, name):
+        player_id = str(player_id)
+        if not name or self.names.get(player_id) == name:
+            return
+        self.names[player_id] = name
+        for source, form in SOURCE_FORMS.items():
+            ids = self.index[source].setdefault(form(name), [])
+            if player_id not in ids:
+                ids.append(player_id)
+        # A name that missed before may match the new player
+        for misses in self.misses.values():
+            misses.clear()
+        self.keys = {}
+        self.dirty = True
+
+    def register_players(self, players):
+        for player in players:
+            self.register(player.player_id, player.name)
+
+    def lookup(self, source, name):
+        """Yahoo player ids (as ints) a source's name refers to, or an empty list"""
+        key = SOURCE_FORMS[source](name)
+        ids = self.index[source].get(key)
+        if ids is None and source != "yahoo":
+            # Sources that spell the name out in full often match the folded Yahoo form
+            ids = self.index["yahoo"].get(canonical_name(name)) if source != "sportsgrid" else None
+        if ids is None:
+            ids = self.fuzzy_match(source, key)
+        return [int(player_id) for player_id in ids]
+
+    def fuzzy_match(self, source, key):
+        if key in self.matches[source]:
+            return [self.matches[source][key]]
+        if not key or key in self.misses[source]:
+            return []
+        if source not in self.keys:
+            self.keys[source] = list(self.index[source])
+        close = difflib.get_close_matches(key, self.keys[source], n=1, cutoff=FUZZY_CUTOFF)
+        ids = self.index[source][close[0]] if close else []
+        if len(ids) != 1:
+            self.misses[source].add(key)
+            return []
+        self.logger.debug(f"Matched {source} name '{key}' to '{close[0]}'")
+        self.matches[source][key] = ids[0]
+        self.dirty = True
+        return ids
+
+    def key_by_id(self, rows, source):
+        """Re-key (source name, value) pairs by Yahoo player id; the first row wins when several names map to one player"""
+        by_id = {}
+        for name, value in rows:
+            for player_id in self.lookup(source, name):
+                by_id.setdefault(player_id, value)
+        return by_id
+
+    def save(self):
+        if not self.dirty:
+            return
+        try:
+            with file_lock(self.path):
+                self.merge(self.read())
+                tmp_path = f"{self.path}.tmp-{os.getpid()}"
+                with open(tmp_path, "w") as f:
+                    json.dump({"names": self.names, "matches": self.matches}, f)
+                os.replace(tmp_path, self.path)
+            self.dirty = False
+        except Exception as e:
+            self.logger.error(f"Error saving player identities to {self.path}: {e}")
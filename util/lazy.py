@@ -0,0 +1,30 @@
+import importlib
+
+
+class LazyModule:
+    """Stand-in for a module that is only imported the first time one of its attributes is used"""
+
+    def __init__(self, name):
+        self._name = name
+        self._module = None
+
+    def _load(self):
+        if self._module is None:
+            self._module = importlib.import_module(self._name)
+        return self._module
+
+    def __getattr__(self, attr):
+        return getattr(self._load(), attr)
+
+    def __repr__(self):
+        state = "loaded" if self._module is not None else "not loaded"
+        return f"<lazy module '{self._name}' ({state})>"
+
+
+def lazy_import(name):
+    return LazyModule(name)
+
+
+def tqdm(*args, **kwargs):
+    """Defers importing tqdm until the first progress bar is created"""
+    return importlib.import_module("tqdm").tqdm(*args, **kwargs)
@@ -1,6 +1,14 @@
+import re
 import requests
-from lxml import html
 import logging
+from util.lazy import lazy_import
+from telemetry import span
+from util.identity import sportsgrid_name
+
+html = lazy_import("lxml.html")
+
+# "F.Lastname" as sportsgrid prints starters; last names may run to several words, hyphens or apostrophes
+STARTER_NAME = re.compile(r"\b([^\W\d_])\.\s?([^\W\d_][\w'’\-]*(?: [A-Z][\w'’\-]*)*)")
 
 
 class FantasyHockeyProjectionScraper:
@@ -24,6 +32,7 @@ class FantasyHockeyProjectionScraper:
         }
         self.logger = logging.getLogger(__name__)  # G det the root logger set in main.py
 
+    @span("scrape.FantasyHockeyProjectionScraper")
     def fetch_data(self):
         """
         Fetches data from the URL and parses it into an HTML tree.
@@ -131,6 +140,7 @@ class FantasyHockeyGoalieScraper:
         }
         self.logger = logging.getLogger(__name__)  # G det the root logger set in main.py
 
+    @span("scrape.FantasyHockeyGoalieScraper")
     def fetch_data(self):
         """
         Fetches data from the URL and parses it into an HTML tree.
@@ -211,7 +221,23 @@ class StartingGoalieScraper:
         self.logger = logging.getLogger(__name__)  # Add logger
         self.tree = None
         self.response = None
-
+        self.content = None
+        self.starters = None
+
+    # Only the page content is pickled, so a fetched page can be handed to worker processes
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state["tree"] = None
+        state["response"] = None
+        state["starters"] = None
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        if self.content is not None:
+            self.tree = html.fromstring(self.content)
+
+    @span("scrape.StartingGoalieScraper")
     def fetch_data(self):
         """
         Fetches data from the URL and parses it into an HTML tree.
@@ -219,37 +245,50 @@ class StartingGoalieScraper:
         """
         self.response = requests.get(self.url)
         if self.response.status_code == 200:
-            self.tree = html.fromstring(self.response.content)
+            self.content = self.response.content
+            self.tree = html.fromstring(self.content)
         else:
             print(f"failed to retrieve data: Status code {self.response.content}")
             self.logger.info(f"Failed to retrieve data: Status code {self.response.status_code}")
+            self.content = None
             self.tree = None
-
-    def get_starting_goalies(self, goalie_names):
+        self.starters = None
+
+    def starter_names(self):
+        """Every 'F.Lastname' on the page, in crosswalk form, read once per fetch"""
+        if self.starters is None:
+            self.starters = set()
+            for text in self.tree.itertext():
+                for initial, last_name in STARTER_NAME.findall(text):
+                    # Capitalized words after the name may be a team, so every leading run of words is kept
+                    words = last_name.split(" ")
+                    for count in range(1, len(words) + 1):
+                        self.starters.add(sportsgrid_name(f"{initial}.{' '.join(words[:count])}"))
+        return self.starters
+
+    def get_starting_goalies(self, goalie_names, refresh=True):
         """
         Checks if given goalies are listed as starting.
 
         Args:
             goalie_names (list): List of goalie names to check
+            refresh (bool): Fetch the page again even if it was already fetched
 
         Returns:
             dict: Dictionary with goalie names as keys and boolean values indicating if they're starting
         """
-        self.fetch_data()  # Ensure we have fresh data
+        if refresh or self.tree is None:
+            self.fetch_data()  # Ensure we have fresh data
         results = {}
         if self.tree is None:
             self.logger.info("No HTML tree available. Call fetch_data() first.")
             return results
 
+        starters = self.starter_names()
         for full_name in goalie_names:
             try:
-                # Format name to "S. Lastname"
-                first_name, last_name = full_name.split(" ", 1)
-                formatted_name = f"{first_name[0]}.{last_name}"
-
-                # Try different XPath approaches
-                found = self.tree.xpath(f"//*[contains(text(), '{formatted_name}')]")  # Partial match
-                results[full_name] = len(found) > 0
+                # Both sides are reduced to "f.lastname", so accents, punctuation and suffixes don't matter
+                results[full_name] = sportsgrid_name(full_name) in starters
             except Exception as e:
                 self.logger.error(f"Error searching for {full_name}: {e}")
                 results[full_name] = False
@@ -267,6 +306,7 @@ class PlayerComparisonScraper:
         self.player_1 = None
         self.player_2 = None
 
+    @span("scrape.PlayerComparisonScraper")
     def fetch_data(self):
         """
         Fetches data from the URL and parses it into an HTML tree.
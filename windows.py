@@ -0,0 +1,202 @@
+import os
+import json
+import logging
+from datetime import date as Date, timedelta
+from cache import file_lock
+from aggregates import numeric
+from history import SEASON_START_MONTH, season_of
+from util.lazy import lazy_import
+import telemetry
+
+np = lazy_import("numpy")
+
+# Completed days fetched behind today; the longest window that can be asked for
+LEDGER_DAYS = 28
+# Ratios are rebuilt from the totals of their components over a window, or averaged over its games when the
+# lines do not hold the components
+RATE_STATS = ["GAA", "SV%"]
+RATE_COMPONENTS = {"GAA": ["GA", "TOI"], "SV%": ["SV", "GA"]}
+GOALIE_STATS = ["W", "GA", "GAA", "SV", "SV%", "SHO"]
+# Yahoo's date stats leave these out for goalies, so they are added to each goalie's line; TOI is in minutes
+GOALIE_GAME_STATS = ["GP", "TOI"]
+# Windows TeamManager ranks on alongside Yahoo's own periods, in days
+STAT_WINDOWS = {"lasttwoweeks": 14}
+
+
+def with_goalie_games(line):
+    """A goalie's date line with GP and TOI added, TOI worked back from GA and GAA (a full game when either is 0)"""
+    if "GP" in line or not any(stat in line for stat in GOALIE_STATS):
+        return line
+    goals_against = numeric(line.get("GA"))
+    if goals_against is None and numeric(line.get("SV")) is None and numeric(line.get("W")) is None:
+        # Did not play that day
+        return line
+    goals_against_average = numeric(line.get("GAA"))
+    minutes = 60 * goals_against / goals_against_average if goals_against and goals_against_average else 60.0
+    return {**line, "GP": 1, "TOI": round(minutes, 2)}
+
+
+class DailyStatLedger:
+    """Per-date stat lines for every player, with prefix sums over the dates held.
+
+    Each completed date is fetched once with req_type 'date' and kept, so any window of days (or an
+    exponentially weighted average) is two array lookups per player and costs no Yahoo request.
+    """
+
+    def __init__(self, path, shared=False):
+        self.logger = logging.getLogger(__name__)
+        self.path = path
+        self.shared = shared
+        self.lines = {}
+        self.fetched = {}
+        self.dirty = False
+        self.arrays = None
+        self.merge(self.read())
+        self.dirty = False
+
+    def read(self):
+        if not os.path.exists(self.path):
+            return {}
+        try:
+            with open(self.path, "r") as f:
+                return json.load(f)
+        except Exception as e:
+            self.logger.error(f"Error loading daily stat lines from {self.path}: {e}")
+            return {}
+
+    def merge(self, data):
+        for day, lines in data.get("lines", {}).items():
+            # Lines saved before goalies carried GP and TOI gain them here
+            self.lines.setdefault(day, {}).update({player_id: with_goalie_games(line) for player_id, line in lines.items()})
+        for day, player_ids in data.get("fetched", {}).items():
+            self.fetched.setdefault(day, set()).update(player_ids)
+        self.arrays = None
+
+    def save(self):
+        if not self.dirty:
+            return
+        try:
+            with file_lock(self.path):
+                if self.shared:
+                    self.merge(self.read())
+                self.prune()
+                tmp_path = f"{self.path}.tmp-{os.getpid()}"
+                with open(tmp_path, "w") as f:
+                    json.dump({"lines": self.lines, "fetched": {day: sorted(ids) for day, ids in self.fetched.items()}}, f)
+                os.replace(tmp_path, self.path)
+            self.dirty = False
+        except Exception as e:
+            self.logger.error(f"Error saving daily stat lines to {self.path}: {e}")
+
+    def prune(self, today=None):
+        """Drop dates from before the season started or older than the longest window, so the file stops growing"""
+        today = today or Date.today()
+        oldest = max(Date(int(season_of(today)), SEASON_START_MONTH, 1), today - timedelta(days=LEDGER_DAYS))
+        for day in [day for day in set(self.lines) | set(self.fetched) if Date.fromisoformat(day) < oldest]:
+            self.lines.pop(day, None)
+            self.fetched.pop(day, None)
+            self.arrays = None
+
+    def refresh(self, league, player_ids, today=None, days=LEDGER_DAYS):
+        """Fetch the completed dates in the last `days` that are missing for any of the players"""
+        today = today or Date.today()
+        if self.shared:
+            self.merge(self.read())
+        wanted = {str(player_id) for player_id in player_ids}
+        for offset in range(days, 0, -1):
+            day = str(today - timedelta(days=offset))
+            missing = sorted(wanted - self.fetched.get(day, set()))
+            telemetry.count("daily_lines", cache_hits=len(wanted) - len(missing), cache_misses=len(missing))
+            if not missing:
+                continue
+            self.logger.info(f"Fetching {len(missing)} stat lines for {day}")
+            try:
+                rows = league.player_stats([int(player_id) for player_id in missing], req_type="date", date=Date.fromisoformat(day))
+            except Exception as e:
+                self.logger.error(f"Error fetching stat lines for {day}: {e}")
+                continue
+            day_lines = self.lines.setdefault(day, {})
+            for row in rows:
+                line = {k: v for k, v in row.items() if k not in ["player_id", "name", "position_type"]}
+                day_lines[str(row["player_id"])] = with_goalie_games(line) if row.get("position_type") == "G" else line
+            self.fetched.setdefault(day, set()).update(missing)
+            self.dirty = True
+            self.arrays = None
+        self.save()
+
+    def build_arrays(self, player_ids, stats):
+        """Prefix sums of values and games over a contiguous range of dates, shaped (players, dates + 1, stats)"""
+        key = (tuple(player_ids), tuple(stats))
+        if self.arrays is not None and self.arrays["key"] == key:
+            return self.arrays
+        days = sorted(self.lines)
+        first = Date.fromisoformat(days[0]) if days else Date.today()
+        last = Date.fromisoformat(days[-1]) if days else first - timedelta(days=1)
+        count = (last - first).days + 1
+        values = np.full((len(player_ids), count, len(stats)), np.nan)
+        rows = {str(player_id): index for index, player_id in enumerate(player_ids)}
+        columns = {stat: index for index, stat in enumerate(stats)}
+        for day, lines in self.lines.items():
+            day_index = (Date.fromisoformat(day) - first).days
+            for player_id, line in lines.items():
+                row = rows.get(player_id)
+                if row is None:
+                    continue
+                for stat, value in line.items():
+                    column = columns.get(stat)
+                    value = numeric(value)
+                    if column is not None and value is not None:
+                        values[row, day_index, column] = value
+        played = ~np.isnan(values)
+        zeros = np.zeros((len(player_ids), 1, len(stats)))
+        self.arrays = {
+            "key": key,
+            "first": first,
+            "values": values,
+            "sums": np.concatenate([zeros, np.cumsum(np.where(played, values, 0.0), axis=1)], axis=1),
+            "games": np.concatenate([zeros, np.cumsum(played, axis=1)], axis=1),
+        }
+        return self.arrays
+
+    def window(self, player_ids, stats, days, end=None):
+        """Totals and games over the `days` dates ending the day before `end` (the last date held by default)"""
+        arrays = self.build_arrays(player_ids, stats)
+        held = arrays["values"].shape[1]
+        stop = held if end is None else max(0, min(held, (end - arrays["first"]).days))
+        start = max(0, stop - days)
+        return arrays["sums"][:, stop] - arrays["sums"][:, start], arrays["games"][:, stop] - arrays["games"][:, start]
+
+    def ewma(self, player_ids, stats, halflife):
+        """Per game average with each date weighted by 0.5 ** (days ago / halflife)"""
+        arrays = self.build_arrays(player_ids, stats)
+        values = arrays["values"]
+        weights = 0.5 ** (np.arange(values.shape[1])[::-1] / halflife)
+        played = ~np.isnan(values)
+        weighted = np.einsum("d,pds->ps", weights, np.where(played, values, 0.0))
+        weight = np.einsum("d,pds->ps", weights, played.astype(float))
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return np.where(weight > 0, weighted / weight, np.nan)
+
+    def window_lines(self, player_ids, stats, days, end=None):
+        """{player_id: {stat: value}} over a window: totals for counting stats, RATE_STATS from their components' totals"""
+        columns = list(dict.fromkeys(list(stats) + [component for stat in RATE_STATS if stat in stats for component in RATE_COMPONENTS[stat]]))
+        index = {stat: column for column, stat in enumerate(columns)}
+        totals, games = self.window(player_ids, columns, days, end)
+        values = np.where(games > 0, totals, np.nan)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            for stat in [stat for stat in RATE_STATS if stat in stats]:
+                column = index[stat]
+                first, second = (index[component] for component in RATE_COMPONENTS[stat])
+                held = (games[:, first] > 0) & (games[:, second] > 0)
+                if stat == "GAA":
+                    rebuilt = np.where(held, 60 * totals[:, first] / totals[:, second], np.nan)
+                else:
+                    rebuilt = np.where(held, totals[:, first] / (totals[:, first] + totals[:, second]), np.nan)
+                # Lines without the components fall back to the average of the daily values
+                average = totals[:, column] / games[:, column]
+                values[:, column] = np.where(games[:, column] > 0, np.where(np.isfinite(rebuilt), rebuilt, average), np.nan)
+        # Stats without a game in the window are '-', as Yahoo reports them
+        return {
+            player_id: {stat: ("-" if np.isnan(values[row, index[stat]]) else float(values[row, index[stat]])) for stat in stats}
+            for row, player_id in enumerate(player_ids)
+        }
@@ -10,19 +10,27 @@ import json
 import os
 from yahoo_oauth import OAuth2
 import yahoo_fantasy_api as yfa
+from yahoo.scheduler import scheduler
+from yahoo.xml_stream import iter_players
+
+# Goals against and goals against average count against a player's points
+INVERSE_STAT_IDS = ["22", "23"]
+# Most players Yahoo returns for one players collection request
+PLAYERS_PER_REQUEST = 25
 
 
 class YahooApi:
-    def __init__(self, directory_path):
+    def __init__(self, directory_path, credentials=None):
         self.logger = logging.getLogger(__name__)  # Get the root logger set in main.py
         self.config = Config(directory_path)
         self.directory_path = directory_path
         self.logger.info("Initializing YahooApi")
         self.logger.info("Getting credentials")
-        self.credentials = self.config.getCredentials()
+        # Credentials for one of several teams (see Config.getTeamCredentials) replace the default team
+        self.credentials = dict(credentials) if credentials else self.config.getCredentials()
 
         self.logger.info("Checking token")
-        self.oauth_file = os.path.join(directory_path, "tokens", "secrets.json")
+        self.oauth_file = self.credentials.pop("token_file", None) or os.path.join(directory_path, "tokens", "secrets.json")
         if not os.path.exists(self.oauth_file):
             logging.info("Token file does not exist, generating new token")
             self.oauth_json_gen()
@@ -38,8 +46,9 @@ class YahooApi:
             self.logger.info(f"isToken Valid: {self.sc.token_is_valid()}")
             self.game = yfa.Game(self.sc, "nhl")
 
-            # Create league object using credentials
-            self.league = self.game.to_league(self.league_key)
+            # Create league object using credentials, with its requests queued by priority alongside every other team and stage
+            scheduler.install()
+            self.league = scheduler.proxy(self.game.to_league(self.league_key))
             self.league_positions = self.league.positions()
             self.league_settings = self.league.settings()
             self.max_moves = self.league_settings["max_weekly_adds"]
@@ -60,7 +69,7 @@ class YahooApi:
 
     def oauth_json_gen(self):
         try:
-            credentials = self.config.getCredentials()
+            credentials = dict(self.credentials)
             credentials["token_type"] = "bearer"
             credentials["token_time"] = 1731023668
             credentials["guid"] = None
@@ -89,6 +98,14 @@ class YahooApi:
         """
         Queries the yahoo fantasy sports api
         """
+        payload = xmltodict.parse(self.fetchYahooApi(url, dataType))
+        self.logger.debug("Successfully parsed %s data" % dataType)
+        return payload
+
+    def fetchYahooApi(self, url, dataType):
+        """
+        Returns the raw XML of a yahoo fantasy sports api response
+        """
 
         header = "Bearer " + self.credentials["access_token"]
         self.logger.debug("URL: %s" % url)
@@ -97,15 +114,13 @@ class YahooApi:
         if response.status_code == 200:
             self.logger.debug("Successfully got %s data" % dataType)
             self.logger.debug(response.content)
-            payload = xmltodict.parse(response.content)
-            self.logger.debug("Successfully parsed %s data" % dataType)
-            return payload
+            return response.content
         elif response.status_code == 401:
             self.logger.info("Token Expired....renewing")
             self.sc.refresh_access_token()
             self.credentials["access_token"] = self.sc.access_token
             self.credentials["refresh_token"] = self.sc.refresh_token
-            return self.queryYahooApi(url, dataType)
+            return self.fetchYahooApi(url, dataType)
         else:
             self.logger.error("Could not get %s information" % dataType)
             self.logger.error("---------DEBUG--------")
@@ -130,51 +145,47 @@ class YahooApi:
         """
         Get player data from Yahoo and parses the response
         """
+        return self.getPlayersData([playerKey])[playerKey]
 
-        rosterUrl = (
-            BASE_YAHOO_API_URL
-            + "league/"
-            + str(self.credentials["game_key"])
-            + ".l."
-            + str(self.credentials["league_id"])
-            + "/players;player_keys="
-            + str(playerKey)
-            + "/stats;type=biweekly"
-        )
-        playerData = self.queryYahooApi(rosterUrl, "player")
+    def getPlayersData(self, playerKeys):
+        """
+        Get player data for many players, up to 25 per request, keyed by player key.
+        The response is decoded one player at a time instead of being parsed whole.
+        """
+        players = {}
+        for start in range(0, len(playerKeys), PLAYERS_PER_REQUEST):
+            keys = ",".join(str(key) for key in playerKeys[start : start + PLAYERS_PER_REQUEST])
+            playersUrl = (
+                BASE_YAHOO_API_URL
+                + "league/"
+                + str(self.credentials["game_key"])
+                + ".l."
+                + str(self.credentials["league_id"])
+                + "/players;player_keys="
+                + keys
+                + "/stats;type=biweekly"
+            )
+            for record in iter_players(self.fetchYahooApi(playersUrl, "player")):
+                players[record.player_key] = self.player_from_record(record)
+        return players
+
+    def player_from_record(self, record):
         player = {}
-        player["name"] = playerData["fantasy_content"]["league"]["players"]["player"]["name"]["full"]
-        player["team"] = playerData["fantasy_content"]["league"]["players"]["player"]["editorial_team_full_name"]
-        player["available_positions"] = playerData["fantasy_content"]["league"]["players"]["player"]["eligible_positions"]["position"]
-        if "player_notes_last_timestamp" in playerData["fantasy_content"]["league"]["players"]["player"]:
-            player["new_notes_timestamp"] = int(playerData["fantasy_content"]["league"]["players"]["player"]["player_notes_last_timestamp"])
-        else:
-            player["new_notes_timestamp"] = "-1"
-        player["isGoalie"] = player["available_positions"] == "G" or "G" in player["available_positions"]
-        if player["isGoalie"]:
-            logging.debug(f"Player: {playerData["fantasy_content"]["league"]["players"]["player"]}")
+        player["name"] = record.name
+        player["team"] = record.team
+        player["available_positions"] = record.positions
+        player["new_notes_timestamp"] = record.notes_timestamp if record.notes_timestamp is not None else "-1"
+        player["isGoalie"] = "G" in record.positions
+        player["status"] = record.status
         points = 0
-        player["status"] = playerData["fantasy_content"]["league"]["players"]["player"].get("status", "")
-        for stat in playerData["fantasy_content"]["league"]["players"]["player"]["player_stats"]["stats"]["stat"]:
-            if stat["value"] == "-":
-                points += 0
-            elif stat["stat_id"] == "22":  # Goals Against counts against overall score
-                points -= int(stat["value"])
-            elif stat["stat_id"] == "23":  # GAA counts against overall score
-                points -= float(stat["value"])
-
+        for stat_id, value in record.stats.items():
+            if value is None:
+                continue
+            if stat_id in INVERSE_STAT_IDS:
+                points -= value
             else:
-                # check if its a float or int
-                try:
-                    points += float(stat["value"])
-                except:
-                    points += int(stat["value"])
-
+                points += value
         player["points"] = points
-
-        url = NEXT_GAME_URL % NHL_TEAM_ID[player["team"]]
-        # logging.info("Next game url: %s" % url)
-
         return player
 
     def team_next_game(self, team):
@@ -14,15 +14,15 @@ class RosterPayloadManager:
         self.credentials = credentials
         self.config = config
 
-    def _construct_payload(self, players):
+    def _construct_payload(self, players, date=None):
         """
-        Constructs XML payload for roster operations.
+        Constructs XML payload for roster operations on the given date (defaults to today).
         """
         dictPayload = {
             "fantasy_content": {
                 "roster": {
                     "coverage_type": "date",
-                    "date": str(datetime.date.today()),
+                    "date": str(date or datetime.date.today()),
                     "players": {"player": players},
                 }
             }
@@ -66,7 +66,7 @@ class RosterPayloadManager:
             logging.info(f"Response Content: {response.content}")
             return False
 
-    def fill_roster(self, roster):
+    def fill_roster(self, roster, date=None):
         """
         Fills missing roster positions by selecting the highest-point bench players for each missing position.
         """
@@ -95,7 +95,7 @@ class RosterPayloadManager:
         if not added_players:
             return []
 
-        payload = self._construct_payload(players_payload)
+        payload = self._construct_payload(players_payload, date)
         success = self._send_request(
             payload, "Successfully updated roster with missing positions."
         )
@@ -0,0 +1,197 @@
+import time
+import heapq
+import logging
+import itertools
+import threading
+from datetime import datetime, timedelta
+from urllib.parse import urlparse
+import requests
+import telemetry
+
+# Priority classes, most urgent first
+WRITE = 0
+ROSTER = 1
+STATS = 2
+FREE_AGENTS = 3
+CLASS_NAMES = {WRITE: "write", ROSTER: "roster", STATS: "stats", FREE_AGENTS: "free_agents"}
+
+# yahoo_fantasy_api League and Team methods by priority class; anything not listed is a roster read
+METHOD_CLASSES = {
+    "change_positions": WRITE,
+    "add_player": WRITE,
+    "drop_player": WRITE,
+    "add_and_drop_players": WRITE,
+    "claim_player": WRITE,
+    "claim_and_drop_players": WRITE,
+    "player_stats": STATS,
+    "player_details": STATS,
+    "percent_owned": STATS,
+    "free_agents": FREE_AGENTS,
+    "taken_players": FREE_AGENTS,
+    "waivers": FREE_AGENTS,
+    "transactions": FREE_AGENTS,
+}
+# Methods returning another League or Team object, which is wrapped as well
+PROXIED_RESULTS = ["to_team", "to_league"]
+
+SCHEDULED_HOSTS = ["fantasysports.yahooapis.com"]
+# Shared budget for every Yahoo request made by this process
+REQUESTS_PER_SECOND = 10.0
+BURST = 20
+# Within PREEMPT_WINDOW of a lineup lock, stats and free agent reads leave RESERVED_TOKENS in the bucket for writes
+PREEMPT_WINDOW = timedelta(minutes=15)
+RESERVED_TOKENS = 10
+# Lineups lock when the first games start; used until the lock times are set from the schedule
+DEFAULT_LOCK_HOUR = 19
+
+
+class RequestScheduler:
+    """Token bucket shared by every Yahoo request in the process, handing out tokens in priority order"""
+
+    def __init__(self, rate=REQUESTS_PER_SECOND, burst=BURST):
+        self.logger = logging.getLogger(__name__)
+        self.condition = threading.Condition()
+        self.local = threading.local()
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.refilled_at = time.monotonic()
+        self.waiting = []
+        self.sequence = itertools.count()
+        self.lock_times = None
+        self.latencies = {}
+
+    def set_rate(self, rate, burst=None):
+        with self.condition:
+            self.rate = rate
+            self.burst = burst or self.burst
+            self.tokens = min(self.tokens, self.burst)
+
+    def set_lock_times(self, lock_times):
+        self.lock_times = sorted(lock_times)
+
+    def near_lock(self, now=None):
+        now = now or datetime.now()
+        lock_times = self.lock_times
+        if lock_times is None:
+            lock_times = [now.replace(hour=DEFAULT_LOCK_HOUR, minute=0, second=0, microsecond=0)]
+        return any(timedelta(0) <= lock_time - now <= PREEMPT_WINDOW for lock_time in lock_times)
+
+    def current_class(self):
+        return getattr(self.local, "request_class", ROSTER)
+
+    def request_class(self, request_class):
+        """Context manager tagging the Yahoo requests made inside it with a priority class"""
+        return RequestClass(self, request_class)
+
+    def refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.refilled_at) * self.rate)
+        self.refilled_at = now
+
+    def tokens_needed(self, request_class):
+        if request_class >= STATS and self.near_lock():
+            return 1 + min(RESERVED_TOKENS, self.burst - 1)
+        return 1
+
+    def acquire(self, request_class=None):
+        """Block until this request is the most urgent one waiting and the budget has a token for it"""
+        request_class = self.current_class() if request_class is None else request_class
+        enqueued = time.perf_counter()
+        with self.condition:
+            entry = (request_class, next(self.sequence))
+            heapq.heappush(self.waiting, entry)
+            while True:
+                self.refill()
+                if self.waiting[0] == entry:
+                    needed = self.tokens_needed(request_class)
+                    if self.tokens >= needed:
+                        break
+                    self.condition.wait((needed - self.tokens) / self.rate)
+                else:
+                    self.condition.wait()
+            heapq.heappop(self.waiting)
+            self.tokens -= 1
+            self.condition.notify_all()
+        self.record(request_class, time.perf_counter() - enqueued)
+
+    def record(self, request_class, seconds):
+        name = CLASS_NAMES[request_class]
+        with self.condition:
+            entry = self.latencies.setdefault(name, {"count": 0, "total_seconds": 0.0, "max_seconds": 0.0})
+            entry["count"] += 1
+            entry["total_seconds"] += seconds
+            entry["max_seconds"] = max(entry["max_seconds"], seconds)
+        telemetry.telemetry.record_span(f"queue:{name}", seconds)
+
+    def metrics(self):
+        """Queue latency per priority class"""
+        with self.condition:
+            return {
+                name: {**entry, "mean_seconds": entry["total_seconds"] / entry["count"] if entry["count"] else 0.0}
+                for name, entry in self.latencies.items()
+            }
+
+    def install(self):
+        """Route every Yahoo request made through requests.Session past the scheduler.
+
+        Install after the telemetry hooks so time spent queued is not counted as time on the wire.
+        """
+        if getattr(requests.Session.send, "scheduler_hook", False):
+            return
+        original_send = requests.Session.send
+        scheduler = self
+
+        def send(session, request, **kwargs):
+            if urlparse(request.url).netloc in SCHEDULED_HOSTS:
+                scheduler.acquire()
+            return original_send(session, request, **kwargs)
+
+        send.scheduler_hook = True
+        requests.Session.send = send
+
+    def proxy(self, target):
+        return ScheduledProxy(target, self)
+
+
+class RequestClass:
+    def __init__(self, scheduler, request_class):
+        self.scheduler = scheduler
+        self.request_class = request_class
+        self.previous = None
+
+    def __enter__(self):
+        self.previous = self.scheduler.current_class()
+        self.scheduler.local.request_class = self.request_class
+        return self
+
+    def __exit__(self, *exc):
+        self.scheduler.local.request_class = self.previous
+        return False
+
+
+class ScheduledProxy:
+    """Wraps a yahoo_fantasy_api League or Team so each method call is tagged with its priority class"""
+
+    def __init__(self, target, scheduler):
+        self._target = target
+        self._scheduler = scheduler
+
+    def __getattr__(self, name):
+        if name.startswith("_"):
+            raise AttributeError(name)
+        attribute = getattr(self._target, name)
+        if not callable(attribute):
+            return attribute
+        request_class = METHOD_CLASSES.get(name, ROSTER)
+        scheduler = self._scheduler
+
+        def call(*args, **kwargs):
+            with scheduler.request_class(request_class):
+                result = attribute(*args, **kwargs)
+            return scheduler.proxy(result) if name in PROXIED_RESULTS else result
+
+        return call
+
+
+scheduler = RequestScheduler()
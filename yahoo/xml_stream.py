@@ -0,0 +1,85 @@
+import io
+from util.lazy import lazy_import
+
+etree = lazy_import("lxml.etree")
+
+# Yahoo answers "-" for a stat with no value yet
+MISSING_VALUE = "-"
+
+
+def stat_value(text):
+    if text is None or text == MISSING_VALUE:
+        return None
+    try:
+        return int(text)
+    except ValueError:
+        return float(text)
+
+
+class PlayerRecord:
+    """One player from a Yahoo players collection, with stats keyed by stat_id"""
+
+    __slots__ = ["player_key", "player_id", "name", "team", "positions", "status", "notes_timestamp", "stats"]
+
+    def __init__(self, player_key, player_id, name, team, positions, status, notes_timestamp, stats):
+        self.player_key = player_key
+        self.player_id = player_id
+        self.name = name
+        self.team = team
+        self.positions = positions
+        self.status = status
+        self.notes_timestamp = notes_timestamp
+        self.stats = stats
+
+    @classmethod
+    def from_element(cls, element):
+        """Read the fields in one pass over the player's children"""
+        # Yahoo puts every element in its namespace, so the prefix is taken from the player tag itself
+        namespace = element.tag[: -len("player")]
+        fields = {}
+        positions = []
+        stats = {}
+        for child in element:
+            tag = child.tag[len(namespace) :]
+            if tag == "name":
+                fields["name"] = child.findtext(f"{namespace}full")
+            elif tag == "eligible_positions":
+                positions = [position.text for position in child]
+            elif tag == "player_stats":
+                stat_id_tag = f"{namespace}stat_id"
+                value_tag = f"{namespace}value"
+                for stat in child.iterfind(f"{namespace}stats/{namespace}stat"):
+                    stat_id = value = None
+                    for field in stat:
+                        if field.tag == stat_id_tag:
+                            stat_id = field.text
+                        elif field.tag == value_tag:
+                            value = field.text
+                    stats[stat_id] = stat_value(value)
+            else:
+                fields[tag] = child.text
+        notes_timestamp = fields.get("player_notes_last_timestamp")
+        return cls(
+            player_key=fields.get("player_key"),
+            player_id=int(fields["player_id"]),
+            name=fields.get("name"),
+            team=fields.get("editorial_team_full_name"),
+            positions=positions,
+            status=fields.get("status") or "",
+            notes_timestamp=int(notes_timestamp) if notes_timestamp else None,
+            stats=stats,
+        )
+
+    def __repr__(self):
+        return f"PlayerRecord(player_key='{self.player_key}', name='{self.name}', team='{self.team}', positions={self.positions})"
+
+
+def iter_players(content):
+    """Yield a PlayerRecord for each <player> in a response, freeing each element once it is read"""
+    source = io.BytesIO(content) if isinstance(content, bytes) else content
+    for _, element in etree.iterparse(source, events=("end",), tag="{*}player"):
+        yield PlayerRecord.from_element(element)
+        # Drop the element and the siblings already read so memory stays flat over large collections
+        element.clear()
+        while element.getprevious() is not None:
+            del element.getparent()[0]